@@ -0,0 +1,286 @@
+# cart/backends.py
+"""
+Where a visitor's cart lives.
+
+``get_cart(request)`` returns one of these backends, which share their
+methods (lines, totals, count, add, merge, set_quantity, set_quantities,
+remove, clear, flush), so the cart views don't care who is shopping:
+
+* DatabaseCart - a logged-in user's Cart rows (cart.models).
+* CacheCart    - the same, with CART_WRITE_BEHIND = True: the cart lives in
+                 the cache and is written to Cart rows in bulk later
+                 (cart.write_behind).
+* CookieCart   - a guest's cart, kept in a signed cookie as
+                 "item_id:quantity|item_id:quantity". Adding to it writes
+                 nothing to the database; reading it costs one MenuItem
+                 query, and only on the pages that list the lines.
+
+No line holds more than MAX_LINE_QUANTITY (cart.models): ``add`` raises
+ValueError with a message for the shopper instead, and merges cap the sum.
+
+CookieCartMiddleware writes the cookie back when a request changed the cart.
+On login (users.views.login_user / register) ``merge_cookie_cart`` adds the
+guest cart to the user's Cart rows with a single upsert and drops the cookie.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from menu.models import MenuItem
+
+from .badge import adjust_cart_count, get_cart_count, reset_cart_count, set_cart_count
+from .models import MAX_LINE_QUANTITY, Cart, CartTotals
+from .upsert import add_cart_quantity, merge_cart_quantities, set_cart_quantities
+
+CART_COOKIE_NAME = getattr(settings, 'CART_COOKIE_NAME', 'guest_cart')
+CART_COOKIE_AGE = getattr(settings, 'CART_COOKIE_AGE', 60 * 60 * 24 * 30)
+CART_COOKIE_SALT = 'cart.backends.CookieCart'
+CART_COOKIE_MAX_LINES = 100  # Keeps the cookie well under the browsers' 4 KB limit
+LINE_FULL_MESSAGE = f"You can have at most {MAX_LINE_QUANTITY} of one item in your cart."
+
+
+def cart_queryset(user):
+    """ The user's cart rows with their items (also EXPLAINed by `manage.py check_query_plans`). """
+    return Cart.objects.filter(user=user).select_related('item', 'item__category') # Optimize query
+
+
+def get_cart(request):
+    """ The current visitor's cart: their Cart rows (or cached cart) once logged in, the cookie cart before. """
+    if not request.user.is_authenticated:
+        return cookie_cart(request)
+    if getattr(settings, 'CART_WRITE_BEHIND', False):
+        from .write_behind import CacheCart  # Builds on this module
+        return CacheCart(request)
+    return DatabaseCart(request)
+
+
+def cookie_cart(request):
+    """ The guest cart from the request's cookie, loaded once per request. """
+    if not hasattr(request, '_cookie_cart'):
+        request._cookie_cart = CookieCart(request)
+    return request._cookie_cart
+
+
+def merge_cookie_cart(request):
+    """ Moves the guest cart into the (now logged-in) user's Cart rows. Call right after ``login()``. """
+    cart = cookie_cart(request)
+    if not cart.quantities:
+        return
+    get_cart(request).merge(cart.available_quantities())
+    cart.clear()
+
+
+class DatabaseCart:
+    """ A logged-in user's cart: one Cart row per item. """
+
+    def __init__(self, request):
+        self.request = request
+        self.user = request.user
+
+    def lines(self):
+        return cart_queryset(self.user)
+
+    def totals(self):
+        totals = Cart.objects.filter(user=self.user).totals()
+        set_cart_count(self.request, totals.quantity) # Free refresh of the navbar badge's cached count
+        return totals
+
+    def count(self):
+        return get_cart_count(self.user.pk)
+
+    def flush(self):
+        """ Nothing to do: the rows are always up to date (see CacheCart). """
+
+    def merge(self, quantities):
+        """ Adds {item id: quantity} with one multi-row upsert (lines capped at MAX_LINE_QUANTITY). """
+        merge_cart_quantities(self.user.pk, quantities)
+        self.totals()  # Recounts the badge: capped lines didn't add everything
+
+    def add(self, item_id, quantity=1):
+        """ Adds to the item's line in one upsert. Returns the line's new quantity. """
+        line_quantity, cart_total = add_cart_quantity(self.user.pk, item_id, quantity)
+        if line_quantity is None:
+            raise ValueError(LINE_FULL_MESSAGE)
+        # Keep the navbar badge's cached count in step (exact when the upsert returned the total)
+        if cart_total is None:
+            adjust_cart_count(self.request, quantity)
+        else:
+            set_cart_count(self.request, cart_total)
+        return line_quantity
+
+    def set_quantity(self, item_id, quantity):
+        """ Sets the item's quantity (0 removes it). Returns the line, or None once removed. """
+        line = Cart.objects.select_related('item').get(user=self.user, item_id=item_id)
+        adjust_cart_count(self.request, quantity - line.quantity)
+        if quantity == 0:
+            line.delete()
+            return None
+        line.quantity = quantity
+        line.save()
+        return line
+
+    def set_quantities(self, quantities):
+        """ Applies {item id: quantity} (0 removes) in one transaction.
+
+            Returns ({item id: line, or None once removed}, CartTotals).
+
+            Zero quantities go in one DELETE, the rest in one multi-row upsert.
+            Items that aren't for sale are only updated if already in the cart.
+        """
+        removed = [item_id for item_id, quantity in quantities.items() if quantity == 0]
+        kept = {item_id: quantity for item_id, quantity in quantities.items() if quantity > 0}
+        with transaction.atomic():
+            if removed:
+                Cart.objects.filter(user=self.user, item_id__in=removed).delete()
+            if kept:
+                allowed = set(
+                    MenuItem.objects.filter(Q(is_available=True) | Q(cart__user=self.user), pk__in=kept)
+                    .values_list('pk', flat=True)
+                )
+                set_cart_quantities(self.user.pk, {item_id: kept[item_id] for item_id in allowed})
+            lines = {line.item_id: line for line in self.lines().filter(item_id__in=quantities)}
+        return {item_id: lines.get(item_id) for item_id in quantities}, self.totals()
+
+    def remove(self, line_id):
+        """ Deletes the Cart row ``line_id``. Returns the removed item's name. """
+        line = get_object_or_404(Cart.objects.select_related('item'), id=line_id, user=self.user)
+        line.delete()
+        adjust_cart_count(self.request, -line.quantity)
+        return line.item.name
+
+    def clear(self):
+        Cart.objects.filter(user=self.user).delete()
+        reset_cart_count(self.request)
+
+
+class CartLine:
+    """ A line of a cart kept outside the Cart table, shaped like a Cart row for the templates. """
+
+    def __init__(self, item, quantity):
+        self.id = item.pk  # These lines are addressed by item id (e.g. in cart:cart_remove)
+        self.item = item
+        self.quantity = quantity
+
+    def total_price(self):
+        return self.item.price * self.quantity
+
+
+class QuantitiesCart:
+    """ Reading side of the carts that hold {item id: quantity} themselves, oldest line first. """
+
+    _lines = None
+
+    def lines(self):
+        """ CartLines for the items that still exist, newest first like Cart rows (one query). """
+        if self._lines is None:
+            quantities = self.quantities
+            items = MenuItem.objects.select_related('category').in_bulk(quantities)
+            self._lines = [
+                CartLine(items[item_id], quantity)
+                for item_id, quantity in reversed(quantities.items()) if item_id in items
+            ]
+        return self._lines
+
+    def totals(self):
+        lines = self.lines()
+        subtotal = sum((line.total_price() for line in lines), Decimal('0.00'))
+        return CartTotals(subtotal, len(lines), sum(line.quantity for line in lines))
+
+    def count(self):
+        return sum(self.quantities.values())
+
+    def line(self, item_id):
+        return next((line for line in self.lines() if line.item.pk == item_id), None)
+
+
+class CookieCart(QuantitiesCart):
+    """ A guest's cart: {item id: quantity} in a signed cookie. """
+
+    def __init__(self, request):
+        # Tampered with or expired: an empty cart (default='')
+        value = request.get_signed_cookie(CART_COOKIE_NAME, default='', salt=CART_COOKIE_SALT, max_age=CART_COOKIE_AGE)
+        self.quantities = self._parse(value)
+        self.modified = False
+        self._lines = None
+
+    # --- Cookie format ---
+    @staticmethod
+    def _parse(value):
+        try:
+            pairs = (pair.split(':') for pair in value.split('|') if pair)
+            quantities = {int(item_id): int(quantity) for item_id, quantity in pairs}
+        except ValueError:
+            return {}  # Garbled: start over
+        return {item_id: min(quantity, MAX_LINE_QUANTITY) for item_id, quantity in quantities.items() if quantity > 0}
+
+    def save(self, response):
+        """ Writes the cookie (or deletes it once empty); CookieCartMiddleware calls this. """
+        if self.quantities:
+            value = '|'.join(f'{item_id}:{quantity}' for item_id, quantity in self.quantities.items())
+            response.set_signed_cookie(
+                CART_COOKIE_NAME, value, salt=CART_COOKIE_SALT, max_age=CART_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+            )
+        else:
+            response.delete_cookie(CART_COOKIE_NAME, samesite='Lax')
+
+    def _changed(self):
+        self.modified = True
+        self._lines = None
+
+    # --- Reading ---
+    def available_quantities(self):
+        """ {item id: quantity} for the items that can still be bought (what a login merges). """
+        available = MenuItem.objects.filter(pk__in=self.quantities, is_available=True).values_list('pk', flat=True)
+        return {item_id: self.quantities[item_id] for item_id in available}
+
+    # --- Changes (no database writes) ---
+    def add(self, item_id, quantity=1):
+        if item_id not in self.quantities and len(self.quantities) >= CART_COOKIE_MAX_LINES:
+            raise ValueError("Your cart is full. Log in to add more items.")
+        if self.quantities.get(item_id, 0) + quantity > MAX_LINE_QUANTITY:
+            raise ValueError(LINE_FULL_MESSAGE)
+        self.quantities[item_id] = self.quantities.get(item_id, 0) + quantity
+        self._changed()
+        return self.quantities[item_id]
+
+    def set_quantity(self, item_id, quantity):
+        if item_id not in self.quantities:
+            raise Cart.DoesNotExist
+        if quantity == 0:
+            del self.quantities[item_id]
+            self._changed()
+            return None
+        self.quantities[item_id] = quantity
+        self._changed()
+        return self.line(item_id)
+
+    def set_quantities(self, quantities):
+        """ Applies {item id: quantity} (0 removes). Returns ({item id: line or None}, CartTotals). """
+        new = [item_id for item_id, quantity in quantities.items() if quantity and item_id not in self.quantities]
+        allowed = set(MenuItem.objects.filter(pk__in=new, is_available=True).values_list('pk', flat=True)) if new else set()
+        for item_id, quantity in quantities.items():
+            if quantity == 0:
+                self.quantities.pop(item_id, None)
+            elif item_id in self.quantities or (item_id in allowed and len(self.quantities) < CART_COOKIE_MAX_LINES):
+                self.quantities[item_id] = quantity
+        self._changed()
+        return {item_id: self.line(item_id) for item_id in quantities}, self.totals()
+
+    def remove(self, line_id):
+        if line_id not in self.quantities:
+            raise Http404("Item not found in cart.")
+        name = MenuItem.objects.filter(pk=line_id).values_list('name', flat=True).first()
+        del self.quantities[line_id]
+        self._changed()
+        return name or "Item"
+
+    def clear(self):
+        if self.quantities:
+            self.quantities = {}
+            self._changed()
@@ -0,0 +1,69 @@
+# cart/badge.py
+"""
+The navbar cart badge: total quantity in a user's cart.
+
+The count is kept in the cache per user. A miss costs one
+``Sum('quantity')`` aggregate. After that the cart views keep the cached
+number in step as they change the cart (``adjust_cart_count`` for
+add/update/remove, ``set_cart_count`` when the new total is known,
+``reset_cart_count`` for clear and checkout), so rendering the badge on
+every page normally costs no query at all. If a change isn't tracked (admin
+edits, shell), the entry is still corrected when it expires.
+
+Guests' carts (cookie) and write-behind carts (cache) know their own count;
+``cart_item_count`` asks the visitor's cart backend (cart.backends).
+"""
+
+from django.core.cache import cache
+from django.db.models import Sum
+
+from .models import Cart
+
+CART_COUNT_KEY = 'cart:count:{user_id}'
+CART_COUNT_TIMEOUT = 60 * 60
+
+
+def cart_item_count(request):
+    """ Total quantity in the visitor's cart, memoized on the request for users. """
+    from .backends import cookie_cart, get_cart  # The backends build on this module
+    if not request.user.is_authenticated:
+        return cookie_cart(request).count()  # Read from the cookie, no query
+    if not hasattr(request, '_cart_item_count'):
+        request._cart_item_count = get_cart(request).count()
+    return request._cart_item_count
+
+
+def forget_request_count(request):
+    """ Drops the count memoized on the request (the cart just changed). """
+    request.__dict__.pop('_cart_item_count', None)
+
+
+def get_cart_count(user_id):
+    """ The cached count, from one aggregate on a miss. """
+    key = CART_COUNT_KEY.format(user_id=user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Cart.objects.filter(user_id=user_id).aggregate(total=Sum('quantity'))['total'] or 0
+        cache.set(key, count, CART_COUNT_TIMEOUT)
+    return count
+
+
+def adjust_cart_count(request, delta):
+    """ Adds ``delta`` to the cached count, after the cart row was written. """
+    forget_request_count(request)
+    if delta:
+        try:
+            cache.incr(CART_COUNT_KEY.format(user_id=request.user.pk), delta)
+        except ValueError:
+            pass  # Not cached: the next read counts from the database
+
+
+def set_cart_count(request, count):
+    """ Stores a count that is known exactly (e.g. returned by the add_to_cart upsert). """
+    request._cart_item_count = count
+    cache.set(CART_COUNT_KEY.format(user_id=request.user.pk), count, CART_COUNT_TIMEOUT)
+
+
+def reset_cart_count(request):
+    """ The cart was emptied. """
+    set_cart_count(request, 0)
@@ -0,0 +1,23 @@
+# cart/checks.py
+"""
+System checks for the cart settings.
+"""
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register('caches')
+def check_write_behind_cache(app_configs, **kwargs):
+    """ CART_WRITE_BEHIND carts must live in a cache every process shares (see cart.write_behind). """
+    if not getattr(settings, 'CART_WRITE_BEHIND', False):
+        return []
+    from .write_behind import cart_cache_problem
+    problem = cart_cache_problem()
+    if problem is None:
+        return []
+    return [Error(
+        problem,
+        hint="Point CART_CACHE_ALIAS at a Redis, Memcached or DatabaseCache entry in CACHES.",
+        id='cart.E001',
+    )]
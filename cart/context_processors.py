@@ -0,0 +1,10 @@
+# cart/context_processors.py
+
+from django.utils.functional import SimpleLazyObject
+
+from .badge import cart_item_count
+
+
+def cart_badge(request):
+    """ ``cart_item_count`` for the navbar badge on every page (read only if a template uses it). """
+    return {'cart_item_count': SimpleLazyObject(lambda: cart_item_count(request))}
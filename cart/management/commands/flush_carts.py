@@ -0,0 +1,30 @@
+# cart/management/commands/flush_carts.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cart.write_behind import flush_carts
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the carts changed in the cache (CART_WRITE_BEHIND) back to Cart rows. "
+        "Run it every few seconds, or leave it running with --interval."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Keep running, flushing every N seconds.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Users per DELETE + upsert (default 500).")
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'CART_WRITE_BEHIND', False):
+            self.stdout.write(self.style.WARNING("CART_WRITE_BEHIND is off: carts are written directly, nothing to flush."))
+        while True:
+            written = flush_carts(batch_size=options['batch_size'])
+            if written or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f"Flushed {written} carts."))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,17 @@
+# cart/middleware.py
+
+class CookieCartMiddleware:
+    """
+    Saves a guest's cart cookie (cart.backends.CookieCart) when the request
+    changed it. Goes after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        cart = getattr(request, '_cookie_cart', None)
+        if cart is not None and cart.modified:
+            cart.save(response)
+        return response
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0002_alter_cart_options_alter_cart_added_at_and_more"),
+        ("menu", "0011_catalog_hot_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cart",
+            index=models.Index(fields=["user", "-added_at"], name="cart_user_added_idx"),
+        ),
+    ]
@@ -1,10 +1,38 @@
 # cart/models.py (Corrected to use MenuItem)
 
+from collections import namedtuple
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Count, DecimalField, F, Sum
 from django.contrib.auth.models import User # Standard Django User model
 # --- Import MenuItem from the menu app ---
 from menu.models import MenuItem # Use MenuItem, not Product
 
+CartTotals = namedtuple('CartTotals', 'subtotal lines quantity')
+CENTS = Decimal('0.01')
+MAX_LINE_QUANTITY = 99  # Per cart line: more is a typo or abuse (and 10**20 overflows the column)
+
+
+class CartQuerySet(models.QuerySet):
+    def totals(self):
+        """ CartTotals(subtotal, lines, quantity) of these rows, from one aggregate query.
+
+            The subtotal is summed by the database as quantity * price and
+            returned as a Decimal in cents (0.00 when empty). SQLite computes
+            it in floating point, so it is quantized here like a column value.
+        """
+        row = self.order_by().aggregate(
+            subtotal=Sum(
+                F('quantity') * F('item__price'),
+                output_field=DecimalField(max_digits=12, decimal_places=2), default=Decimal('0.00'),
+            ),
+            lines=Count('pk'),
+            quantity=Sum('quantity', default=0),
+        )
+        return CartTotals(row['subtotal'].quantize(CENTS), row['lines'], row['quantity'])
+
+
 class Cart(models.Model):
     """
     Represents an item added to a user's shopping cart.
@@ -31,9 +59,15 @@ class Cart(models.Model):
         help_text="Timestamp when the item was first added or the entry was created."
     )
 
+    objects = CartQuerySet.as_manager()
+
     class Meta:
         unique_together = ('user', 'item')
         ordering = ['-added_at']
+        indexes = [
+            # cart_view: one user's rows, newest first
+            models.Index(fields=['user', '-added_at'], name='cart_user_added_idx'),
+        ]
         verbose_name = "Cart Item"
         verbose_name_plural = "Cart Items"
 
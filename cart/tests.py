@@ -1,3 +1,457 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from menu.models import MenuItem
+
+from . import upsert
+from .backends import CART_COOKIE_NAME, CART_COOKIE_SALT, get_cart
+from .badge import get_cart_count
+from .models import MAX_LINE_QUANTITY, Cart
+from .write_behind import ITEMS_KEY, LINE_KEY, cart_cache, flush_carts
+
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+SHARED_CART_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'carts': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'test_cart_cache'},
+}
+
+
+class CartTotalsTests(TestCase):
+    """ Cart totals come from one aggregate: exact, and a constant number of queries. """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='shopper', password='secret')
+        self.client.login(username='shopper', password='secret')
+
+    def fill_cart(self, lines):
+        """ Adds ``lines`` items (quantity 3 at 0.10 + n) and returns the expected subtotal. """
+        subtotal = Decimal('0.00')
+        for n in range(lines):
+            price = Decimal('0.10') + n
+            item = MenuItem.objects.create(name=f'Item {n}', description='d', price=price)
+            Cart.objects.create(user=self.user, item=item, quantity=3)
+            subtotal += price * 3
+        return subtotal
+
+    def test_totals_are_exact(self):
+        subtotal = self.fill_cart(7)
+        totals = Cart.objects.filter(user=self.user).totals()
+        self.assertEqual(totals, (subtotal, 7, 21))
+        self.assertIsInstance(totals.subtotal, Decimal)
+        self.assertEqual(str(totals.subtotal), '65.10')
+
+    def test_empty_cart(self):
+        self.assertEqual(Cart.objects.filter(user=self.user).totals(), (Decimal('0.00'), 0, 0))
+
+    def test_cart_view_queries(self):
+        for lines in (1, 10):
+            Cart.objects.all().delete()
+            subtotal = self.fill_cart(lines)
+            # Session, user, totals aggregate, cart rows
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse('cart:cart_view'))
+            self.assertEqual(response.context['subtotal'], subtotal)
+
+    def test_update_cart_queries(self):
+        for lines in (1, 10):
+            Cart.objects.all().delete()
+            subtotal = self.fill_cart(lines)
+            item = Cart.objects.filter(user=self.user).values_list('item_id', flat=True).first()
+            # Session, user, cart row with its item, UPDATE, totals aggregate
+            with self.assertNumQueries(5):
+                response = self.client.post(reverse('cart:update_cart', args=[item]), {'quantity': 4}, **AJAX)
+            price = MenuItem.objects.get(pk=item).price
+            self.assertEqual(Decimal(str(response.json()['subtotal'])), subtotal + price)
+            self.assertEqual(response.json()['cart_item_count'], lines * 3 + 1)
+
+    def test_checkout_queries(self):
+        for lines in (1, 10):
+            Cart.objects.all().delete()
+            subtotal = self.fill_cart(lines)
+            # Session, user, totals aggregate, cart rows
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse('checkout:checkout'))
+            self.assertEqual(response.context['subtotal'], subtotal)
+
+    def test_checkout_empty_cart(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('checkout:checkout'))
+        self.assertRedirects(response, reverse('cart:cart_view'), fetch_redirect_response=False)
+
+
+class GuestCartTests(TestCase):
+    """ Guests keep their cart in a signed cookie; logging in merges it into Cart rows. """
+
+    def setUp(self):
+        cache.clear()
+        self.sofa = MenuItem.objects.create(name='Sofa', description='d', price=Decimal('1000.50'))
+        self.lamp = MenuItem.objects.create(name='Lamp', description='d', price=Decimal('99.99'))
+        self.user = User.objects.create_user(username='shopper', password='secret')
+
+    def add(self, item):
+        return self.client.get(reverse('cart:add_item', args=[item.pk]), **AJAX)
+
+    def test_guest_cart_writes_nothing(self):
+        # Session-less: the item lookup is the only query
+        with self.assertNumQueries(1):
+            response = self.add(self.sofa)
+        self.assertEqual(response.json()['cart_item_count'], 1)
+        self.add(self.sofa)
+        self.add(self.lamp)
+        self.assertFalse(Cart.objects.exists())
+
+        response = self.client.get(reverse('cart:cart_view'))
+        self.assertEqual(response.context['subtotal'], Decimal('2100.99'))
+        self.assertEqual(str(response.context['cart_item_count']), '3')
+        self.assertEqual([line.item for line in response.context['cart_items']], [self.lamp, self.sofa])
+
+        response = self.client.post(reverse('cart:update_cart', args=[self.sofa.pk]), {'quantity': 0}, **AJAX)
+        self.assertEqual((response.json()['removed'], response.json()['cart_item_count']), (True, 1))
+        self.client.get(reverse('cart:cart_remove', args=[self.lamp.pk]))
+        response = self.client.get(reverse('cart:cart_view'))
+        self.assertEqual(list(response.context['cart_items']), [])
+
+    def test_tampered_cookie_is_ignored(self):
+        self.add(self.sofa)
+        value = self.client.cookies['guest_cart'].value
+        self.client.cookies['guest_cart'] = value.replace(f'{self.sofa.pk}:1', f'{self.sofa.pk}:99')
+        response = self.client.get(reverse('cart:cart_view'))
+        self.assertEqual(list(response.context['cart_items']), [])
+
+    def test_login_merges_guest_cart(self):
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=2)
+        self.add(self.sofa)
+        self.add(self.lamp)
+        response = self.client.post(reverse('users:login'), {'username': 'shopper', 'password': 'secret'})
+        self.assertEqual(response.cookies['guest_cart'].value, '')  # Cookie dropped
+        quantities = dict(Cart.objects.filter(user=self.user).values_list('item__name', 'quantity'))
+        self.assertEqual(quantities, {'Sofa': 3, 'Lamp': 1})
+        response = self.client.get(reverse('cart:cart_view'))
+        self.assertEqual(response.context['subtotal'], Decimal('3101.49'))
+
+
+class BatchUpdateTests(TestCase):
+    """ update_cart_batch applies many quantity changes in one request. """
+
+    def setUp(self):
+        cache.clear()
+        self.items = [MenuItem.objects.create(name=f'Item {n}', description='d', price=Decimal('10.25') * (n + 1)) for n in range(12)]
+        self.user = User.objects.create_user(username='shopper', password='secret')
+
+    def post(self, changes):
+        return self.client.post(
+            reverse('cart:update_cart_batch'), json.dumps({'changes': changes}),
+            content_type='application/json', **AJAX,
+        )
+
+    def test_batch_for_user(self):
+        self.client.login(username='shopper', password='secret')
+        for item in self.items:
+            Cart.objects.create(user=self.user, item=item, quantity=1)
+        changes = [{'item_id': item.pk, 'quantity': 0 if n % 2 else 3} for n, item in enumerate(self.items)]
+        # Session, user, savepoint, DELETE, item check, upsert, release, changed lines, totals
+        with self.assertNumQueries(9):
+            response = self.post(changes)
+        data = response.json()
+        self.assertEqual(len(data['lines']), 12)
+        self.assertEqual(data['lines'][0], {'item_id': self.items[0].pk, 'quantity': 3, 'item_total': 30.75, 'removed': False})
+        self.assertTrue(data['lines'][1]['removed'])
+        self.assertEqual((data['cart_item_count'], data['subtotal']), (18, 1107.0))
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 6)
+
+    def test_batch_for_guest(self):
+        self.client.get(reverse('cart:add_item', args=[self.items[0].pk]))
+        response = self.post([
+            {'item_id': self.items[0].pk, 'quantity': 4},
+            {'item_id': self.items[1].pk, 'quantity': 2},  # New line
+            {'item_id': 999999, 'quantity': 1},  # No such item: ignored
+        ])
+        data = response.json()
+        self.assertEqual(data['cart_item_count'], 6)
+        self.assertEqual([line['removed'] for line in data['lines']], [False, False, True])
+        self.assertFalse(Cart.objects.exists())
+
+    def test_invalid_changes(self):
+        for body in ([{'item_id': 1}], [{'item_id': 1, 'quantity': -1}], 'nope'):
+            self.assertEqual(self.post(body).status_code, 400)
+        # Like update_cart, only the page's script may call it
+        response = self.client.post(
+            reverse('cart:update_cart_batch'), json.dumps({'changes': [{'item_id': self.items[0].pk, 'quantity': 1}]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CART_WRITE_BEHIND=True, CACHES=SHARED_CART_CACHE, CART_CACHE_ALIAS='carts')
+class WriteBehindCartTests(TestCase):
+    """ With CART_WRITE_BEHIND the cart lives in the (shared, here database) cache until flush_carts writes it. """
+
+    def setUp(self):
+        call_command('createcachetable', 'test_cart_cache')
+        cache.clear()
+        self.sofa = MenuItem.objects.create(name='Sofa', description='d', price=Decimal('1000.50'))
+        self.lamp = MenuItem.objects.create(name='Lamp', description='d', price=Decimal('99.99'))
+        self.user = User.objects.create_user(username='shopper', password='secret')
+
+    def login(self):
+        self.client.login(username='shopper', password='secret')
+
+    def add(self, item):
+        return self.client.get(reverse('cart:add_item', args=[item.pk]), **AJAX)
+
+    def rows(self):
+        return dict(Cart.objects.filter(user=self.user).values_list('item__name', 'quantity'))
+
+    def test_changes_stay_in_cache_until_flushed(self):
+        self.login()
+        self.add(self.sofa)
+        # Session, user, item lookup (the cart is already seeded); the rest goes to the cache table
+        with CaptureQueriesContext(connection) as queries:
+            response = self.add(self.sofa)
+        app_queries = [q['sql'] for q in queries if 'test_cart_cache' not in q['sql'] and 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(app_queries), 3, app_queries)
+        self.assertEqual(response.json()['cart_item_count'], 2)
+        self.add(self.lamp)
+        self.assertEqual(self.rows(), {})
+
+        response = self.client.get(reverse('cart:cart_view'))
+        self.assertEqual(response.context['subtotal'], Decimal('2100.99'))
+        self.assertEqual([line.item for line in response.context['cart_items']], [self.lamp, self.sofa])
+
+        self.assertEqual(flush_carts(), 1)
+        self.assertEqual(self.rows(), {'Sofa': 2, 'Lamp': 1})
+        self.assertEqual(flush_carts(), 0)  # Nothing changed since
+
+        self.client.post(reverse('cart:update_cart', args=[self.sofa.pk]), {'quantity': 0}, **AJAX)
+        self.client.post(reverse('cart:update_cart', args=[self.lamp.pk]), {'quantity': 5}, **AJAX)
+        flush_carts()
+        self.assertEqual(self.rows(), {'Lamp': 5})
+
+    def test_existing_rows_and_guest_cart_are_loaded(self):
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=2)
+        self.add(self.sofa)
+        self.add(self.lamp)
+        self.client.post(reverse('users:login'), {'username': 'shopper', 'password': 'secret'})
+        response = self.client.get(reverse('cart:cart_view'))
+        self.assertEqual(response.context['subtotal'], Decimal('3101.49'))
+        flush_carts()
+        self.assertEqual(self.rows(), {'Sofa': 3, 'Lamp': 1})
+
+    def test_checkout_flushes_and_clear_deletes_rows(self):
+        self.login()
+        self.add(self.sofa)
+        response = self.client.get(reverse('checkout:checkout'))
+        self.assertEqual(response.context['subtotal'], Decimal('1000.50'))
+        self.assertEqual(self.rows(), {'Sofa': 1})
+
+        self.client.get(reverse('cart:clear_cart'))
+        self.assertEqual(self.rows(), {})
+        self.assertEqual(flush_carts(), 1)
+        self.assertEqual(self.rows(), {})
+
+    def test_line_limit(self):
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=MAX_LINE_QUANTITY - 1)
+        self.login()
+        self.assertEqual(self.add(self.sofa).json()['quantity'], MAX_LINE_QUANTITY)
+        self.assertEqual(self.add(self.sofa).status_code, 400)
+        # Refused before anything is written, not incremented and taken back
+        self.assertEqual(cart_cache().get(LINE_KEY.format(user_id=self.user.pk, item_id=self.sofa.pk)), MAX_LINE_QUANTITY)
+        flush_carts()
+        self.assertEqual(self.rows(), {'Sofa': MAX_LINE_QUANTITY})
+
+    def test_edits_only_write_the_lines_they_change(self):
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=1)
+        Cart.objects.create(user=self.user, item=self.lamp, quantity=1)
+        request = RequestFactory().get('/')
+        request.user = self.user
+        cart = get_cart(request)
+        with cart._editing() as quantities:
+            # A change to the sofa line that this edit didn't read
+            cart_cache().set(LINE_KEY.format(user_id=self.user.pk, item_id=self.sofa.pk), 3, None)
+            quantities[self.lamp.pk] = 5
+        flush_carts()
+        self.assertEqual(self.rows(), {'Sofa': 3, 'Lamp': 5})
+
+    def test_per_process_cache_is_refused(self):
+        self.login()
+        with self.settings(CART_CACHE_ALIAS='default'):
+            self.assertEqual([error.id for error in run_checks(tags=['caches'])], ['cart.E001'])
+            with self.assertRaises(ImproperlyConfigured), self.assertLogs('django.request', 'ERROR'):
+                self.add(self.sofa)
+            with self.assertRaises(ImproperlyConfigured):
+                flush_carts()
+        self.assertEqual(run_checks(tags=['caches']), [])
+
+    def test_evicted_cart_keeps_its_rows(self):
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=2)
+        self.login()
+        self.add(self.lamp)
+        cart_cache().delete(ITEMS_KEY.format(user_id=self.user.pk))
+        self.assertEqual(flush_carts(), 0)
+        self.assertEqual(self.rows(), {'Sofa': 2})
+
+
+class CartBadgeTests(TestCase):
+    """ The navbar badge shows on every page from a cached count the cart views keep current. """
+
+    def setUp(self):
+        cache.clear()
+        self.sofa = MenuItem.objects.create(name='Sofa', description='d', price=10)
+        self.lamp = MenuItem.objects.create(name='Lamp', description='d', price=20)
+        self.user = User.objects.create_user(username='shopper', password='secret')
+        self.client.login(username='shopper', password='secret')
+
+    def add(self, item):
+        return self.client.get(reverse('cart:add_item', args=[item.pk]), **AJAX)
+
+    def assertBadge(self, url, count):
+        self.assertRegex(self.client.get(url).content.decode(), rf'cart-count-badge[^>]*>\s*{count}\s*<')
+
+    def test_badge_follows_the_cart(self):
+        self.assertEqual(self.add(self.sofa).json()['cart_item_count'], 1)
+        self.add(self.sofa)
+        self.assertEqual(self.add(self.lamp).json()['cart_item_count'], 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cart_count(self.user.pk), 3)
+        for url in (reverse('cart:cart_view'), reverse('menu:menu_list'), reverse('menu:menu_detail', args=[self.sofa.pk])):
+            self.assertBadge(url, 3)
+
+        response = self.client.post(reverse('cart:update_cart', args=[self.sofa.pk]), {'quantity': 5}, **AJAX)
+        self.assertEqual(response.json()['cart_item_count'], 6)
+        self.client.get(reverse('cart:cart_remove', args=[Cart.objects.get(item=self.lamp).pk]))
+        self.assertEqual(get_cart_count(self.user.pk), 5)
+        self.assertBadge(reverse('menu:menu_list'), 5)
+
+        self.client.get(reverse('cart:clear_cart'))
+        self.assertEqual(get_cart_count(self.user.pk), 0)
+
+    def test_miss_is_one_aggregate(self):
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=4)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_cart_count(self.user.pk), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cart_count(self.user.pk), 4)
+
+    def test_guest_badge(self):
+        self.client.logout()
+        self.add(self.lamp)
+        self.add(self.lamp)
+        self.assertBadge(reverse('cart:cart_view'), 2)
+
+
+class AddToCartUpsertTests(TestCase):
+    """ Adding to the cart is one INSERT ... ON CONFLICT DO UPDATE, with an ORM fallback. """
+
+    def setUp(self):
+        cache.clear()
+        self.sofa = MenuItem.objects.create(name='Sofa', description='d', price=10)
+        self.lamp = MenuItem.objects.create(name='Lamp', description='d', price=20)
+        self.user = User.objects.create_user(username='shopper', password='secret')
+
+    def test_upsert(self):
+        self.assertEqual(upsert.add_cart_quantity(self.user.pk, self.sofa.pk, 2)[0], 2)
+        self.assertEqual(upsert.add_cart_quantity(self.user.pk, self.lamp.pk)[0], 1)
+        quantity, total = upsert.add_cart_quantity(self.user.pk, self.sofa.pk, 3)
+        self.assertEqual(quantity, 5)
+        if connection.vendor == 'postgresql':
+            self.assertEqual(total, 6)  # The whole cart, from the same statement
+        line = Cart.objects.get(user=self.user, item=self.sofa)
+        self.assertEqual(line.quantity, 5)
+        self.assertIsNotNone(line.added_at)
+
+    def test_orm_fallback(self):
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            self.assertEqual(upsert.add_cart_quantity(self.user.pk, self.sofa.pk, 2), (2, None))
+            self.assertEqual(upsert.add_cart_quantity(self.user.pk, self.sofa.pk), (3, None))
+            upsert.merge_cart_quantities(self.user.pk, {self.sofa.pk: 1, self.lamp.pk: 4})
+        self.assertEqual(dict(Cart.objects.values_list('item_id', 'quantity')), {self.sofa.pk: 4, self.lamp.pk: 4})
+
+    def test_merge_and_set(self):
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=2)
+        upsert.merge_cart_quantities(self.user.pk, {self.sofa.pk: 1, self.lamp.pk: 4})
+        self.assertEqual(dict(Cart.objects.values_list('item_id', 'quantity')), {self.sofa.pk: 3, self.lamp.pk: 4})
+        upsert.set_cart_quantities(self.user.pk, {self.sofa.pk: 1})
+        self.assertEqual(dict(Cart.objects.values_list('item_id', 'quantity')), {self.sofa.pk: 1, self.lamp.pk: 4})
+
+    def test_view(self):
+        self.client.login(username='shopper', password='secret')
+        self.client.get(reverse('cart:add_item', args=[self.lamp.pk]), **AJAX)
+        with self.assertNumQueries(4):  # Session, user, item, upsert
+            response = self.client.get(reverse('cart:add_item', args=[self.sofa.pk]), **AJAX)
+        self.assertEqual(response.json()['cart_item_count'], 2)
+        response = self.client.get(reverse('cart:add_item', args=[self.sofa.pk]), **AJAX)
+        self.assertEqual((response.json()['quantity'], response.json()['cart_item_count']), (2, 3))
+
+
+class QuantityLimitTests(TestCase):
+    """ No cart line goes above MAX_LINE_QUANTITY, whoever asks and however. """
+
+    def setUp(self):
+        cache.clear()
+        self.sofa = MenuItem.objects.create(name='Sofa', description='d', price=10)
+        self.user = User.objects.create_user(username='shopper', password='secret')
+
+    def add(self, item):
+        return self.client.get(reverse('cart:add_item', args=[item.pk]), **AJAX)
+
+    def set_guest_cookie(self, value):
+        signer = signing.get_cookie_signer(salt=CART_COOKIE_NAME + CART_COOKIE_SALT)
+        self.client.cookies[CART_COOKIE_NAME] = signer.sign(value)
+
+    def test_update_rejects_huge_quantities(self):
+        self.client.login(username='shopper', password='secret')
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=2)
+        url = reverse('cart:update_cart', args=[self.sofa.pk])
+        for quantity in (10 ** 20, MAX_LINE_QUANTITY + 1, -1):
+            self.assertEqual(self.client.post(url, {'quantity': quantity}, **AJAX).status_code, 400)
+            response = self.client.post(
+                reverse('cart:update_cart_batch'), json.dumps({'changes': [{'item_id': self.sofa.pk, 'quantity': quantity}]}),
+                content_type='application/json', **AJAX,
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Cart.objects.get().quantity, 2)
+        self.assertEqual(self.client.post(url, {'quantity': MAX_LINE_QUANTITY}, **AJAX).json()['quantity'], MAX_LINE_QUANTITY)
+
+    def test_add_stops_at_the_limit(self):
+        self.client.login(username='shopper', password='secret')
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=MAX_LINE_QUANTITY - 1)
+        self.assertEqual(self.add(self.sofa).json()['quantity'], MAX_LINE_QUANTITY)
+        response = self.add(self.sofa)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(MAX_LINE_QUANTITY), response.json()['message'])
+        self.assertEqual(Cart.objects.get().quantity, MAX_LINE_QUANTITY)
+        self.assertEqual(get_cart_count(self.user.pk), MAX_LINE_QUANTITY)
+
+    def test_upsert_limit(self):
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=MAX_LINE_QUANTITY)
+        self.assertEqual(upsert.add_cart_quantity(self.user.pk, self.sofa.pk), (None, None))
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            self.assertEqual(upsert.add_cart_quantity(self.user.pk, self.sofa.pk), (None, None))
+            upsert.merge_cart_quantities(self.user.pk, {self.sofa.pk: 5})
+        upsert.merge_cart_quantities(self.user.pk, {self.sofa.pk: 10 ** 6})
+        self.assertEqual(Cart.objects.get().quantity, MAX_LINE_QUANTITY)
+
+    def test_guest_cookie_is_capped(self):
+        self.set_guest_cookie(f'{self.sofa.pk}:{10 ** 20}')
+        response = self.client.get(reverse('cart:cart_view'))
+        self.assertEqual([line.quantity for line in response.context['cart_items']], [MAX_LINE_QUANTITY])
+        self.assertEqual(self.add(self.sofa).status_code, 400)
+
+        # Logging in merges the capped quantity: no overflow of the column
+        Cart.objects.create(user=self.user, item=self.sofa, quantity=5)
+        self.client.post(reverse('users:login'), {'username': 'shopper', 'password': 'secret'})
+        self.assertEqual(Cart.objects.get().quantity, MAX_LINE_QUANTITY)
+        self.assertEqual(get_cart_count(self.user.pk), MAX_LINE_QUANTITY)
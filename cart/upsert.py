@@ -0,0 +1,135 @@
+# cart/upsert.py
+"""
+Adding to the cart as one atomic statement.
+
+``add_cart_quantity`` inserts the (user, item) row or adds to its quantity
+with INSERT ... ON CONFLICT (user_id, item_id) DO UPDATE, so concurrent
+clicks on "Add to cart" add up instead of losing an increment or hitting the
+unique_together constraint. RETURNING hands back the new line quantity in the
+same round trip; on PostgreSQL the statement also returns the cart's new
+total for the navbar badge (cart.badge). ``merge_cart_quantities`` runs the
+same upsert with one VALUES row per item, to fold a guest cart into the
+user's cart on login; ``set_cart_quantities`` overwrites the quantities
+instead, for the cart page's batched edits. Both go through
+``upsert_cart_rows``, which also writes many users' rows at once (the
+write-behind flush, cart.write_behind).
+
+No line goes above MAX_LINE_QUANTITY: ``add_cart_quantity`` leaves a line
+that would and returns None for it, merges cap the sum.
+
+Databases without INSERT ... RETURNING (SQLite before 3.35, MySQL) use an
+UPDATE of F('quantity') with an INSERT fallback instead.
+"""
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MAX_LINE_QUANTITY, Cart
+
+UPSERT_SQL = """
+    INSERT INTO {table} (user_id, item_id, quantity, added_at)
+    VALUES {rows}
+    ON CONFLICT (user_id, item_id) DO UPDATE SET
+        quantity = {quantity}
+"""
+ROW_SQL = '(%s, %s, %s, %s)'
+ADD_QUANTITY = (
+    'CASE WHEN {table}.quantity + excluded.quantity > {max} THEN {max} '
+    'ELSE {table}.quantity + excluded.quantity END'
+)
+SET_QUANTITY = 'excluded.quantity'
+# add_cart_quantity: a line that would go over the limit isn't updated (and nothing is returned)
+WITHIN_LIMIT_SQL = '    WHERE {table}.quantity + excluded.quantity <= {max}\n'
+
+# The other lines' sum is read from the statement's snapshot, which the new
+# row isn't part of, so the line itself is added from RETURNING
+UPSERT_WITH_TOTAL_SQL = """
+    WITH line AS ({upsert})
+    SELECT line.quantity, line.quantity + COALESCE(
+        (SELECT SUM(quantity) FROM {table} WHERE user_id = %s AND item_id <> %s), 0
+    )
+    FROM line
+"""
+
+
+def _upsert_sql(rows, quantity):
+    table = connection.ops.quote_name(Cart._meta.db_table)
+    return UPSERT_SQL.format(
+        table=table, rows=', '.join([ROW_SQL] * rows), quantity=quantity.format(table=table, max=MAX_LINE_QUANTITY),
+    )
+
+
+def _add_line_sql():
+    """ The one-line upsert of add_cart_quantity: capped, returning the new quantity. """
+    table = connection.ops.quote_name(Cart._meta.db_table)
+    return _upsert_sql(1, ADD_QUANTITY) + WITHIN_LIMIT_SQL.format(table=table, max=MAX_LINE_QUANTITY) + "    RETURNING quantity\n"
+
+
+def add_cart_quantity(user_id, item_id, quantity=1):
+    """ Adds ``quantity`` of the item to the user's cart. Returns (line quantity, cart total or None).
+
+        The line quantity is None (and nothing changes) if the line would go over MAX_LINE_QUANTITY.
+    """
+    if quantity > MAX_LINE_QUANTITY:
+        return None, None
+    params = [user_id, item_id, quantity, timezone.now()]
+    if connection.vendor == 'postgresql':
+        sql = UPSERT_WITH_TOTAL_SQL.format(
+            upsert=_add_line_sql(),
+            table=connection.ops.quote_name(Cart._meta.db_table),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [user_id, item_id])
+            row = cursor.fetchone()
+        return row or (None, None)
+    if connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert:
+        with connection.cursor() as cursor:
+            cursor.execute(_add_line_sql(), params)
+            row = cursor.fetchone()
+        return (row[0] if row else None), None
+    return _add_with_orm(user_id, item_id, quantity), None
+
+
+def merge_cart_quantities(user_id, quantities):
+    """ Adds {item id: quantity} to the user's cart with one multi-row upsert (e.g. a guest cart on login). """
+    upsert_cart_rows([(user_id, item_id, min(n, MAX_LINE_QUANTITY)) for item_id, n in quantities.items()], ADD_QUANTITY)
+
+
+def set_cart_quantities(user_id, quantities):
+    """ Sets {item id: quantity} in the user's cart (creating missing lines) with one multi-row upsert. """
+    upsert_cart_rows([(user_id, item_id, n) for item_id, n in quantities.items()], SET_QUANTITY)
+
+
+def upsert_cart_rows(rows, quantity=SET_QUANTITY, batch_size=500):
+    """ Writes (user id, item id, quantity) rows, ADD_QUANTITY-ing or SET_QUANTITY-ing existing lines. """
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        with transaction.atomic():
+            for user_id, item_id, n in rows:
+                if quantity == SET_QUANTITY:
+                    Cart.objects.update_or_create(user_id=user_id, item_id=item_id, defaults={'quantity': n})
+                elif _add_with_orm(user_id, item_id, n) is None:
+                    Cart.objects.filter(user_id=user_id, item_id=item_id).update(quantity=MAX_LINE_QUANTITY)
+        return
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):  # Stays under SQLite's bound-parameter limit
+            batch = rows[start:start + batch_size]
+            cursor.execute(_upsert_sql(len(batch), quantity), [value for row in batch for value in (*row, now)])
+
+
+def _add_with_orm(user_id, item_id, quantity):
+    """ The line's new quantity, or None if it would go over MAX_LINE_QUANTITY (left unchanged). """
+    lines = Cart.objects.filter(user_id=user_id, item_id=item_id)
+    within_limit = lines.filter(quantity__lte=MAX_LINE_QUANTITY - quantity)
+    with transaction.atomic():
+        if not within_limit.update(quantity=F('quantity') + quantity):
+            if lines.exists():
+                return None
+            try:
+                with transaction.atomic():
+                    Cart.objects.create(user_id=user_id, item_id=item_id, quantity=quantity)
+            except IntegrityError:  # Created concurrently: add to it
+                if not within_limit.update(quantity=F('quantity') + quantity):
+                    return None
+        return lines.values_list('quantity', flat=True).get()
@@ -21,6 +21,10 @@ urlpatterns = [
     # e.g., /cart/update/5/
     path('update/<int:item_id>/', views.update_cart, name='update_cart'),
 
+    # Apply several quantity changes at once (JSON body, used by the cart page)
+    # e.g., /cart/update/batch/
+    path('update/batch/', views.update_cart_batch, name='update_cart_batch'),
+
     # Clear all items from the cart
     # e.g., /cart/clear/
     path('clear/', views.clear_cart, name='clear_cart'),
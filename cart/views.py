@@ -1,23 +1,26 @@
 # cart/views.py
 
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseBadRequest, Http404
-from django.urls import reverse
-from .models import Cart
+from django.http import JsonResponse
+from .backends import get_cart # Cart rows for users, a signed cookie for guests
+from .badge import cart_item_count
+from .models import MAX_LINE_QUANTITY, Cart
 from menu.models import MenuItem # Import MenuItem from the menu app
 
 # -----------------------------
 # View Cart
 # -----------------------------
-@login_required
 def cart_view(request):
-    """ Displays the user's shopping cart contents. """
-    cart_items = Cart.objects.filter(user=request.user).select_related('item', 'item__category') # Optimize query
+    """ Displays the visitor's shopping cart contents (guests included). """
+    cart = get_cart(request)
+    cart_items = cart.lines()
     
-    # Calculate subtotal safely using the model method
-    subtotal = sum(item.total_price() for item in cart_items if hasattr(item, 'total_price'))
+    # Subtotal, line count and quantity (one aggregate for users, exact Decimal)
+    totals = cart.totals()
+    subtotal = totals.subtotal
     
     # Consider making delivery fee dynamic (e.g., settings, location based)
     delivery_fee = 200
@@ -27,14 +30,14 @@ def cart_view(request):
         'cart_items': cart_items,
         'subtotal': subtotal,
         'delivery_fee': delivery_fee,
-        'total_price': total_price
+        'total_price': total_price,
+        'max_quantity': MAX_LINE_QUANTITY,
     }
     return render(request, 'cart/cart.html', context)
 
 # -----------------------------
 # Add Item to Cart
 # -----------------------------
-@login_required
 def add_to_cart(request, item_id):
     """ Adds a MenuItem to the cart or increments its quantity.
         Handles both standard POST/GET requests (redirects) and AJAX requests (returns JSON).
@@ -46,40 +49,24 @@ def add_to_cart(request, item_id):
     menu_item = get_object_or_404(MenuItem, id=item_id, is_available=True) # Ensure item exists and is available
     quantity_to_add = 1 # Default quantity
 
-    # Optional: Handle quantity if submitted via standard form POST
-    # is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
-    # if request.method == 'POST' and not is_ajax:
-    #     try:
-    #         quantity_from_post = int(request.POST.get('quantity', 1))
-    #         if quantity_from_post >= 1:
-    #             quantity_to_add = quantity_from_post
-    #     except (ValueError, TypeError):
-    #         messages.error(request, "Invalid quantity submitted.")
-    #         return redirect(request.META.get('HTTP_REFERER', reverse('menu:menu_list'))) # Redirect back
-
-    # Get or create cart item using the unique_together constraint
-    cart_item, created = Cart.objects.get_or_create(
-        user=request.user,
-        item=menu_item,
-        defaults={'quantity': 0} # Start quantity at 0 if creating
-    )
-
-    # Increment quantity and save
-    cart_item.quantity += quantity_to_add
-    cart_item.save()
-
     # --- Differentiate response based on request type ---
     is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
 
-    if is_ajax:
-        # Calculate current cart count (distinct items or total quantity)
-        # cart_item_count = Cart.objects.filter(user=request.user).count() # Count distinct items
-        total_quantity = sum(item.quantity for item in Cart.objects.filter(user=request.user)) # Sum all quantities
+    # Users: one atomic upsert of the cart row (safe against double-clicks). Guests: the cookie.
+    try:
+        line_quantity = get_cart(request).add(menu_item.pk, quantity_to_add)
+    except ValueError as e: # The line (or a guest's cookie) is full
+        if is_ajax:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        messages.warning(request, str(e))
+        return redirect('cart:cart_view')
 
+    if is_ajax:
         return JsonResponse({
             'status': 'success',
             'message': f"'{menu_item.name}' added to cart.",
-            'cart_item_count': total_quantity # Send total quantity back
+            'quantity': line_quantity, # This item's new quantity in the cart
+            'cart_item_count': cart_item_count(request) # Total quantity, from the cached badge count
         })
     else:
         # Standard request: Add message and redirect
@@ -91,16 +78,13 @@ def add_to_cart(request, item_id):
 # -----------------------------
 # Remove Item from Cart
 # -----------------------------
-@login_required
-def cart_remove(request, cart_item_id): # Expects Cart item's ID
-    """ Removes a specific item entry from the user's cart. """
+def cart_remove(request, cart_item_id): # Expects Cart item's ID (the item's ID in a guest cart)
+    """ Removes a specific item entry from the visitor's cart. """
     # POST is safer for deletion actions
     # if request.method != 'POST':
     #    return HttpResponseBadRequest("POST method required.")
 
-    cart_item = get_object_or_404(Cart, id=cart_item_id, user=request.user) # Find specific cart row by its ID
-    item_name = cart_item.item.name # Get name for message before deleting
-    cart_item.delete()
+    item_name = get_cart(request).remove(cart_item_id) # 404 if it isn't in this visitor's cart
 
     messages.success(request, f"'{item_name}' removed from your cart.")
     return redirect('cart:cart_view') # Redirect back to cart
@@ -109,7 +93,6 @@ def cart_remove(request, cart_item_id): # Expects Cart item's ID
 # -----------------------------
 # Update Cart Item Quantity
 # -----------------------------
-@login_required
 def update_cart(request, item_id): # Expects MenuItem ID
     """ Updates the quantity of an item in the cart via AJAX POST request. """
     if request.method != 'POST':
@@ -121,31 +104,23 @@ def update_cart(request, item_id): # Expects MenuItem ID
 
     try:
         new_quantity = int(request.POST.get('quantity', 1))
-        if new_quantity < 0: # Cannot have negative quantity
-             raise ValueError("Quantity cannot be negative.")
+        if not 0 <= new_quantity <= MAX_LINE_QUANTITY: # No negatives, nor numbers the column can't hold
+             raise ValueError("Quantity out of range.")
 
-        # Find the cart item based on user and MenuItem ID
-        cart_item = get_object_or_404(Cart, user=request.user, item__id=item_id)
+        # Set the quantity of the visitor's line for this MenuItem (0 removes it; Cart.DoesNotExist if absent)
+        cart = get_cart(request)
+        cart_item = cart.set_quantity(item_id, new_quantity)
 
         item_total = 0
-        removed = False
-        if new_quantity == 0:
-            # Remove item if quantity is set to 0
-            cart_item.delete()
-            removed = True
-        else:
-            # Update quantity
-            cart_item.quantity = new_quantity
-            cart_item.save()
+        removed = cart_item is None
+        if not removed:
             item_total = cart_item.total_price()
 
-        # Recalculate overall cart totals
-        cart_items = Cart.objects.filter(user=request.user)
-        subtotal = sum(item.total_price() for item in cart_items if hasattr(item, 'total_price'))
+        # Recalculate overall cart totals (one aggregate, whatever the cart size)
+        totals = cart.totals()
+        subtotal = totals.subtotal
         delivery_fee = 200 # Make dynamic later
         total_price = subtotal + delivery_fee
-        # cart_item_count = cart_items.count() # Distinct items
-        total_quantity = sum(item.quantity for item in cart_items) # Sum of quantities
 
         return JsonResponse({
             'status': 'success',
@@ -154,7 +129,7 @@ def update_cart(request, item_id): # Expects MenuItem ID
             'total_price': float(total_price),
             'quantity': cart_item.quantity if not removed else 0,
             'removed': removed,
-            'cart_item_count': total_quantity # Send total quantity
+            'cart_item_count': cart_item_count(request) # Total quantity, from the cached badge count
         })
 
     except Cart.DoesNotExist:
@@ -166,16 +141,65 @@ def update_cart(request, item_id): # Expects MenuItem ID
          return JsonResponse({'status': 'error', 'message': 'An unexpected error occurred.'}, status=500)
 
 
+# -----------------------------
+# Batch Update (several quantity changes, one request)
+# -----------------------------
+MAX_BATCH_CHANGES = 100
+
+def update_cart_batch(request):
+    """ Applies several quantity changes via one AJAX POST (the cart page's debounced edits).
+        Body: {"changes": [{"item_id": 5, "quantity": 2}, ...]}; quantity 0 removes the line.
+    """
+    if request.method != 'POST':
+       return JsonResponse({'status': 'error', 'message': 'POST method required.'}, status=405)
+
+    is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+    if not is_ajax:
+         return JsonResponse({'status': 'error', 'message': 'AJAX request required.'}, status=400)
+
+    try:
+        changes = json.loads(request.body)['changes']
+        if not isinstance(changes, list) or len(changes) > MAX_BATCH_CHANGES:
+            raise ValueError("Too many changes.")
+        quantities = {} # Later changes to the same item win
+        for change in changes:
+            item_id, quantity = int(change['item_id']), int(change['quantity'])
+            if not 0 <= quantity <= MAX_LINE_QUANTITY: # No negatives, nor numbers the column can't hold
+                raise ValueError("Quantity out of range.")
+            quantities[item_id] = quantity
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid cart changes.'}, status=400)
+
+    # One transaction: a DELETE for the zeros, one multi-row upsert for the rest, then the totals
+    lines, totals = get_cart(request).set_quantities(quantities)
+    delivery_fee = 200 # Make dynamic later
+
+    return JsonResponse({
+        'status': 'success',
+        'lines': [
+            {
+                'item_id': item_id,
+                'quantity': line.quantity if line else 0,
+                'item_total': float(line.total_price()) if line else 0.0,
+                'removed': line is None,
+            }
+            for item_id, line in lines.items()
+        ],
+        'subtotal': float(totals.subtotal),
+        'total_price': float(totals.subtotal + delivery_fee),
+        'cart_item_count': totals.quantity,
+    })
+
+
 # -----------------------------
 # Clear Entire Cart
 # -----------------------------
-@login_required
 def clear_cart(request):
-    """ Removes all items from the user's cart. """
+    """ Removes all items from the visitor's cart. """
     # POST is safer for deletion actions
     # if request.method != 'POST':
     #    return HttpResponseBadRequest("POST method required.")
 
-    Cart.objects.filter(user=request.user).delete()
+    get_cart(request).clear()
     messages.success(request, "Cart cleared successfully.")
     return redirect('cart:cart_view')
\ No newline at end of file
@@ -0,0 +1,296 @@
+# cart/write_behind.py
+"""
+Write-behind carts: a logged-in user's cart lives in the cache, Cart rows
+catch up in bulk.
+
+Turned on with CART_WRITE_BEHIND = True, which makes ``get_cart`` return a
+CacheCart. Each user's cart is a handful of keys in the CART_CACHE_ALIAS
+cache (default 'default'), none of which expire:
+
+    cart:wb:<user>:items        item ids, oldest line first (missing = not loaded)
+    cart:wb:<user>:<item>       the line's quantity
+    cart:wb:<user>:dirty        set while the cart has changes the rows don't have
+    cart:wb:dirty               the user ids with that flag set
+
+Every change, "Add to cart" included, reads the cart and writes back only
+the keys it changed under a short per-user lock (``cache.add``), so
+concurrent changes can't overwrite each other and a line is checked against
+MAX_LINE_QUANTITY before anything is written. The first time a cart is
+touched it is seeded from the user's Cart rows. ``flush_carts`` (the
+``flush_carts`` management command; run it as its own Procfile process with
+``--interval 5``) writes every dirty cart back with one DELETE and one
+multi-row upsert per batch of users.
+Checkout flushes the buyer's cart first, so the order is built from rows
+that match what they saw, and ``clear`` deletes the rows straight away.
+
+Every web process and ``flush_carts`` must see the same keys, so the cache
+has to be shared: Redis, Memcached or the database cache. A LocMem or file
+cache would give each worker its own copy of a cart (and flush_carts an
+empty one), so ``cart_cache`` raises ImproperlyConfigured for them and the
+cart.E001 system check stops the site from starting. The cache must also
+keep these keys until they are flushed: no eviction pressure on
+Redis/Memcached, a MAX_ENTRIES well above the number of active carts on the
+database cache. A cart whose keys were evicted is reloaded from its rows,
+losing the changes since the last flush.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404
+
+from menu.models import MenuItem
+
+from .backends import LINE_FULL_MESSAGE, QuantitiesCart
+from .badge import forget_request_count
+from .models import MAX_LINE_QUANTITY, Cart
+from .upsert import SET_QUANTITY, upsert_cart_rows
+
+logger = logging.getLogger(__name__)
+
+ITEMS_KEY = 'cart:wb:{user_id}:items'
+LINE_KEY = 'cart:wb:{user_id}:{item_id}'
+DIRTY_KEY = 'cart:wb:{user_id}:dirty'
+DIRTY_USERS_KEY = 'cart:wb:dirty'
+LOCK_KEY = '{key}:lock'
+LOCK_TIMEOUT = 5  # Seconds; a lock left by a crashed worker frees itself
+SHARED_CACHES = (RedisCache, BaseMemcachedCache, DatabaseCache)  # Seen by every process
+
+
+def cart_cache_alias():
+    return getattr(settings, 'CART_CACHE_ALIAS', 'default')
+
+
+def cart_cache_problem():
+    """ Why the CART_CACHE_ALIAS cache can't hold write-behind carts, or None if it can. """
+    alias = cart_cache_alias()
+    backend = caches[alias]
+    if isinstance(backend, SHARED_CACHES):
+        return None
+    return (
+        f"CART_WRITE_BEHIND needs a cache shared by every process (Redis, Memcached or "
+        f"the database cache), but the {alias!r} cache (CART_CACHE_ALIAS) is a "
+        f"{type(backend).__name__}: each worker would keep its own copy of a cart."
+    )
+
+
+def cart_cache():
+    problem = cart_cache_problem()
+    if problem:
+        raise ImproperlyConfigured(problem)
+    return caches[cart_cache_alias()]
+
+
+@contextmanager
+def _locked(cache, key):
+    """ Holds ``key``'s lock (cache.add is atomic on every backend) for the block. """
+    lock = LOCK_KEY.format(key=key)
+    while not cache.add(lock, 1, LOCK_TIMEOUT):
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        cache.delete(lock)
+
+
+def _line_keys(user_id, item_ids):
+    return {LINE_KEY.format(user_id=user_id, item_id=item_id): item_id for item_id in item_ids}
+
+
+class CacheCart(QuantitiesCart):
+    """ A logged-in user's cart kept in the cache (see the module docstring). """
+
+    def __init__(self, request):
+        self.request = request
+        self.user = request.user
+        self.cache = cart_cache()
+        self.items_key = ITEMS_KEY.format(user_id=self.user.pk)
+        self._quantities = None
+
+    # --- Cache state ---
+    def _item_ids(self):
+        """ The cart's item ids, seeded from the Cart rows the first time. """
+        item_ids = self.cache.get(self.items_key)
+        if item_ids is None:
+            with _locked(self.cache, self.items_key):
+                item_ids = self.cache.get(self.items_key)
+                if item_ids is None:
+                    rows = Cart.objects.filter(user=self.user).order_by('added_at', 'pk').values_list('item_id', 'quantity')
+                    self.cache.set_many({LINE_KEY.format(user_id=self.user.pk, item_id=item_id): quantity for item_id, quantity in rows}, None)
+                    item_ids = [item_id for item_id, _ in rows]
+                    self.cache.set(self.items_key, item_ids, None)
+        return item_ids
+
+    @property
+    def quantities(self):
+        """ {item id: quantity}, oldest line first (two cache reads, once per change). """
+        if self._quantities is None:
+            keys = _line_keys(self.user.pk, self._item_ids())
+            found = self.cache.get_many(keys)
+            self._quantities = {item_id: found[key] for key, item_id in keys.items() if found.get(key, 0) > 0}
+        return self._quantities
+
+    def _write(self, old, quantities):
+        """ Stores the lines of {item id: quantity} that differ from ``old``. Call with the cart's lock held. """
+        item_ids = self.cache.get(self.items_key) or []
+        removed = [item_id for item_id in item_ids if item_id not in quantities]
+        self.cache.delete_many([LINE_KEY.format(user_id=self.user.pk, item_id=item_id) for item_id in removed])
+        changed = {item_id: n for item_id, n in quantities.items() if old.get(item_id) != n}
+        if changed:
+            self.cache.set_many({LINE_KEY.format(user_id=self.user.pk, item_id=item_id): n for item_id, n in changed.items()}, None)
+        if list(quantities) != item_ids:
+            self.cache.set(self.items_key, list(quantities), None)
+
+    def _changed(self):
+        """ Marks the cart for the next flush and drops what this request read. """
+        self._quantities = None
+        self._lines = None
+        forget_request_count(self.request)
+        _queue(self.cache, self.user.pk)
+
+    @contextmanager
+    def _editing(self):
+        """ Yields the current {item id: quantity} to change in place, then stores it. """
+        self._item_ids()  # Seed outside the lock
+        with _locked(self.cache, self.items_key):
+            self._quantities = None
+            old = self.quantities
+            quantities = dict(old)
+            yield quantities
+            self._write(old, quantities)
+        self._changed()
+
+    # --- Changes (cache only; flush_carts writes the rows) ---
+    def add(self, item_id, quantity=1):
+        with self._editing() as quantities:
+            if quantities.get(item_id, 0) + quantity > MAX_LINE_QUANTITY:
+                raise ValueError(LINE_FULL_MESSAGE)
+            quantities[item_id] = quantities.get(item_id, 0) + quantity
+        return quantities[item_id]
+
+    def merge(self, quantities):
+        with self._editing() as current:
+            for item_id, quantity in quantities.items():
+                current[item_id] = min(current.get(item_id, 0) + quantity, MAX_LINE_QUANTITY)
+
+    def set_quantity(self, item_id, quantity):
+        if item_id not in self.quantities:
+            raise Cart.DoesNotExist
+        with self._editing() as quantities:
+            if quantity == 0:
+                quantities.pop(item_id, None)
+            else:
+                quantities[item_id] = quantity
+        return self.line(item_id) if quantity else None
+
+    def set_quantities(self, quantities):
+        """ Applies {item id: quantity} (0 removes). Returns ({item id: line or None}, CartTotals). """
+        current = self.quantities
+        new = [item_id for item_id, quantity in quantities.items() if quantity and item_id not in current]
+        allowed = set(MenuItem.objects.filter(pk__in=new, is_available=True).values_list('pk', flat=True)) if new else set()
+        with self._editing() as current:
+            for item_id, quantity in quantities.items():
+                if quantity == 0:
+                    current.pop(item_id, None)
+                elif item_id in current or item_id in allowed:
+                    current[item_id] = quantity
+        return {item_id: self.line(item_id) for item_id in quantities}, self.totals()
+
+    def remove(self, line_id):
+        if line_id not in self.quantities:
+            raise Http404("Item not found in cart.")
+        name = MenuItem.objects.filter(pk=line_id).values_list('name', flat=True).first()
+        with self._editing() as quantities:
+            quantities.pop(line_id, None)
+        return name or "Item"
+
+    def clear(self):
+        """ Empties the cart and deletes its rows now (e.g. right after checkout). """
+        with self._editing() as quantities:
+            quantities.clear()
+        Cart.objects.filter(user=self.user).delete()
+
+    def flush(self):
+        """ Writes this cart's pending changes to its Cart rows (checkout calls this first). """
+        flush_carts([self.user.pk])
+
+
+def flush_carts(user_ids=None, batch_size=500):
+    """ Writes dirty carts to Cart rows; all queued ones by default. Returns how many were written.
+
+        Per batch of users: one DELETE for the lines no longer in the cache
+        and one multi-row upsert (cart.upsert) for the rest, in a transaction.
+        The dirty flags are cleared before the carts are read, so a change
+        made during the flush queues the cart again. If the write fails the
+        carts are queued again and the error is raised.
+    """
+    cache = cart_cache()
+    if user_ids is None:
+        with _locked(cache, DIRTY_USERS_KEY):
+            user_ids = cache.get(DIRTY_USERS_KEY) or set()
+            cache.delete(DIRTY_USERS_KEY)
+    flags = cache.get_many([DIRTY_KEY.format(user_id=user_id) for user_id in user_ids])
+    user_ids = [user_id for user_id in user_ids if DIRTY_KEY.format(user_id=user_id) in flags]
+    cache.delete_many([DIRTY_KEY.format(user_id=user_id) for user_id in user_ids])
+    written = 0
+    for start in range(0, len(user_ids), batch_size):
+        try:
+            written += _write_carts(cache, user_ids[start:start + batch_size])
+        except Exception:
+            for user_id in user_ids[start:]:
+                _queue(cache, user_id)
+            raise
+    return written
+
+
+def _queue(cache, user_id):
+    """ Flags the cart as dirty and lists it for flush_carts (once until it is flushed). """
+    if cache.add(DIRTY_KEY.format(user_id=user_id), 1, None):
+        with _locked(cache, DIRTY_USERS_KEY):
+            cache.set(DIRTY_USERS_KEY, (cache.get(DIRTY_USERS_KEY) or set()) | {user_id}, None)
+
+
+def _read_cart(cache, user_id):
+    """ {item id: quantity} from the cache, or None if the cart's keys were evicted. """
+    item_ids = cache.get(ITEMS_KEY.format(user_id=user_id))
+    if item_ids is None:
+        return None
+    keys = _line_keys(user_id, item_ids)
+    found = cache.get_many(keys)
+    return {item_id: found[key] for key, item_id in keys.items() if found.get(key, 0) > 0}
+
+
+def _write_carts(cache, user_ids):
+    carts = {}
+    for user_id in user_ids:
+        quantities = _read_cart(cache, user_id)
+        if quantities is None:
+            logger.warning("Write-behind cart of user %s was evicted before it was flushed.", user_id)
+        else:
+            carts[user_id] = quantities
+    if not carts:
+        return 0
+    # Items deleted since they were added would break the foreign key
+    existing = set(MenuItem.objects.filter(
+        pk__in={item_id for quantities in carts.values() for item_id in quantities}
+    ).values_list('pk', flat=True))
+    keep = Q()
+    for user_id, quantities in carts.items():
+        if quantities:
+            keep |= Q(user_id=user_id, item_id__in=list(quantities))
+    with transaction.atomic():
+        Cart.objects.filter(user_id__in=list(carts)).exclude(keep).delete()
+        upsert_cart_rows(
+            [(user_id, item_id, n) for user_id, quantities in carts.items() for item_id, n in quantities.items() if item_id in existing],
+            SET_QUANTITY,
+        )
+    return len(carts)
@@ -5,6 +5,9 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 # --- Ensure correct model imports ---
 from orders.models import Order, OrderItem # Assuming Order models are in 'orders' app
+from orders.sales import record_sales
+from cart.backends import get_cart
+from cart.badge import set_cart_count
 from cart.models import Cart
 from menu.models import MenuItem # Import MenuItem
 # --- Ensure correct form import ---
@@ -17,15 +20,18 @@ DELIVERY_FEE = Decimal('200.00')
 
 @login_required
 def checkout(request):
+    get_cart(request).flush() # Write-behind carts (cart.write_behind): the rows must match the cart first
     cart_items = Cart.objects.filter(user=request.user).select_related('item') # Optimize
-    if not cart_items.exists():
+    # Subtotal and line count from one aggregate (exact Decimal, no rows loaded)
+    totals = cart_items.totals()
+    if not totals.lines:
         messages.warning(request, "Your cart is empty. Add items before checking out.")
         # --- Use namespaced URL ---
         return redirect('cart:cart_view')
 
-    # Calculate totals using Cart model method and delivery fee
-    subtotal = sum(item.total_price() for item in cart_items if hasattr(item, 'total_price'))
+    subtotal = totals.subtotal
     total_price = subtotal + DELIVERY_FEE
+    set_cart_count(request, totals.quantity) # Navbar badge, without another query
 
     if request.method == 'POST':
         form = CheckoutForm(request.POST)
@@ -73,9 +79,10 @@ def checkout(request):
                     )
                 # Create all items efficiently
                 OrderItem.objects.bulk_create(order_items_to_create)
+                record_sales(order, order_items_to_create) # Best sellers/trending rollup (bulk_create skips signals)
 
                 # --- Clear the user's cart ---
-                cart_items.delete()
+                get_cart(request).clear() # Rows, cached cart and navbar badge
 
                 messages.success(request, "Order placed successfully! Awaiting payment confirmation.") # Updated message
 
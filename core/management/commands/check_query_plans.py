@@ -0,0 +1,108 @@
+# core/management/commands/check_query_plans.py
+"""
+Runs EXPLAIN on the queries behind the busiest pages (menu_list, cart_view,
+order_list) and fails when one of them reads a large table from end to end.
+
+The querysets come from the code the views use (menu_list_paginator,
+cart_queryset, order_list_queryset), so the plans checked are the ones the
+site actually runs. Tables with fewer than --min-rows rows are ignored: the
+planner rightly scans those instead of using an index. Plans depend on the
+data, so run this against a copy of production (after ANALYZE on PostgreSQL).
+
+Exits non-zero when a sequential scan is found, so it can gate a deploy.
+"""
+
+import re
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.http import QueryDict
+
+from cart.backends import cart_queryset
+from menu.category_tree import get_category_tree
+from menu.filters import CatalogFilters
+from menu.views import VALID_SORT_FIELDS, menu_list_paginator
+from orders.views import order_list_queryset
+
+# A full read of a table, per database. An SQLite "SCAN ... USING INDEX" walks
+# an index in order (and stops at the LIMIT), so it doesn't count.
+SEQ_SCAN_RE = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING (?:COVERING )?INDEX)'),
+}
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the menu_list/cart_view/order_list queries and fail on sequential scans of large tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=1000, help="Only flag tables with at least this many rows (default 1000).")
+        parser.add_argument('--query', action='append', default=[], help="Extra menu_list query string to check, e.g. 'category=sofas&sort_by=price_desc'. Repeatable.")
+        parser.add_argument('--user', help="Username whose cart is checked (default: the user with the biggest cart).")
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_RE.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Plan checks aren't supported on {connection.vendor}.")
+        self.min_rows = options['min_rows']
+        self.table_models = {model._meta.db_table: model for model in apps.get_models(include_auto_created=True)}
+        self.row_counts = {}
+
+        failures = []
+        for label, queryset in self._querysets(options):
+            plan = queryset.explain()
+            scans = [(table, self._row_count(table)) for table in pattern.findall(plan)]
+            large = [(table, rows) for table, rows in scans if rows is None or rows >= self.min_rows]
+            if large:
+                failures.append(label)
+                detail = ', '.join(f"{table} ({'?' if rows is None else rows} rows)" for table, rows in large)
+                self.stdout.write(self.style.ERROR(f"FAIL  {label}: sequential scan of {detail}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok    {label}"))
+            if large or options['verbosity'] > 1:
+                self.stdout.write('      ' + plan.replace('\n', '\n      '))
+
+        if failures:
+            raise CommandError(f"{len(failures)} of the checked queries scan a table with {self.min_rows}+ rows.")
+
+    # --- The queries, built by the views' own helpers ---
+    def _querysets(self, options):
+        tree = get_category_tree()
+        queries = [''] + [f'sort_by={sort_by}' for sort_by in VALID_SORT_FIELDS]
+        # The category with the most sub-categories: the biggest IN list menu_list sends
+        biggest = max(tree, key=lambda node: len(node.descendant_ids), default=None)
+        if biggest is not None:
+            queries += [
+                f'category={biggest.slug}',
+                f'category={biggest.slug}&sort_by=price_asc',
+                f'category={biggest.slug}&min_price=10000&max_price=50000&sort_by=price_desc',
+            ]
+        for query in queries + options['query']:
+            filters = CatalogFilters.from_querydict(QueryDict(query))
+            _facets, paginator = menu_list_paginator(filters, tree, use_snapshot=False)
+            yield f"menu_list ?{query}", paginator.page_queryset()
+
+        user = self._cart_user(options['user'])
+        yield f"cart_view (user {user.pk})", cart_queryset(user)
+        yield "order_list", order_list_queryset()
+
+    def _cart_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {username!r}.")
+        from cart.models import Cart
+        biggest = Cart.objects.order_by().values('user').annotate(rows=Count('pk')).order_by('-rows').first()
+        return User(pk=biggest['user'] if biggest else 0) # Nobody has a cart: the plan for an empty one
+
+    # --- Table sizes ---
+    def _row_count(self, table):
+        """ Rows in ``table`` (None for a name that isn't a model table, e.g. an alias). """
+        if table not in self.row_counts:
+            model = self.table_models.get(table)
+            self.row_counts[table] = model._base_manager.count() if model else None
+        return self.row_counts[table]
@@ -1,3 +1,46 @@
+import unittest
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from cart.models import Cart
+from menu.models import Category, MenuItem
+from orders.models import Order
+
+
+class QueryPlanTests(TestCase):
+    """ The hot-path indexes exist and check_query_plans flags sequential scans of large tables. """
+
+    def setUp(self):
+        cache.clear()
+        sofas = Category.objects.create(name="Sofas")
+        for n in range(20):
+            MenuItem.objects.create(name=f"Item {n}", price=n, category=sofas)
+        for _ in range(5):
+            Order.objects.create(customer_name="c", customer_phone="1", delivery_address="a")
+
+    def test_indexes(self):
+        for model in (MenuItem, Cart, Order):
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+            for index in model._meta.indexes:
+                self.assertIn(index.name, constraints)
+
+    def test_small_tables_pass(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        lines = out.getvalue().splitlines()
+        for label in ("menu_list ?", "menu_list ?sort_by=price_desc", "menu_list ?category=sofas",
+                      "cart_view (user 0)", "order_list"):
+            self.assertIn(f"ok    {label}", lines)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', "PostgreSQL scans these small tables")
+    def test_scans_fail(self):
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_query_plans', min_rows=1, stdout=out)
+        self.assertIn("FAIL  order_list: sequential scan of orders_order (5 rows)", out.getvalue())
@@ -0,0 +1,48 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings, read from the working directory on start.
+
+The catalog snapshot (menu.snapshot) is written to the web workers' own disk,
+so its builder can't be a separate Procfile process: once the master is ready
+it starts ``manage.py build_catalog_snapshot --interval 5`` next to the
+workers, restarts it whenever it exits and stops it on shutdown. The builder
+writes to the same stdout/stderr as gunicorn, and every start and exit is
+logged through gunicorn's error log.
+"""
+
+import subprocess
+import sys
+import threading
+import time
+
+SNAPSHOT_BUILDER = [sys.executable, 'manage.py', 'build_catalog_snapshot', '--interval', '5']
+RESTART_DELAY = 5  # Seconds before a builder that exited is started again
+
+_builder = {'process': None, 'stopping': False}
+
+
+def _supervise_snapshot_builder(server):
+    while not _builder['stopping']:
+        process = _builder['process'] = subprocess.Popen(SNAPSHOT_BUILDER)
+        server.log.info("Catalog snapshot builder started (pid %s)", process.pid)
+        status = process.wait()
+        if _builder['stopping']:
+            return
+        # Requests fall back to the ORM until it is back
+        server.log.error("Catalog snapshot builder exited with status %s; restarting in %ss", status, RESTART_DELAY)
+        time.sleep(RESTART_DELAY)
+
+
+def when_ready(server):
+    threading.Thread(target=_supervise_snapshot_builder, args=(server,), name='snapshot-builder', daemon=True).start()
+
+
+def on_exit(server):
+    _builder['stopping'] = True
+    process = _builder['process']
+    if process and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -27,14 +27,14 @@ class MenuItemAdmin(admin.ModelAdmin):
     """Admin View for Menu Items (Restaurant Menu Management)"""
     list_display = ('name', 'brand', 'category', 'price', 'is_available')
     list_filter = ('category', 'brand', 'is_available')
-    search_fields = ('name', 'description', 'category__name', 'brand__name')
+    search_fields = ('name', 'sku', 'description', 'category__name', 'brand__name')
     list_editable = ('price', 'is_available')
     readonly_fields = ('created_at', 'updated_at')
     autocomplete_fields = ['category', 'brand']
 
     fieldsets = (
         ('Basic Info', {
-            'fields': ('name', 'description', 'category', 'brand', 'price', 'image')
+            'fields': ('name', 'sku', 'description', 'category', 'brand', 'price', 'image')
         }),
         ('Status', {
             'fields': ('is_available',),
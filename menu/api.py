@@ -0,0 +1,138 @@
+# menu/api.py
+"""
+Read-only catalog API, mounted at /api/v1/ (see menu/api_urls.py).
+
+    /api/v1/products/      ?category=<slug> &brand=<id> &min_price= &max_price=
+                           &updated_since=<ISO datetime> &fields=id,name,price
+    /api/v1/products/<id>/
+    /api/v1/categories/    /api/v1/brands/
+
+Lists use cursor pagination (stable under inserts, no COUNT query).
+
+Bots mostly re-fetch the same pages, so each response body is cached under
+the catalog version and the query parameters the view reads (``cache_params``;
+anything else in the query string is ignored and can't mint new keys), with
+its ETag. A repeat
+request is answered from the cache, and a conditional one with a 304. Neither
+touches the database. Any MenuItem/Category/Brand change bumps the version
+(menu.signals), so nothing stale is served. The API is public and JSON-only,
+so responses don't depend on the visitor.
+"""
+
+import hashlib
+import math
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+
+from .category_tree import get_category_tree
+from .models import Brand, Category, MenuItem
+from .serializers import BrandSerializer, CategorySerializer, MenuItemSerializer
+from .versioning import CATALOG_VERSION, get_version
+
+API_CACHE_TIMEOUT = 60 * 60
+API_CACHE_KEY = 'menu:api:v{version}:{key}'
+
+
+class CatalogCursorPagination(CursorPagination):
+    ordering = 'id'  # Immutable and unique: cursors never skip or repeat rows
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class CachedCatalogViewSet(viewsets.ReadOnlyModelViewSet):
+    """ Read-only viewset whose GET responses are cached per catalog version and carry an ETag. """
+    pagination_class = CatalogCursorPagination
+    renderer_classes = [JSONRenderer]  # The browsable API renders per-user HTML; keep responses shareable
+    authentication_classes = []  # Public data: no session/user lookups per request
+    permission_classes = [AllowAny]
+    # The query parameters that change the response; only these go into the cache key
+    cache_params = ('cursor', 'page_size', 'fields')
+
+    def _cache_key(self, request):
+        query = [(name, request.GET.getlist(name)) for name in self.cache_params if name in request.GET]
+        raw = repr((request.get_host(), request.path, query))  # Host: pagination links are absolute
+        return API_CACHE_KEY.format(
+            version=get_version(CATALOG_VERSION), key=hashlib.md5(raw.encode()).hexdigest(),
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = self._cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response.render()
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': f'"{hashlib.md5(response.content).hexdigest()}"',
+            }
+            cache.set(key, entry, API_CACHE_TIMEOUT)
+
+        response = get_conditional_response(request, etag=entry['etag'])
+        if response is None:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        response['ETag'] = entry['etag']
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+class MenuItemViewSet(CachedCatalogViewSet):
+    serializer_class = MenuItemSerializer
+    cache_params = CachedCatalogViewSet.cache_params + (
+        'category', 'brand', 'min_price', 'max_price', 'updated_since',
+    )
+
+    def get_queryset(self):
+        queryset = MenuItem.objects.filter(is_available=True).select_related('category', 'brand')
+        params = self.request.query_params
+
+        if params.get('category'):
+            descendant_ids = get_category_tree().descendant_ids(params['category'])
+            if descendant_ids is None:
+                raise ValidationError({'category': "Unknown category slug."})
+            queryset = queryset.filter(category_id__in=descendant_ids)
+        if params.get('brand'):
+            try:
+                queryset = queryset.filter(brand_id=int(params['brand']))
+            except ValueError:
+                raise ValidationError({'brand': "Expected a brand id."})
+        for name, lookup in (('min_price', 'price__gte'), ('max_price', 'price__lte')):
+            if params.get(name):
+                try:
+                    value = float(params[name])
+                except ValueError:
+                    value = math.nan
+                if not math.isfinite(value):  # float() also takes "nan" and "inf"
+                    raise ValidationError({name: "Expected a number."})
+                queryset = queryset.filter(**{lookup: value})
+        if params.get('updated_since'):
+            since = parse_datetime(params['updated_since'])
+            if since is None:
+                raise ValidationError({'updated_since': "Expected an ISO 8601 datetime."})
+            queryset = queryset.filter(updated_at__gte=since)
+        return queryset
+
+
+class CategoryViewSet(CachedCatalogViewSet):
+    serializer_class = CategorySerializer
+    queryset = Category.objects.all()
+
+
+class BrandViewSet(CachedCatalogViewSet):
+    serializer_class = BrandSerializer
+    queryset = Brand.objects.all()
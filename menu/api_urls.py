@@ -0,0 +1,16 @@
+# menu/api_urls.py
+# Read-only catalog API, version 1 (mounted at /api/v1/ in urban/urls.py)
+
+from rest_framework.routers import DefaultRouter
+
+from . import api
+
+app_name = 'api-v1'
+
+router = DefaultRouter(trailing_slash=True)
+router.include_root_view = False
+router.register('products', api.MenuItemViewSet, basename='product')
+router.register('categories', api.CategoryViewSet, basename='category')
+router.register('brands', api.BrandViewSet, basename='brand')
+
+urlpatterns = router.urls
@@ -0,0 +1,195 @@
+# menu/autocomplete.py
+"""
+As-you-type suggestions for the shop search box.
+
+Product names, brands and categories are folded to lowercase ASCII and kept
+in one sorted array. A prefix lookup is two ``bisect`` calls, so answering a
+keystroke never touches the database. Every word start is indexed too, so
+"sofa" finds "Velvet Corner Sofa".
+
+If the exact prefix finds too little, the query is retried with every
+single-character edit (delete, swap, replace, insert) to tolerate one typo.
+Results are ordered by exactness, then by how often the product (or the
+brand's / category's products) has been ordered.
+
+The index lives in process memory. It is keyed on its own version counter
+(SUGGEST_VERSION, bumped only when item names or availability, brands or
+categories change, not by reviews, sales or trending runs), so a keystroke
+costs one cache read and no database queries. When that version moves on, or
+hourly for the popularity order, one background thread builds the new index
+while requests keep getting the old one; only a worker's very first
+suggestion waits for a build.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from django.db import connections
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .category_tree import get_category_tree
+from .models import Brand, MenuItem
+from .search import fold
+from .versioning import SUGGEST_VERSION, get_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 8
+MIN_TYPO_LENGTH = 4  # Shorter prefixes match too much once a typo is allowed
+MAX_INDEX_AGE = 60 * 60  # Orders don't bump SUGGEST_VERSION; refresh popularity hourly
+
+
+class Suggestion:
+    __slots__ = ('label', 'kind', 'url', 'popularity')
+
+    def __init__(self, label, kind, url, popularity=0):
+        self.label = label
+        self.kind = kind  # 'product', 'brand' or 'category'
+        self.url = url
+        self.popularity = popularity
+
+    def as_dict(self):
+        return {'label': self.label, 'kind': self.kind, 'url': self.url}
+
+
+class SuggestionIndex:
+    """ Sorted array of (folded key -> suggestion) for bisect prefix search. """
+
+    def __init__(self, suggestions):
+        # Most popular first, so a lower position always means a better suggestion.
+        self.suggestions = sorted(suggestions, key=lambda s: (-s.popularity, s.label))
+        pairs = set()
+        for position, suggestion in enumerate(self.suggestions):
+            words = fold(suggestion.label).split()
+            # Index the full label and every later word start.
+            for start in range(len(words)):
+                pairs.add((' '.join(words[start:]), position))
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+        self.alphabet = sorted({char for key in self.keys for char in key})
+
+    def _prefix_matches(self, prefix):
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', lo=start)
+        return self.positions[start:end]
+
+    def _edits(self, word):
+        """ Every string one delete, transposition, replacement or insertion away.
+
+            Edits at the very end are left out: dropping or appending a last
+            character only widens or narrows the prefix, it doesn't fix a typo.
+        """
+        edits = set()
+        for i in range(len(word)):
+            left, right = word[:i], word[i:]
+            for char in self.alphabet:
+                edits.add(left + char + right[1:])  # Replace
+                edits.add(left + char + right)  # Insert
+            if len(right) > 1:
+                edits.add(left + right[1:])  # Delete
+                edits.add(left + right[1] + right[0] + right[2:])  # Transpose
+        edits.discard(word)
+        return edits
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        prefix = ' '.join(fold(query).split())
+        if not prefix:
+            return []
+
+        # position -> typo penalty (0 = exact prefix, 1 = one edit away)
+        found = dict.fromkeys(self._prefix_matches(prefix), 0)
+        if len(found) < limit and len(prefix) >= MIN_TYPO_LENGTH:
+            for variant in self._edits(prefix):
+                for position in self._prefix_matches(variant):
+                    found.setdefault(position, 1)
+
+        ranked = sorted(found, key=lambda position: (found[position], position))
+        return [self.suggestions[position] for position in ranked[:limit]]
+
+    @classmethod
+    def from_catalog(cls):
+        """ Builds the index from the available catalog (three small queries + cached tree). """
+        from orders.models import OrderItem  # orders depends on menu, not the other way round
+
+        sold = Counter(dict(
+            OrderItem.objects.filter(menu_item__isnull=False)
+            .values_list('menu_item').annotate(total=Sum('quantity'))
+        ))
+        items = list(
+            MenuItem.objects.filter(is_available=True)
+            .values_list('pk', 'name', 'brand_id', 'category_id')
+        )
+        brand_sales, category_sales = Counter(), Counter()
+        suggestions = []
+        for pk, name, brand_id, category_id in items:
+            sales = sold.get(pk, 0)
+            brand_sales[brand_id] += sales
+            category_sales[category_id] += sales
+            suggestions.append(Suggestion(name, 'product', reverse('menu:menu_detail', kwargs={'item_id': pk}), sales))
+
+        list_url = reverse('menu:menu_list')
+        for pk, name in Brand.objects.values_list('pk', 'name'):
+            suggestions.append(Suggestion(name, 'brand', f"{list_url}?{urlencode({'search': name})}", brand_sales.get(pk, 0)))
+
+        for node in get_category_tree():
+            popularity = sum(category_sales.get(category_id, 0) for category_id in node.descendant_ids)
+            suggestions.append(Suggestion(node.name, 'category', f"{list_url}?category={node.slug}", popularity))
+
+        return cls(suggestions)
+
+
+_index = None
+_index_key = None
+_rebuilding = False
+_lock = threading.Lock()
+
+
+def _current_key():
+    return (get_version(SUGGEST_VERSION), int(time.time() // MAX_INDEX_AGE))
+
+
+def get_suggestion_index():
+    """ Returns this process's index; a stale one is replaced in the background. """
+    global _index, _index_key, _rebuilding
+    key = _current_key()
+    if _index is None:
+        with _lock:
+            if _index is None:  # Nothing to serve yet: build it in this request
+                _index, _index_key = SuggestionIndex.from_catalog(), key
+    elif _index_key != key and not _rebuilding:
+        with _lock:
+            start = not _rebuilding
+            _rebuilding = True
+        if start:
+            _start_rebuild(key)
+    return _index
+
+
+def _rebuild(key):
+    """ Builds the index for ``key`` and swaps it in. """
+    global _index, _index_key, _rebuilding
+    try:
+        index = SuggestionIndex.from_catalog()
+        with _lock:
+            _index, _index_key = index, key
+    finally:
+        _rebuilding = False
+
+
+def _rebuild_in_thread(key):
+    try:
+        _rebuild(key)
+    except Exception:  # Keep serving the old index; the next request tries again
+        logger.exception("Rebuilding the search suggestion index failed.")
+    finally:
+        connections.close_all()  # This thread's own connections
+
+
+def _start_rebuild(key):
+    threading.Thread(target=_rebuild_in_thread, args=(key,), name='suggestion-index', daemon=True).start()
@@ -0,0 +1,43 @@
+# menu/card_cache.py
+"""
+Rendered product cards, cached one by one.
+
+A card only changes when its item is saved (``updated_at``) or its category is
+renamed (category version), so that pair is the key. A page of cards costs one
+``get_many``; only the misses are rendered (URL reversals, storage ``.url``)
+and written back with one ``set_many``.
+"""
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .versioning import CATEGORY_VERSION, get_version
+
+CARD_TEMPLATE = 'menu/partials/product_card.html'
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+CARD_CACHE_KEY = 'menu:card:{pk}:{updated}:c{category_version}'
+
+
+def card_key(item, category_version):
+    return CARD_CACHE_KEY.format(
+        pk=item.pk, updated=int(item.updated_at.timestamp() * 1_000_000), category_version=category_version,
+    )
+
+
+def render_cards(items):
+    """ Returns [(item, card html), ...] for ``items``, in order. """
+    items = list(items)
+    category_version = get_version(CATEGORY_VERSION)
+    keys = [card_key(item, category_version) for item in items]
+    cached = cache.get_many(keys)
+
+    missing = {}
+    for key, item in zip(keys, items):
+        if key not in cached:
+            missing[key] = render_to_string(CARD_TEMPLATE, {'item': item})
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cached.update(missing)
+
+    return [(item, mark_safe(cached[key])) for key, item in zip(keys, items)]
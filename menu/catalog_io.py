@@ -0,0 +1,236 @@
+# menu/catalog_io.py
+"""
+Bulk catalog import/export (CSV or JSON Lines), used by the
+``import_catalog`` / ``export_catalog`` management commands.
+
+One row per product:
+
+    sku, name, description, price, category, brand, dimensions, material,
+    is_available, image
+
+``category`` is the path from the root, e.g. "Sofa Sets > 3-Seater";
+``brand`` is the brand name. Both are created if missing.
+
+Rows are read and written as a stream, and products are upserted
+``batch_size`` at a time with one INSERT ... ON CONFLICT (sku) DO UPDATE per
+batch, so memory stays flat however large the feed is. Brand and category
+names are resolved through in-memory maps (loaded once), and new categories
+are added inside ``delay_mptt_updates`` so the tree is rebuilt once at the
+end instead of on every insert. Bulk writes skip model signals, so the
+caller refreshes the caches and search index afterwards.
+"""
+
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .dimensions import apply_dimensions
+from .models import Brand, Category, MenuItem
+
+FIELDS = [
+    'sku', 'name', 'description', 'price', 'category', 'brand',
+    'dimensions', 'material', 'is_available', 'image',
+]
+# Columns overwritten when an existing sku is imported again. image_renditions
+# is left alone: its "source" no longer matches a changed image, so
+# build_image_renditions redoes it (and fills the size in again).
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'category', 'brand',
+    'dimensions', 'width_cm', 'height_cm', 'depth_cm',
+    'material', 'is_available', 'image', 'image_width', 'image_height', 'updated_at',
+]
+CATEGORY_SEPARATOR = ' > '
+DEFAULT_BATCH_SIZE = 1000
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class RowError(ValueError):
+    """ A feed row that can't be imported; reported and skipped. """
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+# --- Reading / writing ---
+def read_rows(stream, fmt):
+    """ Yields (line number, row dict) from a CSV or JSONL stream. """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_num, json.loads(line)
+
+
+class RowWriter:
+    """ Writes row dicts as CSV (with header) or JSONL. """
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(stream, fieldnames=FIELDS)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        else:
+            self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def category_paths(tree):
+    """ {category id: "Root > Child"} from the cached CategoryTree. """
+    paths = {}
+    for node in tree:  # Parents come before their children (tree order)
+        parent = paths.get(node.parent_id)
+        paths[node.id] = f'{parent}{CATEGORY_SEPARATOR}{node.name}' if parent else node.name
+    return paths
+
+
+def export_rows(tree):
+    """ Yields one row dict per MenuItem, streamed from the database. """
+    paths = category_paths(tree)
+    items = MenuItem.objects.order_by('pk').values_list(
+        'sku', 'name', 'description', 'price', 'category_id', 'brand__name',
+        'dimensions', 'material', 'is_available', 'image',
+    )
+    for sku, name, description, price, category_id, brand, dimensions, material, available, image in items.iterator(chunk_size=2000):
+        yield {
+            'sku': sku or '', 'name': name, 'description': description or '',
+            'price': str(price), 'category': paths.get(category_id, ''), 'brand': brand or '',
+            'dimensions': dimensions or '', 'material': material or '',
+            'is_available': 'true' if available else 'false', 'image': image or '',
+        }
+
+
+# --- Import ---
+class CatalogImporter:
+    """ Upserts feed rows by sku in batches. Use as ``with transaction.atomic(): importer.run(rows)``. """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress  # Callback(imported rows, seconds elapsed)
+        self.imported = 0
+        self.errors = []  # [(line number, message), ...]
+        self.categories_created = 0
+        self.brands_created = 0
+        self.brands = dict(Brand.objects.values_list('name', 'pk'))
+        tree = self._current_tree()
+        self.categories = {path: pk for pk, path in category_paths(tree).items()}  # path -> pk
+        # Category names are unique site-wide, so a known name under another path is the same category
+        self.category_names = {node.name: node.id for node in tree}
+
+    @staticmethod
+    def _current_tree():
+        # Straight from the database: the cached tree may be behind a previous import
+        from .category_tree import CategoryTree
+        return CategoryTree.from_database()
+
+    # --- Name resolution ---
+    def brand_id(self, name):
+        name = (name or '').strip()
+        if not name:
+            return None
+        if name not in self.brands:
+            self.brands[name] = Brand.objects.get_or_create(name=name)[0].pk
+            self.brands_created += 1
+        return self.brands[name]
+
+    def category_id(self, path):
+        parts = [part.strip() for part in (path or '').split(CATEGORY_SEPARATOR.strip()) if part.strip()]
+        parent_id = None
+        for depth in range(len(parts)):
+            key = CATEGORY_SEPARATOR.join(parts[:depth + 1])
+            if key not in self.categories and parts[depth] in self.category_names:
+                self.categories[key] = self.category_names[parts[depth]]
+            elif key not in self.categories:
+                # Tree fields are fixed up once, when delay_mptt_updates exits
+                category = Category(name=parts[depth], parent_id=parent_id)
+                category.save()
+                self.categories[key] = self.category_names[category.name] = category.pk
+                self.categories_created += 1
+            parent_id = self.categories[key]
+        return parent_id
+
+    # --- Rows ---
+    def build_item(self, row):
+        sku = (row.get('sku') or '').strip()
+        name = (row.get('name') or '').strip()
+        if not sku:
+            raise RowError("missing sku")
+        if not name:
+            raise RowError("missing name")
+        try:
+            price = Decimal(str(row.get('price', '')).strip())
+        except InvalidOperation:
+            raise RowError(f"invalid price {row.get('price')!r}")
+        if not price.is_finite() or price < 0:
+            raise RowError(f"invalid price {row.get('price')!r}")
+        available = row.get('is_available', True)
+        if isinstance(available, str):
+            available = available.strip().lower() in TRUE_VALUES if available.strip() else True
+        item = MenuItem(
+            sku=sku, name=name, description=row.get('description') or '', price=price,
+            category_id=self.category_id(row.get('category')), brand_id=self.brand_id(row.get('brand')),
+            dimensions=row.get('dimensions') or None, material=row.get('material') or None,
+            is_available=bool(available), image=row.get('image') or None, image_renditions={},
+        )
+        apply_dimensions(item)  # bulk_create skips save(), which normally does this
+        return item
+
+    def keep_image_sizes(self, batch):
+        """ Carries the stored width/height over to items whose image is unchanged (one query per batch).
+
+            The size of a changed image is unknown until its renditions are
+            built, so it goes back to NULL rather than keeping the old one.
+        """
+        stored = MenuItem.objects.filter(sku__in=list(batch)).values_list('sku', 'image', 'image_width', 'image_height')
+        for sku, image, width, height in stored:
+            item = batch[sku]
+            if (item.image.name or '') == (image or ''):
+                item.image_width, item.image_height = width, height
+
+    def flush(self, batch):
+        if not batch:
+            return
+        self.keep_image_sizes(batch)
+        MenuItem.objects.bulk_create(
+            list(batch.values()), update_conflicts=True,
+            unique_fields=['sku'], update_fields=UPDATE_FIELDS,
+        )
+        self.imported += len(batch)
+        batch.clear()
+
+    def run(self, rows):
+        """ Imports ``rows`` (from ``read_rows``). Must be called inside a transaction. """
+        started = time.monotonic()
+        batch = {}  # sku -> MenuItem: a repeated sku in one batch would upsert the same row twice
+        with Category.objects.delay_mptt_updates():
+            for line_num, row in rows:
+                try:
+                    item = self.build_item(row)
+                except RowError as exc:
+                    self.errors.append((line_num, str(exc)))
+                    continue
+                batch[item.sku] = item
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    if self.progress:
+                        self.progress(self.imported, time.monotonic() - started)
+            self.flush(batch)
+        self.elapsed = time.monotonic() - started
+        return self
+
+
+def import_catalog(rows, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    with transaction.atomic():
+        return CatalogImporter(batch_size=batch_size, progress=progress).run(rows)
@@ -0,0 +1,111 @@
+# menu/category_tree.py
+"""
+In-memory copy of the Category MPTT tree.
+
+The sidebar and the category filter only need ids, names, slugs and the
+parent/child structure. Loading that once (a single query ordered by the
+MPTT columns) and keeping it in the cache means templates can walk the tree
+without calling ``get_children`` / ``get_descendants`` per node.
+"""
+
+from django.core.cache import cache
+
+from .models import Category
+from .versioning import CATEGORY_VERSION, get_version
+
+TREE_CACHE_KEY = 'menu:category_tree:v{version}'
+TREE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class CategoryNode:
+    """ Lightweight, picklable stand-in for a Category row. """
+
+    __slots__ = ('id', 'name', 'slug', 'level', 'parent_id', 'children', 'descendant_ids')
+
+    def __init__(self, id, name, slug, level, parent_id):
+        self.id = id
+        self.name = name
+        self.slug = slug
+        self.level = level
+        self.parent_id = parent_id
+        self.children = []
+        self.descendant_ids = frozenset()  # Includes the node itself
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_children(self):
+        """ Same name as the MPTT method so templates can use either. """
+        return self.children
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f"<CategoryNode {self.slug}>"
+
+
+class CategoryTree:
+    """ The whole category forest, indexed by id and by slug. """
+
+    def __init__(self, nodes):
+        # ``nodes`` must be in tree order (tree_id, lft): parents before children.
+        self.nodes = list(nodes)
+        self.by_id = {node.id: node for node in self.nodes}
+        self.by_slug = {node.slug: node for node in self.nodes}
+        self.roots = []
+
+        for node in self.nodes:
+            parent = self.by_id.get(node.parent_id)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                parent.children.append(node)
+
+        # Children come after their parent, so walking backwards finishes every
+        # subtree before the node that owns it.
+        for node in reversed(self.nodes):
+            ids = {node.id}
+            for child in node.children:
+                ids.update(child.descendant_ids)
+            node.descendant_ids = frozenset(ids)
+
+        # slug -> sorted primary keys of the node and all its descendants, ready
+        # to be dropped into a ``category_id IN (...)`` filter.
+        self.descendant_index = {
+            node.slug: tuple(sorted(node.descendant_ids)) for node in self.nodes
+        }
+
+    def get(self, slug):
+        """ Returns the node for ``slug`` or None. """
+        return self.by_slug.get(slug)
+
+    def descendant_ids(self, slug):
+        """ Category ids under ``slug`` (itself included), or None for an unknown slug. """
+        return self.descendant_index.get(slug)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @classmethod
+    def from_database(cls):
+        """ Builds the tree from a single query. """
+        rows = (
+            Category.objects.order_by('tree_id', 'lft')
+            .values_list('id', 'name', 'slug', 'level', 'parent_id')
+        )
+        return cls(CategoryNode(*row) for row in rows)
+
+
+def get_category_tree():
+    """ Returns the cached tree for the current category version, building it on a miss. """
+    key = TREE_CACHE_KEY.format(version=get_version(CATEGORY_VERSION))
+    tree = cache.get(key)
+    if tree is None:
+        tree = CategoryTree.from_database()
+        cache.set(key, tree, TREE_CACHE_TIMEOUT)
+    return tree
@@ -0,0 +1,133 @@
+# menu/columnar.py
+"""
+Vectorized query engine for the catalog snapshot (menu.snapshot).
+
+With NumPy installed, every snapshot column is wrapped with ``np.frombuffer``
+(still zero-copy on the mapped pages) and a menu_list query is a handful of
+whole-column operations instead of a Python loop over the rows:
+
+    base     = price range & size ranges                  (boolean masks)
+    selected = base & isin(category, descendant ids) & isin(brand, ...) & ...
+    facets   = np.unique(brand[base & every other facet's mask]), ...
+    order    = lexsort((id, sort column)), reversed for descending sorts
+
+Only the page of ids that is shown is then loaded from the database.
+
+Prices are integer cents and sizes integer tenths of a cm, so thresholds
+are rounded towards the inside of the range (ceil for a minimum, floor for a
+maximum). That matches the Decimal comparisons the ORM and the row-by-row
+engine make. Without NumPy menu_list doesn't use the snapshot at all:
+menu.snapshot.RowEngine gives the same results one row at a time, but is
+slower than the ORM query, so it only serves as the reference for the tests
+and ``benchmark_catalog_engines``.
+"""
+
+import math
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:  # Optional: menu_list queries the database instead
+    np = None
+
+from .facets import FacetCounts
+from .snapshot import COLUMNS, SORT_COLUMNS
+
+
+def numpy_available():
+    return np is not None
+
+
+def _ceil(value):
+    return math.ceil(value) if isinstance(value, Decimal) else value
+
+
+def _floor(value):
+    return math.floor(value) if isinstance(value, Decimal) else value
+
+
+def _exact(value):
+    """ A cursor value as something NumPy compares exactly with an integer column. """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def _count(values, skip):
+    """ {value: occurrences} of a 1-d array, leaving out ``skip`` (the column's "none" code). """
+    found, counts = np.unique(values, return_counts=True)
+    return {int(value): int(n) for value, n in zip(found.tolist(), counts.tolist()) if value != skip}
+
+
+class ColumnarEngine:
+    """ NumPy engine over a CatalogSnapshot's columns. """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.arrays = {
+            name: np.frombuffer(snapshot.columns[name], dtype=np.dtype(typecode))
+            for name, typecode in COLUMNS.items()
+        }
+
+    def search(self, query, ordering):
+        arrays = self.arrays
+        price = arrays['price']
+
+        base = np.ones(self.snapshot.count, dtype=bool)
+        if query.low is not None:
+            base &= price >= _ceil(query.low)
+        if query.high is not None:
+            base &= price <= _floor(query.high)
+        for column, op, limit in query.sizes:
+            values = arrays[column]
+            base &= (values >= _ceil(limit)) if op == 'gte' else (values <= _floor(limit))
+            base &= values >= 0  # Unparsed size (NULL) never matches
+
+        # Price band index per row, first matching band wins (like the SQL CASE); -1 for none
+        band = np.full(self.snapshot.count, -1, dtype=np.int8)
+        for index, (_, lo, hi) in enumerate(query.bands):
+            in_band = band == -1
+            if lo is not None:
+                in_band &= price >= lo * 100
+            if hi is not None:
+                in_band &= price < hi * 100
+            band[in_band] = index
+
+        # Each facet is counted over the rows matching every *other* facet (see menu.facets)
+        everything = np.ones(self.snapshot.count, dtype=bool)
+        in_category = everything if query.category_ids is None else np.isin(arrays['category'], np.fromiter(query.category_ids, dtype=np.int64))
+        in_brand = everything if not query.brand_ids else np.isin(arrays['brand'], np.fromiter(query.brand_ids, dtype=np.int64))
+        in_material = everything if not query.filter_materials else np.isin(arrays['material'], np.fromiter(query.material_ids, dtype=np.int32))
+        band_names = [name for name, _, _ in query.bands]
+        in_band = everything if not query.selected_bands else np.isin(band, np.array([band_names.index(name) for name in query.selected_bands], dtype=np.int8))
+
+        others = base & in_brand & in_material & in_band  # All but the category
+        selected = others & in_category
+        brands = _count(arrays['brand'][base & in_category & in_material & in_band], skip=0)
+        materials = _count(arrays['material'][base & in_category & in_brand & in_band], skip=-1)
+        bands = _count(band[base & in_category & in_brand & in_material], skip=-1)
+        counts = FacetCounts.from_counts(
+            query.filters, query.category_tree, total=int(selected.sum()),
+            brands=brands, brand_names={pk: self.snapshot.brands.get(pk) for pk in brands},
+            materials={self.snapshot.materials[code]: n for code, n in materials.items()},
+            bands={band_names[code]: n for code, n in bands.items()},
+            categories=_count(arrays['category'][others], skip=None),
+        )
+
+        positions = np.flatnonzero(selected)
+        sort_values = arrays[SORT_COLUMNS[ordering.lstrip('-')]][positions]
+        positions = positions[np.lexsort((arrays['id'][positions], sort_values))]  # Last key sorts first
+        if ordering.startswith('-'):
+            positions = positions[::-1]  # Descending on both the value and the pk tiebreaker
+        return counts, positions
+
+    def start_after(self, positions, column, key, descending):
+        """ Index in ``positions`` of the first row after the cursor ``key`` (value, pk). """
+        value, pk = _exact(key[0]), key[1]
+        values, ids = self.arrays[column][positions], self.arrays['id'][positions]
+        if descending:
+            after = (values < value) | ((values == value) & (ids < pk))
+        else:
+            after = (values > value) | ((values == value) & (ids > pk))
+        hits = np.flatnonzero(after)
+        return int(hits[0]) if len(hits) else len(positions)
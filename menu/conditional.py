@@ -0,0 +1,106 @@
+# menu/conditional.py
+"""
+ETag validators for the shop pages, for Django's ``condition`` decorator.
+
+They are cheap on purpose: menu_list's ETag is the catalog version plus the
+normalized filters (no query at all), menu_detail's reads two timestamps with
+one ``values_list`` query instead of loading the item. A matching
+If-None-Match then gets a 304 before any template is rendered.
+
+The cached pages still contain per-visitor holes (menu.page_cache), so every
+ETag also folds in the visitor's part: the CSRF cookie, the cart count (a
+guest's comes from their cart cookie, without a query) and, for logged-in
+users, their id.
+
+There is no Last-Modified: a product page also shows its related items, which
+change when ``build_recommendations`` runs without touching the item, so
+If-Modified-Since alone would keep answering 304 with stale neighbours. The
+ETag covers them through the catalog version, which that run bumps.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .filters import CatalogFilters
+from .models import MenuItem
+from .versioning import CATALOG_VERSION, get_version
+
+
+def _visitor_parts(request):
+    """ The per-visitor inputs of a page, or None if the page can't be validated (flash messages pending). """
+    if len(messages.get_messages(request)):
+        return None
+    from cart.badge import cart_item_count  # cart depends on menu, not the other way round
+    parts = [request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''), cart_item_count(request)]
+    if request.user.is_authenticated:
+        parts.append(request.user.pk)
+    return parts
+
+
+def _is_personal(request):
+    """ Whether the page shows anything of the visitor's own (logged in, or a guest cart). """
+    from cart.badge import cart_item_count
+    return request.user.is_authenticated or cart_item_count(request) > 0
+
+
+def _etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def menu_list_params(request):
+    """ The normalized parameters menu_list's output depends on (also its page cache key).
+
+        The search text is kept as typed as well: the page shows it in the
+        search box, so "SOFA" and "Sofa" are different pages.
+    """
+    filters = CatalogFilters.from_querydict(request.GET)
+    return (filters.as_tuple(), filters.search, request.GET.get('cursor'), bool(request.GET.get('fragment')))
+
+
+def menu_list_etag(request):
+    visitor = _visitor_parts(request)
+    if visitor is None:
+        return None
+    return _etag('list', get_version(CATALOG_VERSION), menu_list_params(request), visitor)
+
+
+def _item_timestamps(request, item_id):
+    """ (item.updated_at, category.updated_at) with one query, memoized on the request. """
+    cache_attr = f'_menu_item_stamps_{item_id}'
+    if not hasattr(request, cache_attr):
+        row = (
+            MenuItem.objects.filter(pk=item_id, is_available=True)
+            .values_list('updated_at', 'category__updated_at').first()
+        )
+        setattr(request, cache_attr, row)
+    return getattr(request, cache_attr)
+
+
+def menu_detail_etag(request, item_id):
+    stamps = _item_timestamps(request, item_id)
+    visitor = _visitor_parts(request)
+    if stamps is None or visitor is None:
+        return None  # Unknown item: let the view 404
+    # The catalog version covers the "related items" block, which other items' saves can change.
+    return _etag('detail', item_id, stamps, get_version(CATALOG_VERSION), visitor)
+
+
+def revalidate(view_func):
+    """ Cache-Control/Vary for the shop pages: browsers and CDNs may keep a copy but must revalidate it.
+
+        Applied outside ``condition`` so 304 responses carry the same headers.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if _is_personal(request):
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+    return wrapper
@@ -0,0 +1,104 @@
+# menu/dimensions.py
+"""
+Parses the free-text ``MenuItem.dimensions`` into width/height/depth in cm.
+
+Handles the ways sizes get typed into the admin:
+
+    "W: 85in, H: 30in, D: 34in"
+    "Width 220cm x Depth 95cm x Height 80cm"
+    "220 x 95 x 80 cm"            (unlabelled: width x depth x height)
+    "W 2.2m D 950mm H 31.5\\""
+    "L 180 x W 90 x H 75 cm"       (length is the width, width the depth)
+    "3 seater sofa 200cm wide"     (seat counts are not sizes)
+
+Labelled values are placed first; unlabelled ones then fill the sides that
+are still empty, in width x depth x height order. A value without its own
+unit takes the unit written after the last number (or cm if there is none).
+Anything that can't be read is left as None.
+"""
+
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+TO_CM = {
+    'mm': Decimal('0.1'), 'cm': Decimal('1'), 'm': Decimal('100'),
+    'in': Decimal('2.54'), 'inch': Decimal('2.54'), 'inches': Decimal('2.54'), '"': Decimal('2.54'), "''": Decimal('2.54'),
+    'ft': Decimal('30.48'), 'feet': Decimal('30.48'), "'": Decimal('30.48'),
+}
+LABELS = {
+    'w': 'width', 'width': 'width', 'wide': 'width',
+    'l': 'width', 'length': 'width', 'long': 'width',  # A sofa's "length" is its width
+    'h': 'height', 'height': 'height', 'high': 'height', 'tall': 'height',
+    'd': 'depth', 'depth': 'depth', 'deep': 'depth',
+}
+UNLABELLED_ORDER = ('width', 'depth', 'height')  # Catalogue convention: W x D x H
+MAX_CM = Decimal('9999.9')  # Fits the column; bigger means a typo
+
+_UNIT = r"(mm|cm|m|inches|inch|in|ft|feet|''|\"|')"
+_VALUE_RE = re.compile(
+    r"(?:\b(?P<label>width|length|height|depth|wide|long|high|tall|deep|[whdl])\b\s*[:=]?\s*)?"
+    r"(?P<number>\d+(?:[.,]\d+)?)\s*(?P<unit>" + _UNIT[1:-1] + r")?(?![a-z])",
+    re.IGNORECASE,
+)
+_SEATS_RE = re.compile(r"^\s*-?\s*seat(?:er|ers|s)?\b", re.IGNORECASE)  # "3 seater", "2-seater", "4 seats"
+_TRAILING_LABEL_RE = re.compile(r"^\s*\(?\s*(width|length|height|depth|wide|long|high|tall|deep|[whdl])\b", re.IGNORECASE)
+
+
+def parse_dimensions(text):
+    """ Returns {'width': Decimal cm | None, 'height': ..., 'depth': ...}. """
+    result = {'width': None, 'height': None, 'depth': None}
+    if not text:
+        return result
+
+    values = []  # [(label or None, number, unit or None), ...]
+    for match in _VALUE_RE.finditer(text):
+        if _SEATS_RE.match(text[match.end():]):
+            continue
+        label = match.group('label')
+        if label is None:
+            # "85in W" / "85 (W)": label written after the value
+            after = _TRAILING_LABEL_RE.match(text[match.end():])
+            label = after.group(1) if after else None
+        unit = match.group('unit')
+        values.append((
+            label.lower() if label else None,
+            Decimal(match.group('number').replace(',', '.')),
+            unit.lower() if unit else None,
+        ))
+    if not values:
+        return result
+    if len(values) == 1 and values[0][0] is None and values[0][2] is None:
+        return result  # A lone bare number ("3 seater") isn't a size
+
+    labels = LABELS
+    if any(label in ('l', 'length', 'long') for label, _, _ in values):
+        labels = {**LABELS, 'w': 'depth', 'width': 'depth', 'wide': 'depth'}  # "L x W x H": W is the depth
+    values = [(labels[label] if label else None, number, unit) for label, number, unit in values]
+
+    default_unit = next((unit for _, _, unit in reversed(values) if unit), 'cm')
+    labelled = [value for value in values if value[0] is not None]
+    unlabelled = [value for value in values if value[0] is None]
+    free_sides = iter(UNLABELLED_ORDER)
+    for label, number, unit in labelled + unlabelled:
+        if label is None:
+            label = next((name for name in free_sides if result[name] is None), None)
+            if label is None:
+                continue
+        if result[label] is not None:
+            continue  # Keep the first value given for each side
+        cm = (number * TO_CM[unit or default_unit]).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+        if Decimal('0') < cm <= MAX_CM:
+            result[label] = cm
+    return result
+
+
+def apply_dimensions(item):
+    """ Sets ``item``'s width_cm/height_cm/depth_cm from its dimensions text. Returns True if they changed. """
+    parsed = parse_dimensions(item.dimensions)
+    changed = False
+    for side, value in parsed.items():
+        field = f'{side}_cm'
+        if getattr(item, field) != value:
+            setattr(item, field, value)
+            changed = True
+    return changed
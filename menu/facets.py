@@ -0,0 +1,142 @@
+# menu/facets.py
+"""
+Brand / category / material / price band counts for the product grid.
+
+All four facets come from ONE grouped aggregate over the items matching the
+search and price range:
+
+    SELECT brand_id, brand.name, category_id, material, <price band>, COUNT(*)
+    ... GROUP BY 1, 2, 3, 4, 5
+
+The result is small (one row per distinct combination, not per product) and
+is folded into the counts in Python. Each facet is counted "disjunctively":
+it honours every *other* active selection but not its own, so ticking one
+brand still shows how many items the other brands would add.
+
+Category, brand, material and price band selections don't change the
+grouped rows, so the rows are cached per (catalog version, search/price key)
+and shared by every combination of ticked boxes.
+"""
+
+from collections import Counter, namedtuple
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Value, When
+
+from .filters import PRICE_BAND_LABELS, PRICE_BANDS, price_band_q
+from .versioning import CATALOG_VERSION, get_version
+
+FACET_CACHE_TIMEOUT = 60 * 10
+FACET_CACHE_KEY = 'menu:facets:v{version}:{key}'
+
+FacetRow = namedtuple('FacetRow', 'brand_id brand_name category_id material band count')
+FacetOption = namedtuple('FacetOption', 'value label count selected')
+
+
+def _price_band_expression():
+    return Case(
+        *[When(price_band_q(band), then=Value(band)) for band in PRICE_BANDS],
+        default=Value(''), output_field=CharField(),
+    )
+
+
+def facet_rows(filters, category_tree):
+    """ The grouped (brand, category, material, band) -> count rows, cached. """
+    key = FACET_CACHE_KEY.format(
+        version=get_version(CATALOG_VERSION),
+        key=filters.key(include_category=False, include_facets=False, include_sort=False),
+    )
+    rows = cache.get(key)
+    if rows is None:
+        rows = query_facet_rows(filters, category_tree)
+        cache.set(key, rows, FACET_CACHE_TIMEOUT)
+    return rows
+
+
+def query_facet_rows(filters, category_tree):
+    """ The grouped rows straight from the database (``facet_rows`` without the cache). """
+    queryset = filters.base_queryset(category_tree, include_category=False)
+    return [
+        FacetRow(*row) for row in
+        queryset.annotate(band=_price_band_expression())
+        .values_list('brand_id', 'brand__name', 'category_id', 'material', 'band')
+        .annotate(count=Count('pk'))
+        .order_by()  # Meta.ordering would otherwise join the GROUP BY
+    ]
+
+
+class FacetCounts:
+    """ Per-facet option lists (FacetOption) plus the total for the current selection. """
+
+    def __init__(self, filters, category_tree, rows):
+        category_ids = None
+        if filters.category:
+            category_ids = category_tree.descendant_ids(filters.category)
+
+        brands, materials, bands, categories = Counter(), Counter(), Counter(), Counter()
+        brand_names = {}
+        self.total = 0
+        for row in rows:
+            in_category = category_ids is None or row.category_id in category_ids
+            in_brand = not filters.brands or row.brand_id in filters.brands
+            in_material = not filters.materials or row.material in filters.materials
+            in_band = not filters.price_bands or row.band in filters.price_bands
+
+            if in_brand and in_material and in_band:
+                categories[row.category_id] += row.count
+                if in_category:
+                    self.total += row.count
+            if not in_category:
+                continue
+            if in_material and in_band and row.brand_id is not None:
+                brands[row.brand_id] += row.count
+                brand_names[row.brand_id] = row.brand_name
+            if in_brand and in_band and row.material:
+                materials[row.material] += row.count
+            if in_brand and in_material and row.band:
+                bands[row.band] += row.count
+
+        self._set_options(filters, category_tree, brands, brand_names, materials, bands, categories)
+
+    @classmethod
+    def from_counts(cls, filters, category_tree, total, brands, brand_names, materials, bands, categories):
+        """ Builds the counts from {value: count} dicts computed elsewhere (menu.columnar). """
+        counts = cls.__new__(cls)
+        counts.total = total
+        counts._set_options(filters, category_tree, brands, brand_names, materials, bands, categories)
+        return counts
+
+    def _set_options(self, filters, category_tree, brands, brand_names, materials, bands, categories):
+        self.brands = sorted(
+            (FacetOption(pk, brand_names[pk], n, pk in filters.brands) for pk, n in brands.items()),
+            key=lambda option: option.label.lower(),
+        )
+        self.materials = sorted(
+            (FacetOption(m, m, n, m in filters.materials) for m, n in materials.items()),
+            key=lambda option: option.label.lower(),
+        )
+        # Bands keep their natural (cheapest first) order and show even when empty
+        self.price_bands = [
+            FacetOption(band, PRICE_BAND_LABELS[band], bands.get(band, 0), band in filters.price_bands)
+            for band in PRICE_BANDS
+        ]
+        # Roll each category's count up to its ancestors via the cached descendant sets
+        self.categories = {
+            node.id: sum(categories.get(pk, 0) for pk in node.descendant_ids)
+            for node in category_tree
+        }
+
+
+class FacetResult:
+    """ The filtered queryset and the facet counts that describe it. """
+
+    def __init__(self, queryset, counts):
+        self.queryset = queryset
+        self.counts = counts
+
+
+def facet_search(filters, category_tree):
+    """ Returns FacetResult(queryset, counts) for ``filters``: one aggregate (or a cache hit) for the counts. """
+    rows = facet_rows(filters, category_tree)
+    queryset = filters.apply_facets(filters.base_queryset(category_tree))
+    return FacetResult(queryset, FacetCounts(filters, category_tree, rows))
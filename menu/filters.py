@@ -0,0 +1,203 @@
+# menu/filters.py
+"""
+The menu_list query parameters, parsed once and normalized.
+
+Keeping them in one object gives the view, the facet engine and the caches the
+same idea of "which filters are active": two URLs that differ only in
+parameter order, blank values or repeated values produce the same ``key()``.
+"""
+
+import hashlib
+import math
+
+from django.db.models import Q
+
+from .models import MenuItem
+from .search import get_search_backend
+
+# --- Price bands for the price facet (KES): key -> (min inclusive, max exclusive) ---
+PRICE_BANDS = {
+    'under-20k': (None, 20000),
+    '20k-50k': (20000, 50000),
+    '50k-100k': (50000, 100000),
+    'over-100k': (100000, None),
+}
+PRICE_BAND_LABELS = {
+    'under-20k': "Under KES 20,000",
+    '20k-50k': "KES 20,000 - 50,000",
+    '50k-100k': "KES 50,000 - 100,000",
+    'over-100k': "Over KES 100,000",
+}
+
+
+# --- Size ranges (cm), served by the (is_available, <side>_cm) indexes ---
+SIZE_FILTERS = {
+    'min_width': 'width_cm__gte', 'max_width': 'width_cm__lte',
+    'min_depth': 'depth_cm__gte', 'max_depth': 'depth_cm__lte',
+    'min_height': 'height_cm__gte', 'max_height': 'height_cm__lte',
+}
+
+
+def price_band_q(band):
+    """ Q object matching prices inside ``band``. """
+    low, high = PRICE_BANDS[band]
+    q = Q()
+    if low is not None:
+        q &= Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+def _clean(value):
+    value = (value or '').strip()
+    return value or None
+
+
+def _number(raw):
+    """ float(raw) for a finite number; ValueError otherwise (float() alone accepts "nan" and "inf"). """
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(f"Not a finite number: {raw!r}")
+    return value
+
+
+class CatalogFilters:
+    """ Normalized filter/sort state for the product grid. """
+
+    def __init__(self, category=None, search=None, min_price=None, max_price=None,
+                 sort_by=None, brands=(), materials=(), price_bands=(), sizes=None):
+        self.category = category
+        self.search = search
+        self.min_price = min_price
+        self.max_price = max_price
+        self.sizes = {name: value for name, value in (sizes or {}).items() if value is not None}
+        self.sort_by = sort_by
+        self.brands = tuple(sorted(set(brands)))
+        self.materials = tuple(sorted(set(materials)))
+        self.price_bands = tuple(sorted(set(price_bands) & PRICE_BANDS.keys()))
+        self.errors = []
+
+    @classmethod
+    def from_querydict(cls, params):
+        """ Builds the filters from request.GET, collecting user-facing errors instead of raising. """
+        errors = []
+        prices = {}
+        for name in ('min_price', 'max_price'):
+            raw = _clean(params.get(name))
+            if raw is not None:
+                try:
+                    prices[name] = _number(raw)
+                except ValueError:
+                    errors.append("Invalid price value entered.")
+
+        sizes = {}
+        for name in SIZE_FILTERS:
+            raw = _clean(params.get(name))
+            if raw is not None:
+                try:
+                    sizes[name] = _number(raw)
+                except ValueError:
+                    errors.append("Invalid size value entered.")
+
+        brands = []
+        for raw in params.getlist('brand'):
+            try:
+                brands.append(int(raw))
+            except ValueError:
+                pass
+
+        filters = cls(
+            category=_clean(params.get('category')),
+            search=_clean(params.get('search')),
+            min_price=prices.get('min_price'),
+            max_price=prices.get('max_price'),
+            sort_by=_clean(params.get('sort_by')),
+            brands=brands,
+            materials=[m for m in (_clean(v) for v in params.getlist('material')) if m],
+            price_bands=params.getlist('price_band'),
+            sizes=sizes,
+        )
+        filters.errors = sorted(set(errors))
+        return filters
+
+    def query_params(self, exclude=()):
+        """ [(name, value), ...] of the active filters, for links and hidden form inputs. """
+        params = [
+            ('category', self.category), ('search', self.search),
+            ('min_price', self.min_price), ('max_price', self.max_price),
+            ('sort_by', self.sort_by),
+        ]
+        params += [(name, self.sizes.get(name)) for name in SIZE_FILTERS]
+        params += [('brand', brand) for brand in self.brands]
+        params += [('material', material) for material in self.materials]
+        params += [('price_band', band) for band in self.price_bands]
+        return [(name, value) for name, value in params if value is not None and name not in exclude]
+
+    # --- Normalized keys ---
+    def as_tuple(self, include_category=True, include_facets=True, include_sort=True):
+        parts = [
+            ('search', self.search.lower() if self.search else None),
+            ('min_price', self.min_price), ('max_price', self.max_price),
+        ]
+        parts += [(name, self.sizes.get(name)) for name in SIZE_FILTERS]
+        if include_category:
+            parts.append(('category', self.category))
+        if include_facets:
+            parts += [('brand', self.brands), ('material', self.materials), ('price_band', self.price_bands)]
+        if include_sort:
+            parts.append(('sort_by', self.sort_by))
+        return tuple((name, value) for name, value in parts if value not in (None, ()))
+
+    def key(self, **kwargs):
+        """ Short stable hash of the active filters, for cache keys. """
+        return hashlib.md5(repr(self.as_tuple(**kwargs)).encode()).hexdigest()
+
+    @property
+    def has_facets(self):
+        return bool(self.brands or self.materials or self.price_bands)
+
+    # --- Querysets ---
+    def base_queryset(self, category_tree, include_category=True):
+        """ Available items narrowed by everything except the brand/material/price band facets.
+
+            Also records an error for an unknown category slug.
+        """
+        queryset = MenuItem.objects.filter(is_available=True).select_related('category')
+
+        if self.category and include_category:
+            # Precomputed per category version: a plain IN on the indexed FK, no tree query
+            descendant_ids = category_tree.descendant_ids(self.category)
+            if descendant_ids is not None:
+                queryset = queryset.filter(category_id__in=descendant_ids)
+            elif "Selected category not found." not in self.errors:
+                self.errors.append("Selected category not found.")
+
+        if self.search:
+            # Ranked full-text search; the other filters stay in the same query
+            queryset = get_search_backend().search(queryset, self.search)
+
+        if self.min_price is not None:
+            queryset = queryset.filter(price__gte=self.min_price)
+        if self.max_price is not None:
+            queryset = queryset.filter(price__lte=self.max_price)
+        if self.sizes:
+            # Items whose size couldn't be parsed (NULL) drop out of a size-filtered list
+            queryset = queryset.filter(**{SIZE_FILTERS[name]: value for name, value in self.sizes.items()})
+        return queryset
+
+    def apply_facets(self, queryset):
+        """ Narrows ``queryset`` by the selected brand/material/price band facets. """
+        if self.brands:
+            queryset = queryset.filter(brand_id__in=self.brands)
+        if self.materials:
+            queryset = queryset.filter(material__in=self.materials)
+        if self.price_bands:
+            bands = Q()
+            for band in self.price_bands:
+                bands |= price_band_q(band)
+            queryset = queryset.filter(bands)
+        return queryset
+
+    def queryset(self, category_tree):
+        return self.apply_facets(self.base_queryset(category_tree))
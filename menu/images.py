@@ -0,0 +1,129 @@
+# menu/images.py
+"""
+Resized WebP (and AVIF, where Pillow can write it) copies of MenuItem images.
+
+The shop grid used to send every visitor the full-size upload. Now each image
+gets a set of renditions at a few widths, saved next to the original through
+the image field's own storage (local FileSystemStorage in development,
+Cloudinary in production), and the templates offer them via srcset.
+
+MenuItem.image_renditions records what exists:
+
+    {"source": "menu_items/sofa.jpg",
+     "webp": {"320": "menu_items/renditions/sofa-jpg-320.webp", ...},
+     "avif": {...}}
+
+``source`` tells whether the renditions still belong to the current image.
+Building them means a download and up to six uploads, so it never happens in
+the request that saved the item: ``manage.py build_image_renditions
+--interval 10`` runs as the Procfile's ``renditions`` process and picks up
+new and changed images within seconds of the upload. Until then the
+templates serve the original upload.
+"""
+
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import MenuItem
+
+RENDITION_WIDTHS = (320, 640, 960)
+RENDITION_DIR = 'menu_items/renditions'
+QUALITY = {'avif': 55, 'webp': 78}
+
+
+def rendition_formats():
+    """ Formats this Pillow build can write, best first. AVIF needs Pillow >= 11.2 or pillow-avif-plugin. """
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin on older Pillow)
+    except ImportError:
+        pass
+    Image.init()
+    return [fmt for fmt in ('avif', 'webp') if fmt.upper() in Image.SAVE]
+
+
+def image_storage():
+    return MenuItem._meta.get_field('image').storage
+
+
+def needs_renditions(item):
+    return bool(item.image) and (item.image_renditions or {}).get('source') != item.image.name
+
+
+def items_needing_renditions(force=False):
+    """ [(item id, image name), ...] for the images without up-to-date renditions. """
+    items = MenuItem.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image', 'image_renditions')
+    return [(item.pk, item.image.name) for item in items.iterator() if force or needs_renditions(item)]
+
+
+def generate_renditions(name, storage=None):
+    """ Writes the renditions of the stored image ``name``; returns the fields to save on the item.
+
+        Runs without database access, so it can be used from worker processes.
+    """
+    storage = storage or image_storage()
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)  # Phone photos are often stored sideways
+        image.load()
+
+    width, height = image.size
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+
+    # "sofa.jpg" -> "sofa-jpg": keeps sofa.jpg and sofa.png from sharing renditions
+    stem = os.path.basename(name).replace('.', '-')
+    renditions = {'source': name}
+    # Never upscale: widths above the original collapse into one copy at full size
+    widths = sorted({min(target, width) for target in RENDITION_WIDTHS})
+    for fmt in rendition_formats():
+        renditions[fmt] = {}
+        for target in widths:
+            resized = image if target == width else image.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS
+            )
+            buffer = BytesIO()
+            resized.save(buffer, format=fmt.upper(), quality=QUALITY[fmt])
+            path = f'{RENDITION_DIR}/{stem}-{target}.{fmt}'
+            if storage.exists(path):
+                storage.delete(path)  # Keep the name stable instead of getting a random suffix
+            renditions[fmt][str(target)] = storage.save(path, ContentFile(buffer.getvalue()))
+
+    return {'image_width': width, 'image_height': height, 'image_renditions': renditions}
+
+
+def save_renditions(item_id, fields):
+    """ Stores the result of ``generate_renditions`` without re-running the save signals.
+
+        ``updated_at`` moves too, so the cached product card picks up the srcset.
+    """
+    from .versioning import CATALOG_VERSION, bump_version_on_commit
+
+    MenuItem.objects.filter(pk=item_id).update(updated_at=timezone.now(), **fields)
+    bump_version_on_commit(CATALOG_VERSION)
+
+
+# --- Template helpers ---
+def srcset(item, fmt):
+    """ "url 320w, url 640w" for one format, or '' when there are no renditions. """
+    storage = image_storage()
+    renditions = item.image_renditions or {}
+    if not item.image or renditions.get('source') != item.image.name:
+        return ''
+    return ', '.join(
+        f'{storage.url(path)} {width}w'
+        for width, path in sorted(renditions.get(fmt, {}).items(), key=lambda pair: int(pair[0]))
+    )
+
+
+def image_sources(item):
+    """ [(mime type, srcset), ...] for a <picture>, best format first. """
+    sources = []
+    for fmt in ('avif', 'webp'):
+        value = srcset(item, fmt)
+        if value:
+            sources.append((f'image/{fmt}', value))
+    return sources
@@ -0,0 +1,153 @@
+# menu/management/commands/benchmark_catalog_engines.py
+"""
+Compares the three ways menu_list can answer a filtered, sorted page with
+facet counts, at several catalog sizes:
+
+* orm     - the grouped facet aggregate plus the keyset page query
+            (facet cache bypassed)
+* rows    - the catalog snapshot, filtered row by row (menu.snapshot.RowEngine)
+* columns - the catalog snapshot with NumPy masks and lexsort
+            (menu.columnar.ColumnarEngine); skipped without NumPy
+
+All three load the shown page of items the same way. Each query's first page
+and facet counts are checked to be identical across the paths before timing.
+Benchmark rows are created inside a transaction that is rolled back at the
+end, so the command is safe to run against a real database.
+"""
+
+import os
+import random
+import statistics
+import tempfile
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import QueryDict
+
+from menu.category_tree import CategoryTree
+from menu.columnar import ColumnarEngine, numpy_available
+from menu.facets import FacetCounts, query_facet_rows
+from menu.filters import CatalogFilters
+from menu.models import Brand, Category, MenuItem
+from menu.pagination import KeysetPaginator
+from menu.snapshot import CatalogSnapshot, RowEngine, SnapshotPaginator, SnapshotQuery, write_snapshot
+from menu.views import VALID_SORT_FIELDS
+
+
+def _summary(counts):
+    return counts.total, counts.brands, counts.materials, counts.price_bands, counts.categories
+
+
+class _Rollback(Exception):
+    """ Raised to throw away the benchmark data. """
+
+
+class Command(BaseCommand):
+    help = "Benchmark menu_list filtering/sorting: ORM vs catalog snapshot (row by row and NumPy)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help="Catalog sizes (default 1000 10000 100000).")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per path and query (default 20).")
+
+    def handle(self, *args, **options):
+        if not numpy_available():
+            self.stdout.write(self.style.WARNING("NumPy isn't installed: the 'columns' path is skipped."))
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self._run(size, options['repeat'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    # --- Benchmark ---
+    def _run(self, size, repeat):
+        root_slug = self._build_catalog(size)
+        tree = CategoryTree.from_database()
+        brand = Brand.objects.filter(name__startswith='bench-brand-').values_list('pk', flat=True).first()
+        queries = [
+            '',
+            f'category={root_slug}&sort_by=price_asc',
+            f'min_price=20000&max_price=80000&brand={brand}&sort_by=price_desc',
+            'material=Velvet&price_band=50k-100k&sort_by=rating_desc',
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.snap')
+            started = time.perf_counter()
+            write_snapshot(path, version=0)
+            build_ms = (time.perf_counter() - started) * 1000
+            snapshot = CatalogSnapshot(path)
+            self.stdout.write(
+                f"\n{MenuItem.objects.filter(is_available=True).count()} available items "
+                f"(snapshot built in {build_ms:.0f} ms, {os.path.getsize(path) / 1024:.0f} KiB)"
+            )
+            engines = {'rows': RowEngine(snapshot)}
+            if numpy_available():
+                engines['columns'] = ColumnarEngine(snapshot)
+
+            for query in queries:
+                filters = CatalogFilters.from_querydict(QueryDict(query))
+                ordering = VALID_SORT_FIELDS.get(filters.sort_by, 'name')
+                paths = {'orm': lambda: self._orm(filters, tree, ordering)}
+                for label, engine in engines.items():
+                    paths[label] = lambda engine=engine: self._snapshot(snapshot, engine, filters, tree, ordering)
+
+                results = {label: func() for label, func in paths.items()}
+                reference = results.pop('orm')
+                for label, result in results.items():
+                    assert result == reference, f"{label} disagrees with the ORM for {query!r}"
+
+                timings = {label: self._time(func, repeat) for label, func in paths.items()}
+                self.stdout.write(f"  ?{query or '(no filters)'}")
+                self.stdout.write('    ' + '   '.join(
+                    f"{label} {statistics.median(times):8.2f} ms" for label, times in timings.items()
+                ))
+
+    def _orm(self, filters, tree, ordering):
+        counts = FacetCounts(filters, tree, query_facet_rows(filters, tree))
+        page = KeysetPaginator(filters.queryset(tree), ordering).get_page()
+        return [item.pk for item in page], _summary(counts)
+
+    def _snapshot(self, snapshot, engine, filters, tree, ordering):
+        counts, positions = engine.search(SnapshotQuery(snapshot, filters, tree), ordering)
+        page = SnapshotPaginator(snapshot, positions, ordering).get_page()
+        return [item.pk for item in page], _summary(counts)
+
+    def _time(self, func, repeat):
+        func()  # Warm up
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def _build_catalog(self, size):
+        rnd = random.Random(size)
+        with Category.objects.disable_mptt_updates():
+            root = Category(name='bench-root', slug='bench-root')
+            root.save()
+            categories = [root] + [
+                Category.objects.create(name=f'bench-cat-{n}', slug=f'bench-cat-{n}', parent=root if n < 6 else None)
+                for n in range(12)
+            ]
+        Category.objects.rebuild()
+        brands = [Brand.objects.create(name=f'bench-brand-{n}') for n in range(20)] + [None]
+        materials = ['Velvet', 'Leather', 'Oak', 'Linen', 'Steel', None]
+        MenuItem.objects.bulk_create(
+            (
+                MenuItem(
+                    name=f"bench item {rnd.randrange(size)}", description="benchmark",
+                    price=Decimal(rnd.randrange(5000_00, 250000_00)) / 100,
+                    category=rnd.choice(categories), brand=rnd.choice(brands), material=rnd.choice(materials),
+                    is_available=rnd.random() > 0.05, rating_average=rnd.choice([0, 3.5, 4.0, 4.5, 5.0]),
+                    image_renditions={},
+                )
+                for _ in range(size)
+            ),
+            batch_size=2000,
+        )
+        return root.slug
@@ -0,0 +1,118 @@
+# menu/management/commands/benchmark_category_filter.py
+"""
+Compares the two ways of filtering menu_list by category on a deep tree:
+
+* tree path  - Category.objects.get(slug) + get_descendants(include_self=True)
+               used as a subquery (what menu_list used to do)
+* index path - CategoryTree.descendant_ids(slug) used as ``category_id IN (...)``
+
+All benchmark rows are created inside a transaction that is rolled back at
+the end, so the command is safe to run against a real database.
+"""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from menu.category_tree import CategoryTree
+from menu.models import Category, MenuItem
+
+
+class _Rollback(Exception):
+    """ Raised to throw away the benchmark data. """
+
+
+class Command(BaseCommand):
+    help = "Benchmark category filtering: MPTT descendant subquery vs precomputed id index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depth', type=int, default=6, help="Levels below the root (default 6).")
+        parser.add_argument('--fanout', type=int, default=3, help="Children per category (default 3).")
+        parser.add_argument('--items', type=int, default=3, help="Menu items per category (default 3).")
+        parser.add_argument('--repeat', type=int, default=50, help="Timed runs per path (default 50).")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(**options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    # --- Benchmark ---
+    def _run(self, depth, fanout, items, repeat, **options):
+        root = self._build_tree(depth, fanout, items)
+        # Materialized once per category version in production; built directly
+        # here so the cache never sees the throw-away rows.
+        tree = CategoryTree.from_database()
+        self.stdout.write(
+            f"Tree: depth={depth} fanout={fanout} -> {len(tree)} categories, "
+            f"{MenuItem.objects.count()} items"
+        )
+
+        # Only primary keys come back, so the timings measure the filter rather
+        # than model instantiation.
+        base = MenuItem.objects.filter(is_available=True).values_list('pk', flat=True)
+        slugs = [root.slug, tree.get(root.slug).children[0].slug]
+
+        def tree_path(slug):
+            category = Category.objects.get(slug=slug)
+            descendants = category.get_descendants(include_self=True)
+            return list(base.filter(category__in=descendants))
+
+        def index_path(slug):
+            return list(base.filter(category_id__in=tree.descendant_ids(slug)))
+
+        for slug in slugs:
+            node = tree.get(slug)
+            self.stdout.write(f"\nFilter '{slug}' ({len(node.descendant_ids)} categories):")
+            assert sorted(tree_path(slug)) == sorted(index_path(slug)), "Paths disagree"
+            for label, func in (('tree path ', tree_path), ('index path', index_path)):
+                timings, queries = self._time(func, slug, repeat)
+                self.stdout.write(
+                    f"  {label}: mean {statistics.mean(timings):8.3f} ms  "
+                    f"median {statistics.median(timings):8.3f} ms  queries {queries}"
+                )
+
+    def _time(self, func, slug, repeat):
+        func(slug)  # Warm up
+        with CaptureQueriesContext(connection) as ctx:
+            func(slug)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(slug)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, len(ctx.captured_queries)
+
+    def _build_tree(self, depth, fanout, items):
+        counter = iter(range(10 ** 9))
+
+        def make(parent):
+            n = next(counter)
+            return Category(name=f"bench-cat-{n}", slug=f"bench-cat-{n}", parent=parent)
+
+        # Insert without per-row MPTT bookkeeping, then rebuild once.
+        with Category.objects.disable_mptt_updates():
+            root = make(None)
+            root.save()
+            level = [root]
+            for _ in range(depth):
+                next_level = []
+                for parent in level:
+                    for _ in range(fanout):
+                        child = make(parent)
+                        child.save()
+                        next_level.append(child)
+                level = next_level
+        Category.objects.rebuild()
+
+        MenuItem.objects.bulk_create(
+            MenuItem(name=f"bench-item-{category_id}-{i}", description="benchmark", price=100 + i, category_id=category_id)
+            for category_id in Category.objects.filter(slug__startswith='bench-cat-').values_list('id', flat=True)
+            for i in range(items)
+        )
+        return Category.objects.get(pk=root.pk)
@@ -0,0 +1,37 @@
+# menu/management/commands/build_catalog_snapshot.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from menu.snapshot import build_snapshot, snapshot_is_built, snapshot_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the memory-mapped catalog snapshot (menu.snapshot) for the current catalog version. "
+        "With --interval it keeps running and writes a new one whenever the catalog changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Keep running, checking the catalog version every N seconds.")
+
+    def handle(self, *args, **options):
+        if not snapshot_settings()['enabled']:
+            self.stdout.write(self.style.WARNING("MENU_SNAPSHOT_ENABLED is off; building anyway."))
+        if not options['interval']:
+            self.build()
+            return
+        while True:
+            try:
+                if not snapshot_is_built():
+                    self.build()
+            except Exception as exc:  # Keep watching: requests use the ORM until the next build works
+                self.stderr.write(f"Snapshot build failed: {type(exc).__name__}: {exc}")
+                connections.close_all()  # Reconnect next time if the database went away
+            time.sleep(options['interval'])
+
+    def build(self):
+        path, rows = build_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} items to {path}."))
@@ -0,0 +1,81 @@
+# menu/management/commands/build_image_renditions.py
+"""
+Builds the WebP/AVIF renditions (menu.images) for product images that don't
+have up-to-date ones: new uploads, changed images, and the backlog.
+
+Resizing and encoding are CPU bound, so images are processed in a pool of
+worker processes. Workers only touch the storage; the parent process writes
+the results to the database. With --interval the command keeps running and
+picks up new uploads as they are saved; the Procfile runs it that way as
+its own process, so the platform restarts it if it dies.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from menu.images import generate_renditions, items_needing_renditions, rendition_formats, save_renditions
+
+
+def _init_worker():
+    # Needed where workers are spawned rather than forked (macOS, Windows)
+    django.setup()
+
+
+def _render(item_id, name):
+    """ Worker: returns (item id, fields, error message). """
+    try:
+        return item_id, generate_renditions(name), None
+    except Exception as exc:  # Report and carry on with the other images
+        return item_id, None, f"{type(exc).__name__}: {exc}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate resized WebP/AVIF copies of product images that don't have them yet. "
+        "The Procfile's renditions process keeps it running with --interval; without it, one pass."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU; 0 renders in this process).")
+        parser.add_argument('--force', action='store_true', help="Rebuild renditions that are already up to date.")
+        parser.add_argument('--interval', type=float, help="Keep running, looking for new images every N seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            todo = items_needing_renditions(force=options['force'])
+            if todo:
+                self.build(todo, options['workers'])
+            elif not options['interval']:
+                self.stdout.write("All product images already have renditions.")
+            if not options['interval']:
+                return
+            options['force'] = False  # Only the first pass rebuilds everything
+            time.sleep(options['interval'])
+
+    def build(self, todo, workers):
+        self.stdout.write(f"Building {'/'.join(rendition_formats())} renditions for {len(todo)} images...")
+        if workers == 0:
+            results = (_render(item_id, name) for item_id, name in todo)
+            self.save(results)
+            return
+        connections.close_all()  # Don't share open DB connections with forked workers
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_render, item_id, name) for item_id, name in todo]
+            self.save(future.result() for future in as_completed(futures))
+
+    def save(self, results):
+        done = failed = 0
+        for item_id, fields, error in results:
+            if error:
+                failed += 1
+                self.stderr.write(f"  Item {item_id}: {error}")
+                continue
+            save_renditions(item_id, fields)
+            done += 1
+
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"Done: {done} images processed, {failed} failed."))
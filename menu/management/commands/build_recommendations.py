@@ -0,0 +1,26 @@
+# menu/management/commands/build_recommendations.py
+
+from django.core.management.base import BaseCommand
+
+from menu.recommendations import DEFAULT_TOP_N, update_recommendations
+from menu.versioning import CATALOG_VERSION, bump_version_on_commit
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the 'related items' shown on product pages from order history. "
+        "Only orders newer than the last run are read; run it from cron/a scheduled job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Forget all counts and rebuild from every order.")
+        parser.add_argument('--top', type=int, default=DEFAULT_TOP_N, help=f"Neighbours kept per item (default {DEFAULT_TOP_N}).")
+
+    def handle(self, *args, **options):
+        run = update_recommendations(full=options['full'], top_n=options['top'])
+        if run.items_updated:
+            bump_version_on_commit(CATALOG_VERSION)  # Cached product pages show the old neighbours
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {run.orders_processed} orders (up to #{run.last_order_id}); "
+            f"updated related items for {run.items_updated} products."
+        ))
@@ -0,0 +1,41 @@
+# menu/management/commands/export_catalog.py
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from menu.catalog_io import RowWriter, detect_format, export_rows
+from menu.category_tree import CategoryTree
+
+
+class Command(BaseCommand):
+    help = "Write every product to a CSV/JSONL file in the format import_catalog reads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or - for stdout.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension (csv).")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+        started = time.monotonic()
+        if path == '-':
+            count = self._export(sys.stdout, fmt)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                count = self._export(stream, fmt)
+        elapsed = time.monotonic() - started
+        # Keep stdout clean for the data when streaming
+        report = self.stderr if path == '-' else self.stdout
+        report.write(self.style.SUCCESS(
+            f"Exported {count} products in {elapsed:.1f}s ({count / max(elapsed, 1e-6):,.0f} rows/s)."
+        ))
+
+    def _export(self, stream, fmt):
+        writer = RowWriter(stream, fmt)
+        count = 0
+        for row in export_rows(CategoryTree.from_database()):
+            writer.write(row)
+            count += 1
+        return count
@@ -0,0 +1,58 @@
+# menu/management/commands/import_catalog.py
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from menu.catalog_io import DEFAULT_BATCH_SIZE, detect_format, import_catalog, read_rows
+from menu.search import get_search_backend
+from menu.versioning import CATALOG_VERSION, CATEGORY_VERSION, SUGGEST_VERSION, bump_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV/JSONL feed, matched on sku. "
+        "Columns: sku, name, description, price, category (\"Parent > Child\"), brand, "
+        "dimensions, material, is_available, image."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or - for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension (csv).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help=f"Rows per upsert (default {DEFAULT_BATCH_SIZE}).")
+        parser.add_argument('--skip-search-index', action='store_true', help="Don't rebuild the search index afterwards.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+
+        def progress(rows, seconds):
+            self.stdout.write(f"  {rows} rows ({rows / max(seconds, 1e-6):,.0f} rows/s)")
+
+        try:
+            if path == '-':
+                result = import_catalog(read_rows(sys.stdin, fmt), options['batch_size'], progress)
+            else:
+                with open(path, newline='', encoding='utf-8-sig') as stream:
+                    result = import_catalog(read_rows(stream, fmt), options['batch_size'], progress)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Import failed, nothing was saved: {exc}")
+
+        for line_num, message in result.errors[:50]:
+            self.stderr.write(f"  Line {line_num}: {message}")
+        if len(result.errors) > 50:
+            self.stderr.write(f"  ... and {len(result.errors) - 50} more")
+
+        # Bulk upserts don't send signals: refresh the caches and search index here
+        bump_version(CATEGORY_VERSION)
+        bump_version(CATALOG_VERSION)
+        bump_version(SUGGEST_VERSION)
+        if not options['skip_search_index']:
+            get_search_backend().rebuild()
+
+        rate = result.imported / max(result.elapsed, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} products in {result.elapsed:.1f}s ({rate:,.0f} rows/s); "
+            f"{result.categories_created} new categories, {result.brands_created} new brands, "
+            f"{len(result.errors)} rows skipped."
+        ))
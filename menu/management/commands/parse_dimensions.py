@@ -0,0 +1,44 @@
+# menu/management/commands/parse_dimensions.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from menu.dimensions import apply_dimensions
+from menu.models import MenuItem
+from menu.versioning import CATALOG_VERSION, bump_version_on_commit
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Fill width_cm/height_cm/depth_cm from each product's free-text dimensions (after upgrading or a raw import)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show-unparsed', action='store_true', help="List dimension texts that gave no numbers.")
+
+    def handle(self, *args, **options):
+        fields = ['width_cm', 'height_cm', 'depth_cm']
+        items = MenuItem.objects.only('pk', 'dimensions', *fields).order_by('pk')
+        changed, unparsed, batch = 0, [], []
+        with transaction.atomic():
+            for item in items.iterator(chunk_size=BATCH_SIZE):
+                if apply_dimensions(item):
+                    batch.append(item)
+                if item.dimensions and item.width_cm is None and item.height_cm is None and item.depth_cm is None:
+                    unparsed.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    # bulk_update: no per-row save(), signals or updated_at churn
+                    MenuItem.objects.bulk_update(batch, fields)
+                    changed += len(batch)
+                    batch = []
+            MenuItem.objects.bulk_update(batch, fields)
+            changed += len(batch)
+            if changed:
+                bump_version_on_commit(CATALOG_VERSION)
+
+        if options['show_unparsed']:
+            for item in unparsed:
+                self.stdout.write(f"  #{item.pk}: {item.dimensions!r}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated sizes for {changed} products; {len(unparsed)} dimension texts could not be read."
+        ))
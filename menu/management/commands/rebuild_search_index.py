@@ -0,0 +1,14 @@
+# menu/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+
+from menu.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index (e.g. after loaddata or a bulk import)."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt ({type(backend).__name__})."))
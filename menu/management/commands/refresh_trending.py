@@ -0,0 +1,27 @@
+# menu/management/commands/refresh_trending.py
+
+from django.core.management.base import BaseCommand
+
+from menu.trending import TRENDING_HALF_LIFE_DAYS, refresh_sales_scores
+from menu.versioning import CATALOG_VERSION, bump_version_on_commit
+from orders.sales import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the 'Best Sellers' and 'Trending' sort scores from the daily sales rollup. "
+        "Run it periodically (e.g. hourly) from cron/a scheduled job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--half-life', type=float, default=TRENDING_HALF_LIFE_DAYS, help=f"Trending half-life in days (default {TRENDING_HALF_LIFE_DAYS}).")
+        parser.add_argument('--rebuild-rollup', action='store_true', help="Recompute the daily sales rollup from every order first.")
+
+    def handle(self, *args, **options):
+        if options['rebuild_rollup']:
+            rows = rebuild_daily_sales()
+            self.stdout.write(f"Rebuilt the daily sales rollup: {rows} item-days.")
+        changed = refresh_sales_scores(half_life=options['half_life'])
+        if changed:
+            bump_version_on_commit(CATALOG_VERSION)  # Cached "popular"/"trending" pages are in the old order
+        self.stdout.write(self.style.SUCCESS(f"Updated sales scores for {changed} products."))
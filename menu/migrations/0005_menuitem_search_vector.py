@@ -0,0 +1,62 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:28
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Everything below is PostgreSQL-only; on SQLite the search_vector column is
+# created but left empty (menu.search uses an in-process index there).
+
+BACKFILL_SQL = """
+    UPDATE menu_menuitem AS m SET search_vector =
+        setweight(to_tsvector('english', coalesce(m.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce((SELECT b.name FROM menu_brand b WHERE b.id = m.brand_id), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce((SELECT c.name FROM menu_category c WHERE c.id = m.category_id), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(m.material, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(m.description, '')), 'D')
+"""
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS menu_menuitem_search_vector_gin "
+            "ON menu_menuitem USING gin (search_vector)"
+        )
+        # pg_trgm ships with every mainstream PostgreSQL build (and is a trusted
+        # extension), but stay installable where it is missing.
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone():
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS menu_menuitem_name_trgm "
+                "ON menu_menuitem USING gin (name gin_trgm_ops)"
+            )
+        cursor.execute(BACKFILL_SQL)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP INDEX IF EXISTS menu_menuitem_name_trgm")
+        cursor.execute("DROP INDEX IF EXISTS menu_menuitem_search_vector_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0004_alter_category_options_remove_menuitem_dietary_info_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0006_category_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecommenderRun",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("last_order_id", models.PositiveIntegerField(default=0)),
+                ("orders_processed", models.PositiveIntegerField(default=0)),
+                ("items_updated", models.PositiveIntegerField(default=0)),
+                ("full_rebuild", models.BooleanField(default=False)),
+                ("finished_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Recommender Run",
+                "verbose_name_plural": "Recommender Runs",
+                "ordering": ["-finished_at"],
+                "get_latest_by": "finished_at",
+            },
+        ),
+        migrations.CreateModel(
+            name="CoPurchase",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("item", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="co_purchases", to="menu.menuitem")),
+                ("other", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="menu.menuitem")),
+            ],
+            options={
+                "verbose_name": "Co-purchase Count",
+                "verbose_name_plural": "Co-purchase Counts",
+                "unique_together": {("item", "other")},
+            },
+        ),
+        migrations.CreateModel(
+            name="RelatedItem",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("score", models.FloatField(default=0, help_text="Co-purchase score; 0 for same-category fill-ins.")),
+                ("item", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="related_items", to="menu.menuitem")),
+                ("related", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="related_to", to="menu.menuitem")),
+            ],
+            options={
+                "verbose_name": "Related Item",
+                "verbose_name_plural": "Related Items",
+                "ordering": ["item", "rank"],
+                "indexes": [models.Index(fields=["item", "rank"], name="menu_relate_item_id_22775c_idx")],
+                "unique_together": {("item", "related")},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0007_recommendations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="image_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="image_renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text="Resized WebP/AVIF copies: {format: {width: path}}."),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0008_menuitem_image_renditions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="sku",
+            field=models.CharField(blank=True, help_text="Supplier/stock code. Used to match rows in `manage.py import_catalog`.", max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0009_menuitem_sku"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="depth_cm",
+            field=models.DecimalField(blank=True, decimal_places=1, editable=False, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="height_cm",
+            field=models.DecimalField(blank=True, decimal_places=1, editable=False, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="width_cm",
+            field=models.DecimalField(blank=True, decimal_places=1, editable=False, max_digits=5, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(fields=["is_available", "width_cm"], name="menu_item_avail_width_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(fields=["is_available", "depth_cm"], name="menu_item_avail_depth_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(fields=["is_available", "height_cm"], name="menu_item_avail_height_idx"),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0010_menuitem_size_columns"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(condition=models.Q(("is_available", True)), fields=["category", "price", "id"], name="menu_item_avail_cat_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(condition=models.Q(("is_available", True)), fields=["category", "name", "id"], name="menu_item_avail_cat_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(condition=models.Q(("is_available", True)), fields=["price", "id"], name="menu_item_avail_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(condition=models.Q(("is_available", True)), fields=["name", "id"], name="menu_item_avail_name_idx"),
+        ),
+    ]
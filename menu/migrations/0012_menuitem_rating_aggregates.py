@@ -0,0 +1,75 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:53
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    """ Existing reviews; from here on reviews.signals keeps the columns current. """
+    MenuItem = apps.get_model("menu", "MenuItem")
+    rows = MenuItem.objects.order_by().filter(reviews__rating__range=(1, 5)).values("pk").annotate(
+        count=Count("reviews"),
+        total=Sum("reviews__rating"),
+        **{f"stars_{stars}": Count("reviews", filter=Q(reviews__rating=stars)) for stars in range(1, 6)},
+    )
+    for row in rows:
+        MenuItem.objects.filter(pk=row["pk"]).update(
+            rating_count=row["count"], rating_sum=row["total"], rating_average=row["total"] / row["count"],
+            **{f"rating_{stars}": row[f"stars_{stars}"] for stars in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0011_catalog_hot_path_indexes"),
+        ("reviews", "0002_alter_review_options_alter_review_comment_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_1",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_2",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_3",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_4",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_5",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_average",
+            field=models.FloatField(default=0, editable=False, help_text="0 when there are no reviews."),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(condition=models.Q(("is_available", True)), fields=["rating_average", "id"], name="menu_item_avail_rating_idx"),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
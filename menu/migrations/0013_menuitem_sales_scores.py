@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0012_menuitem_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="popularity",
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Units sold over the last 90 days."),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="trending_score",
+            field=models.FloatField(default=0, editable=False, help_text="Recent units sold, exponentially decayed by age."),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(condition=models.Q(("is_available", True)), fields=["popularity", "id"], name="menu_item_avail_popular_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(condition=models.Q(("is_available", True)), fields=["trending_score", "id"], name="menu_item_avail_trending_idx"),
+        ),
+    ]
@@ -2,6 +2,7 @@
 from django.db import models
 from django.utils.text import slugify
 from django.urls import reverse
+from django.contrib.postgres.search import SearchVectorField
 from mptt.models import MPTTModel, TreeForeignKey
 
 # --- Category Model (e.g., "Sofa", "Chair", "Table") ---
@@ -13,6 +14,7 @@ class Category(MPTTModel):
         related_name='children', db_index=True, help_text="Select parent for sub-categories. e.g., '3-Seater' under 'Sofa Sets'."
     )
     description = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True) # Part of menu_detail's Last-Modified/ETag
 
     class MPTTMeta:
         order_insertion_by = ['name']
@@ -47,9 +49,14 @@ class Brand(models.Model):
 # --- MenuItem Model (Keeping the original name) ---
 class MenuItem(models.Model):  # Keep this name
     name = models.CharField(max_length=255, db_index=True, help_text="e.g., 'Modern Velvet Sofa'")
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True, help_text="Supplier/stock code. Used to match rows in `manage.py import_catalog`.")
     description = models.TextField(help_text="Detailed description, dimensions, and materials.")
     price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Price in KES")
     image = models.ImageField(upload_to='menu_items/', blank=True, null=True) # Keep original upload path
+    # Filled by menu.images (`manage.py build_image_renditions`, the Procfile's renditions process)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized WebP/AVIF copies: {format: {width: path}}.")
     
     category = TreeForeignKey(
         Category,
@@ -72,18 +79,119 @@ class MenuItem(models.Model):  # Keep this name
     # You can add or keep these furniture-specific fields
     dimensions = models.CharField(max_length=200, blank=True, null=True, help_text="e.g., 'W: 85in, H: 30in, D: 34in'")
     material = models.CharField(max_length=200, blank=True, null=True, help_text="e.g., 'Velvet Fabric, Solid Wood'")
+    # Parsed from `dimensions` on save (menu.dimensions); used by the size filters
+    width_cm = models.DecimalField(max_digits=5, decimal_places=1, null=True, blank=True, editable=False)
+    height_cm = models.DecimalField(max_digits=5, decimal_places=1, null=True, blank=True, editable=False)
+    depth_cm = models.DecimalField(max_digits=5, decimal_places=1, null=True, blank=True, editable=False)
+
+    # Review aggregates, kept in step by reviews.signals (repair: `manage.py repair_ratings`)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.FloatField(default=0, editable=False, help_text="0 when there are no reviews.")
+    rating_1 = models.PositiveIntegerField(default=0, editable=False) # Histogram: reviews per star
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    # Sales ranking from the daily rollup, refreshed by `manage.py refresh_trending` (menu.trending)
+    popularity = models.PositiveIntegerField(default=0, editable=False, help_text="Units sold over the last 90 days.")
+    trending_score = models.FloatField(default=0, editable=False, help_text="Recent units sold, exponentially decayed by age.")
 
     is_available = models.BooleanField(default=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Weighted name/brand/category/material/description document, kept up to date
+    # by menu.search (PostgreSQL only; unused on SQLite).
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
     class Meta:
         ordering = ['name']
         verbose_name = "Menu Item"
         verbose_name_plural = "Menu Items"
+        indexes = [
+            # Size filters on the shop page always come with is_available=True
+            models.Index(fields=['is_available', 'width_cm'], name='menu_item_avail_width_idx'),
+            models.Index(fields=['is_available', 'depth_cm'], name='menu_item_avail_depth_idx'),
+            models.Index(fields=['is_available', 'height_cm'], name='menu_item_avail_height_idx'),
+            # The shop page reads only available items, sorted by price or name (pk breaks ties,
+            # see menu.pagination). Partial indexes keep sold-out rows out of them entirely, so
+            # the database walks one in sort order and stops after a page.
+            models.Index(fields=['category', 'price', 'id'], condition=models.Q(is_available=True), name='menu_item_avail_cat_price_idx'),
+            models.Index(fields=['category', 'name', 'id'], condition=models.Q(is_available=True), name='menu_item_avail_cat_name_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_available=True), name='menu_item_avail_price_idx'),
+            models.Index(fields=['name', 'id'], condition=models.Q(is_available=True), name='menu_item_avail_name_idx'),
+            models.Index(fields=['rating_average', 'id'], condition=models.Q(is_available=True), name='menu_item_avail_rating_idx'),
+            models.Index(fields=['popularity', 'id'], condition=models.Q(is_available=True), name='menu_item_avail_popular_idx'),
+            models.Index(fields=['trending_score', 'id'], condition=models.Q(is_available=True), name='menu_item_avail_trending_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.sku:
+            self.sku = None # Blank form input: NULLs don't collide in the unique index
+        from .dimensions import apply_dimensions
+        if apply_dimensions(self) and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'width_cm', 'height_cm', 'depth_cm'}
+        super().save(*args, **kwargs)
 
     def get_absolute_url(self):
         return reverse('menu:menu_detail', kwargs={'item_id': self.pk})
 
+    def rating_histogram(self):
+        """ [(stars, review count), ...] from 5 stars down to 1. """
+        return [(stars, getattr(self, f'rating_{stars}')) for stars in range(5, 0, -1)]
+
+    def __str__(self):
+        return self.name
+
+# --- "Customers also bought": built offline by `manage.py build_recommendations` ---
+class CoPurchase(models.Model):
+    """ How many orders contained both ``item`` and ``other`` (stored in both directions). """
+    item = models.ForeignKey(MenuItem, related_name='co_purchases', on_delete=models.CASCADE)
+    other = models.ForeignKey(MenuItem, related_name='+', on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('item', 'other')
+        verbose_name = "Co-purchase Count"
+        verbose_name_plural = "Co-purchase Counts"
+
+    def __str__(self):
+        return f"{self.item_id} + {self.other_id}: {self.count}"
+
+
+class RelatedItem(models.Model):
+    """ Top-N neighbours of an item, ready for menu_detail (co-purchases first, then same category). """
+    item = models.ForeignKey(MenuItem, related_name='related_items', on_delete=models.CASCADE)
+    related = models.ForeignKey(MenuItem, related_name='related_to', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField(default=0, help_text="Co-purchase score; 0 for same-category fill-ins.")
+
+    class Meta:
+        ordering = ['item', 'rank']
+        unique_together = ('item', 'related')
+        indexes = [models.Index(fields=['item', 'rank'])]
+        verbose_name = "Related Item"
+        verbose_name_plural = "Related Items"
+
+    def __str__(self):
+        return f"{self.item_id} -> {self.related_id} (#{self.rank})"
+
+
+class RecommenderRun(models.Model):
+    """ One build_recommendations run; the latest ``last_order_id`` is the incremental watermark. """
+    last_order_id = models.PositiveIntegerField(default=0)
+    orders_processed = models.PositiveIntegerField(default=0)
+    items_updated = models.PositiveIntegerField(default=0)
+    full_rebuild = models.BooleanField(default=False)
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-finished_at']
+        get_latest_by = 'finished_at'
+        verbose_name = "Recommender Run"
+        verbose_name_plural = "Recommender Runs"
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"Run up to order #{self.last_order_id} at {self.finished_at:%Y-%m-%d %H:%M}"
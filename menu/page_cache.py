@@ -0,0 +1,103 @@
+# menu/page_cache.py
+"""
+Whole-page cache for the shop pages (menu_list / menu_detail).
+
+The rendered HTML is stored once per normalized URL and catalog version and
+shared by every visitor. The few per-visitor bits - the user menu with its
+cart badge and any CSRF token - are left as "holes" in the stored page:
+
+    {% page_cache_hole "partials/user_nav.html" %}
+
+renders the template normally, but while a page is being rendered for the
+cache it outputs a marker instead. Each request then fills the markers in by
+rendering just those small templates for the current user (the cart badge
+comes from the cart_badge context processor, normally a cache hit).
+
+Everything else on a cached page must come from the key alone: menu_list
+renders its search box, price inputs and "Load more" link from the parsed
+filters (menu_list_params), never from the raw query string.
+
+Invalidation is precise and free: MenuItem/Category/Brand saves and deletes
+bump CATALOG_VERSION (menu.signals), which changes every key at once.
+"""
+
+import hashlib
+import re
+from functools import wraps
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+from .versioning import CATALOG_VERSION, get_version
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+PAGE_CACHE_KEY = 'menu:page:v{version}:{name}:{key}'
+HOLE_MARKER = '<!--page-cache-hole:{}-->'
+HOLE_RE = re.compile(r'<!--page-cache-hole:([\w/.-]+)-->')
+CACHED_HEADERS = ('X-Next-Page',)
+
+
+def is_filling_cache(request):
+    """ True while a page for the shared cache is being rendered (holes become markers). """
+    return getattr(request, '_page_cache_render', False)
+
+
+def _fill_holes(request, content):
+    """ Renders each hole template for the current request and splices it in. """
+    rendered = {}
+
+    def fill(match):
+        name = match.group(1)
+        if name not in rendered:
+            rendered[name] = render_to_string(name, request=request)  # Context processors add cart_item_count
+        return rendered[name]
+
+    return HOLE_RE.sub(fill, content)
+
+
+def cache_page_for_catalog(key_func, name=None):
+    """ Caches a GET view's page (with holes) under CATALOG_VERSION and ``key_func(request, *args, **kwargs)``.
+
+        Requests with flash messages waiting, and pages that queued one
+        themselves (e.g. "Invalid price value entered."), are never served
+        from or stored in the cache.
+    """
+    def decorator(view_func):
+        cache_name = name or view_func.__name__
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            key = PAGE_CACHE_KEY.format(
+                version=get_version(CATALOG_VERSION), name=cache_name,
+                key=hashlib.md5(repr(key_func(request, *args, **kwargs)).encode()).hexdigest(),
+            )
+            entry = cache.get(key)
+            if entry is None:
+                request._page_cache_render = True
+                try:
+                    response = view_func(request, *args, **kwargs)
+                finally:
+                    request._page_cache_render = False
+                if response.status_code != 200 or getattr(response, 'streaming', False):
+                    return response
+                entry = {
+                    'content': response.content.decode(response.charset),
+                    'content_type': response['Content-Type'],
+                    'headers': {h: response[h] for h in CACHED_HEADERS if response.has_header(h)},
+                }
+                if not len(messages.get_messages(request)):
+                    cache.set(key, entry, PAGE_CACHE_TIMEOUT)
+
+            response = HttpResponse(_fill_holes(request, entry['content']), content_type=entry['content_type'])
+            for header, value in entry['headers'].items():
+                response[header] = value
+            patch_vary_headers(response, ('Cookie',))  # Holes are per visitor
+            return response
+        return wrapper
+    return decorator
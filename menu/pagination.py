@@ -0,0 +1,101 @@
+# menu/pagination.py
+"""
+Keyset ("cursor") pagination for the product grid.
+
+Instead of OFFSET, each page remembers the sort value and primary key of its
+last row; the next page asks for rows strictly after that pair. With an index
+on the sort column the database seeks straight to the right place, so page
+500 costs the same as page 1. The primary key is always used as a tiebreaker
+so rows with equal prices/names never repeat or go missing between pages.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 24
+
+
+def encode_cursor(value, pk):
+    """ Packs (sort value, pk) into a compact URL-safe token. """
+    raw = json.dumps([str(value), pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """ Inverse of ``encode_cursor``. Returns (value, pk) or None for a malformed token. """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value, int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """ One page of results plus the cursor for the page after it. """
+
+    def __init__(self, items, next_cursor):
+        self.object_list = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """ Paginates ``queryset`` by ``ordering`` (e.g. 'price' or '-name') with a pk tiebreaker. """
+
+    def __init__(self, queryset, ordering, page_size=DEFAULT_PAGE_SIZE):
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.page_size = page_size
+        prefix = '-' if self.descending else ''
+        self.queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+
+    def _to_python(self, value):
+        """ Converts the cursor's string value back to the column's type (Decimal for price...). """
+        try:
+            field = self.queryset.model._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a search rank) are floats.
+            return float(value)
+        return field.to_python(value)
+
+    def page_queryset(self, cursor=None):
+        """ The (unevaluated) query for the page after ``cursor``, one extra row included. """
+        queryset = self.queryset
+        position = decode_cursor(cursor) if cursor else None
+        if position is not None:
+            try:
+                value = self._to_python(position[0])
+            except (ValidationError, ValueError, TypeError):
+                value = None
+            if value is not None:
+                op = 'lt' if self.descending else 'gt'
+                queryset = queryset.filter(
+                    Q(**{f'{self.field}__{op}': value})
+                    | Q(**{self.field: value, f'pk__{op}': position[1]})
+                )
+
+        # One extra row tells us whether another page exists, without a COUNT.
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, cursor=None):
+        """ Returns the page that starts right after ``cursor`` (the first page if None/invalid). """
+        items = list(self.page_queryset(cursor))
+        next_cursor = None
+        if len(items) > self.page_size:
+            items = items[:self.page_size]
+            last = items[-1]
+            next_cursor = encode_cursor(getattr(last, self.field), last.pk)
+        return KeysetPage(items, next_cursor)
@@ -0,0 +1,198 @@
+# menu/recommendations.py
+"""
+"Customers also bought" recommendations, built offline from order history.
+
+``build_recommendations`` (management command) calls ``update_recommendations``:
+
+1. Reads the order lines of orders newer than the last run's watermark and
+   groups them into baskets (one set of items per order).
+2. Adds every pair in every basket to ``CoPurchase``. The diagonal
+   (item, item) row counts the orders containing the item, so scores can be
+   normalized: score(a, b) = together(a, b) / sqrt(orders(a) * orders(b)).
+   Without that, a best seller would be "related" to everything.
+3. Recomputes the top-N ``RelatedItem`` rows of the items those orders
+   touched (and of items that have none yet), topping them up with
+   same-category items when there aren't enough co-purchases.
+
+menu_detail then reads an item's neighbours with one indexed query.
+
+Canceling (or un-canceling) an order that a run already counted takes its
+basket back out of ``CoPurchase`` (or puts it back) and recomputes its items'
+neighbours straight away (``recount_basket``, called from
+orders.signals). Orders past the watermark are read with their status by the
+next run.
+"""
+
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import CoPurchase, MenuItem, RecommenderRun, RelatedItem
+from .versioning import CATALOG_VERSION, bump_version_on_commit
+
+DEFAULT_TOP_N = 8
+# Orders younger than this may still be committing (ids are allocated before
+# commit), so the watermark stops short of them; the next run picks them up.
+SETTLE_TIME = timedelta(minutes=5)
+BATCH_SIZE = 500
+
+
+def get_watermark():
+    run = RecommenderRun.objects.order_by('-finished_at', '-pk').first()
+    return run.last_order_id if run else 0
+
+
+def order_baskets(after_order_id, up_to_order_id):
+    """ {order id: {menu item id, ...}} for the orders in (after, up_to]. """
+    from orders.models import OrderItem  # orders depends on menu, not the other way round
+
+    rows = (
+        OrderItem.objects
+        .filter(order_id__gt=after_order_id, order_id__lte=up_to_order_id, menu_item__isnull=False)
+        .exclude(order__status='Canceled')
+        .values_list('order_id', 'menu_item_id')
+    )
+    baskets = defaultdict(set)
+    for order_id, item_id in rows.iterator(chunk_size=2000):
+        baskets[order_id].add(item_id)
+    return baskets
+
+
+def count_pairs(baskets):
+    """ Counter of (item, other) -> orders containing both, both directions plus the diagonal. """
+    pairs = Counter()
+    for items in baskets.values():
+        for a in items:
+            for b in items:
+                pairs[(a, b)] += 1
+    return pairs
+
+
+def add_pair_counts(pairs):
+    """ Adds ``pairs`` to the stored CoPurchase counts (negative counts take orders back out). """
+    if not pairs:
+        return
+    items = {a for a, _ in pairs}
+    existing = {
+        (row.item_id, row.other_id): row
+        for row in CoPurchase.objects.filter(item_id__in=items, other_id__in=items)
+    }
+    changed, created, emptied = [], [], []
+    for (a, b), count in pairs.items():
+        row = existing.get((a, b))
+        if row is not None:
+            row.count += count
+            if row.count > 0:
+                changed.append(row)
+            else:
+                emptied.append(row.pk)
+        elif count > 0:
+            created.append(CoPurchase(item_id=a, other_id=b, count=count))
+    CoPurchase.objects.bulk_update(changed, ['count'], batch_size=BATCH_SIZE)
+    CoPurchase.objects.bulk_create(created, batch_size=BATCH_SIZE)
+    CoPurchase.objects.filter(pk__in=emptied).delete()
+
+
+def compute_related(item_ids, top_n=DEFAULT_TOP_N):
+    """ Replaces the RelatedItem rows of ``item_ids``. Returns how many items got neighbours. """
+    item_ids = set(item_ids)
+    totals = dict(CoPurchase.objects.filter(item=F('other')).values_list('item_id', 'count'))
+
+    available = {}  # pk -> category id, available items only
+    by_category = defaultdict(list)  # category id -> [pk, ...] in catalog (name) order
+    for pk, category_id in MenuItem.objects.filter(is_available=True).values_list('pk', 'category_id'):
+        available[pk] = category_id
+        if category_id is not None:
+            by_category[category_id].append(pk)
+
+    scored = defaultdict(list)
+    rows = CoPurchase.objects.filter(item_id__in=item_ids).exclude(item=F('other'))
+    for a, b, together in rows.values_list('item_id', 'other_id', 'count').iterator(chunk_size=2000):
+        if b in available:
+            scored[a].append((together / math.sqrt(totals.get(a, 1) * totals.get(b, 1)), b))
+
+    related = []
+    for item_id in item_ids:
+        if item_id not in available:
+            continue  # Not shown in the shop: no neighbours needed
+        picks = sorted(scored[item_id], key=lambda pair: (-pair[0], pair[1]))[:top_n]
+        chosen = {b for _, b in picks} | {item_id}
+        for b in by_category.get(available[item_id], ()):
+            if len(picks) >= top_n:
+                break
+            if b not in chosen:
+                picks.append((0.0, b))
+                chosen.add(b)
+        related.extend(
+            RelatedItem(item_id=item_id, related_id=b, rank=rank, score=score)
+            for rank, (score, b) in enumerate(picks)
+        )
+
+    RelatedItem.objects.filter(item_id__in=item_ids).delete()
+    RelatedItem.objects.bulk_create(related, batch_size=BATCH_SIZE)
+    return len({row.item_id for row in related})
+
+
+def update_recommendations(full=False, top_n=DEFAULT_TOP_N):
+    """ Processes the orders since the watermark (all orders if ``full``) and returns the RecommenderRun. """
+    from orders.models import Order
+
+    cutoff = timezone.now() - SETTLE_TIME
+    with transaction.atomic():
+        watermark = 0 if full else get_watermark()
+        up_to = Order.objects.filter(created_at__lte=cutoff).aggregate(last=Max('pk'))['last'] or 0
+        up_to = max(up_to, watermark)
+
+        if full:
+            CoPurchase.objects.all().delete()
+        baskets = order_baskets(watermark, up_to)
+        pairs = count_pairs(baskets)
+        add_pair_counts(pairs)
+
+        if full:
+            item_ids = set(MenuItem.objects.values_list('pk', flat=True))
+        else:
+            # Items the new orders touched, plus (new) items with no neighbours yet
+            item_ids = {a for a, _ in pairs}
+            item_ids |= set(
+                MenuItem.objects.filter(is_available=True, related_items__isnull=True).values_list('pk', flat=True)
+            )
+        items_updated = compute_related(item_ids, top_n=top_n)
+
+        return RecommenderRun.objects.create(
+            last_order_id=up_to, orders_processed=len(baskets),
+            items_updated=items_updated, full_rebuild=full,
+        )
+
+
+def recount_basket(order, lines):
+    """ Takes a canceled order's basket out of the co-purchase counts, or an un-canceled one back in.
+
+        Only for orders a run has already read (at or below the watermark);
+        the items' neighbours are recomputed at once.
+    """
+    if order.pk > get_watermark():
+        return
+    items = {line.menu_item_id for line in lines if line.menu_item_id is not None}
+    sign = -1 if order.status == 'Canceled' else 1
+    pairs = Counter({pair: sign * count for pair, count in count_pairs({order.pk: items}).items()})
+    if not pairs:
+        return
+    with transaction.atomic():
+        add_pair_counts(pairs)
+        compute_related(items)
+    bump_version_on_commit(CATALOG_VERSION)  # Cached product pages show the old neighbours
+
+
+def related_items_for(menu_item, limit=3):
+    """ Up to ``limit`` available neighbours of ``menu_item`` (empty if it has never been processed). """
+    rows = (
+        RelatedItem.objects.filter(item=menu_item, related__is_available=True)
+        .select_related('related__category')
+        .order_by('rank')[:limit]
+    )
+    return [row.related for row in rows]
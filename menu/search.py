@@ -0,0 +1,288 @@
+# menu/search.py
+"""
+Product search for the shop.
+
+Every MenuItem has a weighted search document:
+
+    A  name
+    B  brand name, category name
+    C  material
+    D  description
+
+Two interchangeable backends rank against it:
+
+* PostgresSearchBackend - full-text search on the stored ``search_vector``
+  column (GIN indexed), plus pg_trgm similarity on ``name`` for typos and
+  partial words. Used in production.
+* InMemorySearchBackend - an in-process inverted index with the same weights,
+  for SQLite / local development and tests.
+
+Both return the *same queryset they were given*, filtered to matches and
+annotated with a float ``rank``, so price/category filters and pagination run
+in the same SQL query as the search.
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache, reduce
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Q, TextField, Value, When
+from django.db.models.functions import Cast
+from django.utils.module_loading import import_string
+
+from .models import MenuItem
+
+# Same defaults as PostgreSQL's ts_rank, so both backends order alike.
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+TRIGRAM_THRESHOLD = 0.3  # pg_trgm's default for the % operator
+
+
+def search_document(item):
+    """ Returns [(text, weight), ...] for a MenuItem. """
+    return [
+        (item.name or '', 'A'),
+        (item.brand.name if item.brand_id else '', 'B'),
+        (item.category.name if item.category_id else '', 'B'),
+        (item.material or '', 'C'),
+        (item.description or '', 'D'),
+    ]
+
+
+# --- Text helpers (in-memory backend) ---
+_WORD_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """ Lowercases and strips accents ("Café" -> "cafe"). """
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def _stem(word):
+    """ Very small English stemmer: enough for "sofas"/"sofa", "chairs"/"chair". """
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [_stem(word) for word in _WORD_RE.findall(fold(text)) if len(word) > 1]
+
+
+def trigrams(text):
+    """ pg_trgm-style trigram set: each word padded with two spaces in front, one behind. """
+    grams = set()
+    for word in _WORD_RE.findall(fold(text)):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# --- Backends ---
+class SearchBackend:
+    """ Interface shared by the search backends. """
+
+    def search(self, queryset, text):
+        """ Filters ``queryset`` to items matching ``text`` and annotates ``rank``. """
+        raise NotImplementedError
+
+    def index_item(self, item):
+        """ Refreshes the search document of one MenuItem after it was saved. """
+        raise NotImplementedError
+
+    def remove_item(self, item_id):
+        """ Drops a deleted MenuItem from the index. """
+
+    def rebuild(self):
+        """ Re-indexes the whole catalog. """
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(SearchBackend):
+    config = 'english'
+
+    # Used by ``rebuild``; kept in SQL so the whole catalog is one UPDATE.
+    REBUILD_SQL = """
+        UPDATE menu_menuitem AS m SET search_vector =
+            setweight(to_tsvector(%(config)s, coalesce(m.name, '')), 'A') ||
+            setweight(to_tsvector(%(config)s, coalesce((SELECT b.name FROM menu_brand b WHERE b.id = m.brand_id), '')), 'B') ||
+            setweight(to_tsvector(%(config)s, coalesce((SELECT c.name FROM menu_category c WHERE c.id = m.category_id), '')), 'B') ||
+            setweight(to_tsvector(%(config)s, coalesce(m.material, '')), 'C') ||
+            setweight(to_tsvector(%(config)s, coalesce(m.description, '')), 'D')
+    """
+
+    @property
+    def has_trigram(self):
+        """ pg_trgm is optional: without it search falls back to full-text only. """
+        if not hasattr(self, '_has_trigram'):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                self._has_trigram = cursor.fetchone() is not None
+        return self._has_trigram
+
+    def search(self, queryset, text):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+
+        query = SearchQuery(text, config=self.config, search_type='websearch')
+        match = Q(search_vector=query)
+        rank = SearchRank(F('search_vector'), query)
+        if self.has_trigram:
+            match |= Q(name__trigram_similar=text)  # Served by the gin_trgm_ops index
+            rank = rank + TrigramSimilarity('name', text)
+        # ts_rank/similarity return float4; as float8 the value survives a round
+        # trip through a pagination cursor unchanged.
+        return queryset.filter(match).annotate(rank=Cast(rank, FloatField()))
+
+    def index_item(self, item):
+        from django.contrib.postgres.search import SearchVector
+
+        vector = reduce(lambda a, b: a + b, (
+            SearchVector(Value(text, output_field=TextField()), weight=weight, config=self.config)
+            for text, weight in search_document(item)
+        ))
+        # update() skips signals, so this doesn't re-trigger itself.
+        MenuItem.objects.filter(pk=item.pk).update(search_vector=vector)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(self.REBUILD_SQL, {'config': self.config})
+
+
+class InvertedIndex:
+    """ token -> {item id: weight} postings, plus name trigrams for fuzzy matches. """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.name_trigrams = {}
+
+    def add(self, item_id, document):
+        self.remove(item_id)
+        terms = set()
+        for text, weight in document:
+            for term in tokenize(text):
+                postings = self.postings[term]
+                postings[item_id] = postings.get(item_id, 0.0) + WEIGHTS[weight]
+                terms.add(term)
+        self.doc_terms[item_id] = terms
+        self.name_trigrams[item_id] = trigrams(document[0][0])
+
+    def remove(self, item_id):
+        for term in self.doc_terms.pop(item_id, ()):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(item_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.name_trigrams.pop(item_id, None)
+
+    def search(self, text, limit=None):
+        """ Returns [(item id, score), ...], best first; every match unless ``limit`` is given.
+
+            The listing's pagination and facet counts are computed from these
+            matches, so callers that show them must not pass a limit.
+        """
+        scores = {}
+        terms = tokenize(text)
+        if terms:
+            # Every term must match (like websearch_to_tsquery's implicit AND).
+            matched = None
+            for term in terms:
+                ids = set(self.postings.get(term, ()))
+                matched = ids if matched is None else matched & ids
+            for item_id in matched:
+                # Log-damped so a word repeated in the description can't outrank the name.
+                scores[item_id] = sum(
+                    math.log1p(self.postings[term][item_id]) for term in terms
+                ) / len(terms)
+
+        query_grams = trigrams(text)
+        for item_id, grams in self.name_trigrams.items():
+            similarity = trigram_similarity(query_grams, grams)
+            if similarity >= TRIGRAM_THRESHOLD:
+                scores[item_id] = scores.get(item_id, 0.0) + similarity
+
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+        return ranked if limit is None else ranked[:limit]
+
+
+class InMemorySearchBackend(SearchBackend):
+    """ Per-process index, built on first use and then kept up to date by signals. """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build()
+        return self._index
+
+    def _build(self):
+        index = InvertedIndex()
+        rows = MenuItem.objects.values_list(
+            'pk', 'name', 'brand__name', 'category__name', 'material', 'description'
+        )
+        for pk, name, brand, category, material, description in rows:
+            index.add(pk, [
+                (name or '', 'A'), (brand or '', 'B'), (category or '', 'B'),
+                (material or '', 'C'), (description or '', 'D'),
+            ])
+        return index
+
+    def search(self, queryset, text):
+        ranked = self.index.search(text)
+        if not ranked:
+            return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+        rank = Case(
+            *[When(pk=item_id, then=Value(score)) for item_id, score in ranked],
+            default=Value(0.0), output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=[item_id for item_id, _ in ranked]).annotate(rank=rank)
+
+    def index_item(self, item):
+        if self._index is None:
+            return  # Not built yet: the first search will load the current rows
+        document = search_document(item)
+        transaction.on_commit(lambda: self._apply(lambda index: index.add(item.pk, document)))
+
+    def remove_item(self, item_id):
+        if self._index is None:
+            return
+        transaction.on_commit(lambda: self._apply(lambda index: index.remove(item_id)))
+
+    def _apply(self, change):
+        with self._lock:
+            if self._index is not None:
+                change(self._index)
+
+    def rebuild(self):
+        with self._lock:
+            self._index = self._build()
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """ Backend from settings.MENU_SEARCH_BACKEND, else chosen by database vendor. """
+    path = getattr(settings, 'MENU_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return InMemorySearchBackend()
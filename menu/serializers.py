@@ -0,0 +1,84 @@
+# menu/serializers.py
+"""
+Serializers for the read-only catalog API (menu.api).
+
+Nested category/brand data comes from ``select_related`` on the viewset's
+queryset, so a page of products is always one query however many rows it
+has. Every serializer accepts ``?fields=id,name,price`` to return only those
+fields (sparse fieldsets).
+"""
+
+from rest_framework import serializers
+
+from .images import image_sources
+from .models import Brand, Category, MenuItem
+
+
+class SparseFieldsMixin:
+    """ Drops the fields not listed in the request's ``fields`` parameter (unknown names are ignored). """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request.query_params.get('fields') if request is not None else None
+        if requested:
+            keep = {name.strip() for name in requested.split(',') if name.strip()}
+            if keep & set(self.fields):
+                for name in set(self.fields) - keep:
+                    self.fields.pop(name)
+
+
+class BrandSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Brand
+        fields = ['id', 'name']
+
+
+class CategorySummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug']
+
+
+class BrandSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Brand
+        fields = ['id', 'name']
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    parent = serializers.PrimaryKeyRelatedField(read_only=True)  # parent_id: no extra query
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug', 'parent', 'level', 'description', 'updated_at']
+
+
+class MenuItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    category = CategorySummarySerializer(read_only=True)
+    brand = BrandSummarySerializer(read_only=True)
+    image = serializers.SerializerMethodField()
+    image_sources = serializers.SerializerMethodField()
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MenuItem
+        fields = [
+            'id', 'sku', 'name', 'description', 'price', 'category', 'brand',
+            'dimensions', 'material', 'is_available', 'image', 'image_sources',
+            'rating_average', 'rating_count', 'url', 'updated_at',
+        ]
+
+    def _absolute(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_image(self, item):
+        return self._absolute(item.image.url) if item.image else None
+
+    def get_image_sources(self, item):
+        """ Resized renditions as {mime type: srcset}, see menu.images. """
+        return {mime: srcset for mime, srcset in image_sources(item)}
+
+    def get_url(self, item):
+        return self._absolute(item.get_absolute_url())
@@ -0,0 +1,88 @@
+# menu/signals.py
+"""
+Keeps cached catalog data in step with the database.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from .models import Brand, Category, MenuItem
+from .search import get_search_backend
+from .versioning import CATALOG_VERSION, CATEGORY_VERSION, SUGGEST_VERSION, bump_version_on_commit
+
+# What the search suggestion index (menu.autocomplete) shows of an item
+SUGGESTION_FIELDS = ('name', 'is_available', 'brand_id', 'category_id')
+
+
+# --- Category tree ---
+# Covers the change form, deletes, and drag-and-drop moves in CategoryAdmin
+# (``move_node`` saves the node and then sends ``node_moved``).
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    bump_version_on_commit(CATEGORY_VERSION)
+
+
+# --- Whole catalog ---
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    bump_version_on_commit(CATALOG_VERSION)
+
+
+# --- Search suggestions ---
+# Reviews, sales and trending runs bump the catalog version often; the
+# suggestion index only needs rebuilding when names or availability change.
+@receiver(pre_save, sender=MenuItem)
+def check_suggestion_fields(sender, instance, raw=False, **kwargs):
+    """ Notes whether the save changes what the suggestion index shows (one query, admin saves only). """
+    if raw or instance._state.adding:
+        return
+    stored = MenuItem.objects.filter(pk=instance.pk).values_list(*SUGGESTION_FIELDS).first()
+    instance._suggestions_changed = stored != tuple(getattr(instance, field) for field in SUGGESTION_FIELDS)
+
+
+@receiver(post_save, sender=MenuItem)
+def invalidate_item_suggestions(sender, instance, **kwargs):
+    if getattr(instance, '_suggestions_changed', True):
+        bump_version_on_commit(SUGGEST_VERSION)
+
+
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def invalidate_suggestions(sender, **kwargs):
+    bump_version_on_commit(SUGGEST_VERSION)
+
+
+# --- Search index ---
+@receiver(post_save, sender=MenuItem)
+def index_menu_item(sender, instance, raw=False, **kwargs):
+    if not raw:  # Skip loaddata; run rebuild_search_index afterwards
+        get_search_backend().index_item(instance)
+
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_menu_item(sender, instance, **kwargs):
+    get_search_backend().remove_item(instance.pk)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def reindex_related_items(sender, instance, raw=False, **kwargs):
+    """ Brand and category names are part of each item's search document. """
+    if raw:
+        return
+    backend = get_search_backend()
+    for item in instance.menu_items.select_related('brand', 'category'):
+        backend.index_item(item)
@@ -0,0 +1,399 @@
+# menu/snapshot.py
+"""
+Memory-mapped, read-only snapshot of the product grid data.
+
+Every gunicorn worker used to run the same queries against the same small
+catalog. Instead, the columns menu_list filters and sorts on are written
+once per catalog version to a compact binary file:
+
+    id, price (cents), category id, brand id, material, width/height/depth
+    (tenths of a cm), name order, rating, popularity, trending score, flags
+
+for every available MenuItem. Each worker ``mmap``s the file read-only, so
+the operating system keeps one copy in the page cache for all of them and
+nothing is decoded up front: columns are ``memoryview``s cast straight onto
+the mapped bytes.
+
+``CatalogSnapshot.search`` answers category/price/size/brand/material/price
+band filters, every sort in menu.views.VALID_SORT_FIELDS and the facet counts
+from the snapshot alone. Only the page of ids that is shown is then loaded
+from the database (one primary key lookup). Full-text searches still go
+through the ORM.
+
+The file is named after the catalog version (menu.versioning), which lives in
+the shared default cache, so every worker looks for the same file and a
+catalog change makes the old one stale at once. Snapshots are never built
+in a request: ``manage.py build_catalog_snapshot --interval N`` writes one
+for each new version. It has to write to the workers' own disk, so the
+gunicorn master runs and restarts it (gunicorn.conf.py) rather than the
+Procfile. ``get_catalog_snapshot`` returns None
+until the current version's file exists, and callers use the ORM meanwhile.
+
+Settings: MENU_SNAPSHOT_ENABLED (default True), MENU_SNAPSHOT_DIR (default:
+<tmp>/urban-catalog).
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+
+from .facets import FacetCounts, FacetResult, FacetRow
+from .filters import PRICE_BANDS, SIZE_FILTERS
+from .models import Brand, MenuItem
+from .pagination import DEFAULT_PAGE_SIZE, KeysetPage, decode_cursor, encode_cursor
+from .versioning import CATALOG_VERSION, get_version
+
+MAGIC = b'URBCAT01'
+HEADER = struct.Struct('<8sI')  # Magic, length of the JSON header that follows
+KEEP_OLD_SECONDS = 600  # Superseded files are deleted once this old
+NONE_ID = 0   # category/brand id column: no category/brand
+NONE_SIZE = -1  # size columns: dimension couldn't be parsed
+HAS_IMAGE = 1  # flags column bits
+
+# name -> array typecode (all 8 or 4 bytes wide; every column starts 8-byte aligned)
+COLUMNS = {
+    'id': 'q', 'price': 'q', 'category': 'q', 'brand': 'q',
+    'material': 'i', 'width': 'i', 'height': 'i', 'depth': 'i',
+    'name_order': 'i', 'flags': 'i',
+    'rating': 'd', 'popularity': 'q', 'trending': 'd',
+}
+# menu_list sort field -> column (the pk tiebreaker is added by the sort)
+SORT_COLUMNS = {
+    'price': 'price', 'name': 'name_order', 'rating_average': 'rating',
+    'popularity': 'popularity', 'trending_score': 'trending',
+}
+SIZE_COLUMNS = {'width_cm': 'width', 'height_cm': 'height', 'depth_cm': 'depth'}
+
+
+def snapshot_settings():
+    return {
+        'enabled': getattr(settings, 'MENU_SNAPSHOT_ENABLED', True),
+        'dir': getattr(settings, 'MENU_SNAPSHOT_DIR', None) or os.path.join(tempfile.gettempdir(), 'urban-catalog'),
+    }
+
+
+def snapshot_path(directory, version):
+    return os.path.join(directory, f'catalog-{version}.snap')
+
+
+# --- Building ---
+def _tenths(value):
+    return NONE_SIZE if value is None else int(value * 10)
+
+
+def write_snapshot(path, version):
+    """ Writes the snapshot of the available items to ``path`` (atomically). Returns the row count. """
+    rows = list(
+        MenuItem.objects.filter(is_available=True).order_by('name', 'pk').values_list(
+            'pk', 'price', 'category_id', 'brand_id', 'material', 'width_cm', 'height_cm', 'depth_cm',
+            'image', 'rating_average', 'popularity', 'trending_score',
+        )
+    )
+    materials = sorted({row[4] for row in rows if row[4]})
+    material_index = {material: i for i, material in enumerate(materials)}
+    # Rows come back in the database's name order, so the list position is the
+    # name sort key: the database's collation decides, not Python's.
+    columns = {name: [] for name in COLUMNS}
+    for order, (pk, price, category_id, brand_id, material, width, height, depth, image, rating, popularity, trending) in enumerate(rows):
+        columns['id'].append(pk)
+        columns['price'].append(int(price * 100))  # Two decimal places: cents are exact
+        columns['category'].append(category_id or NONE_ID)
+        columns['brand'].append(brand_id or NONE_ID)
+        columns['material'].append(material_index[material] if material else -1)
+        columns['width'].append(_tenths(width))
+        columns['height'].append(_tenths(height))
+        columns['depth'].append(_tenths(depth))
+        columns['name_order'].append(order)
+        columns['flags'].append(HAS_IMAGE if image else 0)
+        columns['rating'].append(rating)
+        columns['popularity'].append(popularity)
+        columns['trending'].append(trending)
+
+    # Layout: magic + header length, JSON header, then one packed array per column
+    offsets, blobs, position = {}, [], 0
+    for name, typecode in COLUMNS.items():
+        offsets[name] = position
+        blob = struct.pack(f'<{len(rows)}{typecode}', *columns[name])
+        blob += b'\0' * (-len(blob) % 8)
+        blobs.append(blob)
+        position += len(blob)
+    header = json.dumps({
+        'version': version, 'built_at': time.time(), 'count': len(rows),
+        'columns': offsets, 'materials': materials,
+        'brands': {str(pk): name for pk, name in Brand.objects.values_list('pk', 'name')},
+    }).encode()
+    header += b' ' * (-(HEADER.size + len(header)) % 8)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(HEADER.pack(MAGIC, len(header)))
+            out.write(header)
+            for blob in blobs:
+                out.write(blob)
+        os.replace(tmp_path, path)  # Readers see the old file or the whole new one, never half
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(rows)
+
+
+# --- Reading ---
+class CatalogSnapshot:
+    """ A mapped snapshot file. Columns are zero-copy views onto the shared pages. """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, header_length = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        header = json.loads(bytes(view[HEADER.size:HEADER.size + header_length]))
+        start = HEADER.size + header_length
+        self.version = header['version']
+        self.built_at = header['built_at']
+        self.count = header['count']
+        self.materials = header['materials']
+        self.brands = {int(pk): name for pk, name in header['brands'].items()}
+        self.columns = {}
+        for name, typecode in COLUMNS.items():
+            offset = start + header['columns'][name]
+            size = struct.calcsize(typecode) * self.count
+            self.columns[name] = view[offset:offset + size].cast(typecode)
+        self._positions = None
+        self._engine = None
+
+    def position_of(self, pk):
+        """ Row number of item ``pk`` (None if it isn't in the snapshot). """
+        if self._positions is None:
+            self._positions = {pk: i for i, pk in enumerate(self.columns['id'])}
+        return self._positions.get(pk)
+
+    @property
+    def engine(self):
+        """ The query engine: vectorized (menu.columnar) with NumPy, row by row without. """
+        if self._engine is None:
+            from .columnar import ColumnarEngine, numpy_available
+            self._engine = ColumnarEngine(self) if numpy_available() else RowEngine(self)
+        return self._engine
+
+    def search(self, filters, category_tree, ordering):
+        """ (FacetCounts, row numbers in ``ordering``) for ``filters``; None if the ORM is needed. """
+        if filters.search or ordering.lstrip('-') not in SORT_COLUMNS:
+            return None
+        return self.engine.search(SnapshotQuery(self, filters, category_tree), ordering)
+
+
+class SnapshotQuery:
+    """ ``filters`` translated to the snapshot's columns, exactly as the ORM would compare them. """
+
+    def __init__(self, snapshot, filters, category_tree):
+        self.filters = filters
+        self.category_tree = category_tree
+        # Decimal thresholds, scaled to the integer columns (cents, tenths of a cm)
+        price_field = MenuItem._meta.get_field('price')
+        self.low = None if filters.min_price is None else price_field.to_python(filters.min_price) * 100
+        self.high = None if filters.max_price is None else price_field.to_python(filters.max_price) * 100
+        self.sizes = []  # [(column name, 'gte'/'lte', limit), ...]
+        for name, value in filters.sizes.items():
+            field_name, op = SIZE_FILTERS[name].rsplit('__', 1)
+            self.sizes.append((SIZE_COLUMNS[field_name], op, MenuItem._meta.get_field(field_name).to_python(value) * 10))
+        self.bands = [(band, lo, hi) for band, (lo, hi) in PRICE_BANDS.items()]
+
+        self.category_ids = None
+        if filters.category:
+            self.category_ids = category_tree.descendant_ids(filters.category)  # None: unknown slug, not filtered
+        self.brand_ids = set(filters.brands)
+        self.filter_materials = bool(filters.materials)
+        self.material_ids = {snapshot.materials.index(m) for m in filters.materials if m in snapshot.materials}
+        self.selected_bands = set(filters.price_bands)
+
+    def facet_row(self, snapshot, brand, category, material, band, count):
+        return FacetRow(
+            brand or None, snapshot.brands.get(brand), category or None,
+            snapshot.materials[material] if material >= 0 else None, band, count,
+        )
+
+
+class RowEngine:
+    """ Pure-Python engine: one pass over the mapped columns per query (slower than the ORM; see menu.columnar). """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def search(self, query, ordering):
+        snapshot = self.snapshot
+        columns = snapshot.columns
+        ids, prices, categories, brands, material_col = (
+            columns['id'], columns['price'], columns['category'], columns['brand'], columns['material'],
+        )
+        sizes = [(columns[name], op, limit) for name, op, limit in query.sizes]
+        low, high = query.low, query.high
+
+        grouped = Counter()  # (brand, category, material, band) -> items, like menu.facets.facet_rows
+        matches = []
+        for i in range(snapshot.count):
+            price = prices[i]
+            if low is not None and price < low or high is not None and price > high:
+                continue
+            if sizes and not all(_size_matches(column[i], op, limit) for column, op, limit in sizes):
+                continue
+            band = next((name for name, lo, hi in query.bands if (lo is None or price >= lo * 100) and (hi is None or price < hi * 100)), '')
+            brand, category, material = brands[i], categories[i], material_col[i]
+            grouped[(brand, category, material, band)] += 1
+
+            if query.category_ids is not None and category not in query.category_ids:
+                continue
+            if query.brand_ids and brand not in query.brand_ids:
+                continue
+            if query.filter_materials and material not in query.material_ids:
+                continue
+            if query.selected_bands and band not in query.selected_bands:
+                continue
+            matches.append(i)
+
+        rows = [query.facet_row(snapshot, *key, count) for key, count in grouped.items()]
+        sort_column = columns[SORT_COLUMNS[ordering.lstrip('-')]]
+        matches.sort(key=lambda i: (sort_column[i], ids[i]), reverse=ordering.startswith('-'))
+        return FacetCounts(query.filters, query.category_tree, rows), matches
+
+    def start_after(self, positions, column, key, descending):
+        """ Index in ``positions`` of the first row after the cursor ``key`` (value, pk). """
+        values, ids = self.snapshot.columns[column], self.snapshot.columns['id']
+        after = (lambda k: k < key) if descending else (lambda k: k > key)
+        return next((n for n, p in enumerate(positions) if after((values[p], ids[p]))), len(positions))
+
+
+def _size_matches(value, op, limit):
+    if value == NONE_SIZE:
+        return False  # NULL never matches, as in SQL
+    return value >= limit if op == 'gte' else value <= limit
+
+
+# --- Pagination (same cursors as menu.pagination.KeysetPaginator) ---
+class SnapshotPaginator:
+    """ Pages through snapshot row numbers, loading only the shown items from the database. """
+
+    def __init__(self, snapshot, positions, ordering, page_size=DEFAULT_PAGE_SIZE):
+        self.snapshot = snapshot
+        self.positions = positions
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.page_size = page_size
+
+    def _cursor_key(self, cursor):
+        """ The cursor as a (sort column value, pk) pair; None if it can't be placed. """
+        position = decode_cursor(cursor)
+        if position is None:
+            return None
+        value, pk = position
+        if self.field == 'name':
+            # Names are stored as their database sort order: place the cursor by its row
+            row = self.snapshot.position_of(pk)
+            return None if row is None else (self.snapshot.columns['name_order'][row], pk)
+        try:
+            if self.field == 'price':
+                return Decimal(value) * 100, pk
+            if self.field == 'popularity':
+                return int(value), pk
+            return float(value), pk
+        except (ArithmeticError, ValueError):
+            return None
+
+    def get_page(self, cursor=None):
+        start = 0
+        if cursor:
+            key = self._cursor_key(cursor)
+            if key is not None:
+                start = self.snapshot.engine.start_after(self.positions, SORT_COLUMNS[self.field], key, self.descending)
+
+        window = self.positions[start:start + self.page_size + 1]
+        ids = [self.snapshot.columns['id'][p] for p in window]
+        items = MenuItem.objects.select_related('category').in_bulk(ids[:self.page_size])
+        page = [items[pk] for pk in ids[:self.page_size] if pk in items]  # Deleted since the snapshot: skipped
+
+        next_cursor = None
+        if len(window) > self.page_size and page:
+            last = page[-1]
+            next_cursor = encode_cursor(getattr(last, self.field), last.pk)
+        return KeysetPage(page, next_cursor)
+
+
+def snapshot_search(filters, category_tree, ordering):
+    """ (FacetResult, SnapshotPaginator) from the current snapshot, or None to use the ORM. """
+    snapshot = get_catalog_snapshot()
+    if snapshot is None:
+        return None
+    result = snapshot.search(filters, category_tree, ordering)
+    if result is None:
+        return None
+    counts, positions = result
+    # Never evaluated; building it records the same errors (unknown category) as the ORM path
+    queryset = filters.queryset(category_tree)
+    return FacetResult(queryset, counts), SnapshotPaginator(snapshot, positions, ordering)
+
+
+# --- The current snapshot, per process ---
+_current = None
+_lock = threading.Lock()
+
+
+def build_snapshot(version=None):
+    """ Writes the snapshot for the current (or given) catalog version. Returns (path, rows). """
+    config = snapshot_settings()
+    version = get_version(CATALOG_VERSION) if version is None else version
+    path = snapshot_path(config['dir'], version)
+    rows = write_snapshot(path, version)
+    _remove_old_snapshots(config['dir'], keep=path, older_than=KEEP_OLD_SECONDS)
+    return path, rows
+
+
+def snapshot_is_built(version=None):
+    """ Whether the snapshot file for the current (or given) catalog version exists. """
+    version = get_version(CATALOG_VERSION) if version is None else version
+    return os.path.exists(snapshot_path(snapshot_settings()['dir'], version))
+
+
+def get_catalog_snapshot():
+    """ The snapshot for the current catalog version, or None until it is built (callers use the ORM). """
+    global _current
+    config = snapshot_settings()
+    if not config['enabled']:
+        return None
+    version = get_version(CATALOG_VERSION)
+    snapshot = _current
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        try:
+            snapshot = CatalogSnapshot(snapshot_path(config['dir'], version))
+        except (OSError, ValueError):
+            return None  # Not written yet: build_catalog_snapshot is on it
+        _current = snapshot  # The previous mapping closes once nothing uses it
+        return snapshot
+
+
+def _remove_old_snapshots(directory, keep, older_than):
+    """ Deletes superseded files. Workers still mapping one keep their pages until they let go. """
+    cutoff = time.time() - older_than
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith('catalog-') and name.endswith('.snap') and path != keep:
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,57 @@
+# menu/templatetags/menu_tags.py
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from menu.images import image_sources
+from menu.page_cache import HOLE_MARKER, is_filling_cache
+
+register = template.Library()
+
+
+@register.filter
+def facet_count(facets, node):
+    """ {{ facets|facet_count:node }} - items under a category node for the current filters. """
+    if not facets:
+        return ''
+    return facets.categories.get(node.id, 0)
+
+
+@register.simple_tag(takes_context=True)
+def page_cache_hole(context, template_name):
+    """ Includes ``template_name``, or leaves a marker for menu.page_cache to fill per visitor. """
+    request = context.get('request')
+    if request is not None and is_filling_cache(request):
+        return mark_safe(HOLE_MARKER.format(template_name))
+    return render_to_string(template_name, context.flatten(), request=request)
+
+
+@register.inclusion_tag('menu/partials/responsive_image.html')
+def responsive_image(item, sizes='100vw', css_class='', alt=None):
+    """ {% responsive_image item sizes="(min-width: 992px) 33vw, 100vw" css_class="card-img-top" %}
+
+        A <picture> with the AVIF/WebP renditions (menu.images) and the
+        original as fallback; just the <img> if no renditions exist yet.
+    """
+    return {
+        'item': item,
+        'sources': image_sources(item),
+        'sizes': sizes,
+        'css_class': css_class,
+        'alt': alt or item.name,
+    }
+
+
+@register.inclusion_tag('menu/partials/star_rating.html')
+def star_rating(item, show_count=True):
+    """ {% star_rating item %} - stars from the stored review aggregates (no query). """
+    average = item.rating_average or 0
+    full = int(average)
+    half = average - full >= 0.5
+    return {
+        'item': item,
+        'full': range(full),
+        'half': half,
+        'empty': range(5 - full - half),
+        'show_count': show_count,
+    }
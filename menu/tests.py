@@ -1,3 +1,1027 @@
-from django.test import TestCase
+import itertools
+import json
+import os
+import random
+import re
+import tempfile
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from orders.models import Order, OrderItem
+
+from . import autocomplete, snapshot
+from .card_cache import card_key, render_cards
+from .dimensions import parse_dimensions
+from .category_tree import get_category_tree
+from .columnar import ColumnarEngine, numpy_available
+from .filters import CatalogFilters
+from .images import items_needing_renditions
+from .models import Brand, Category, CoPurchase, MenuItem, RecommenderRun, RelatedItem
+from .pagination import KeysetPaginator, decode_cursor, encode_cursor
+from .search import get_search_backend
+from .versioning import CATALOG_VERSION, CATEGORY_VERSION, SUGGEST_VERSION, bump_version, get_version
+from .views import menu_list_paginator
+
+
+class CategoryTreeTests(TestCase):
+    """ The sidebar tree is one cached query, rebuilt when a category changes. """
+
+    def setUp(self):
+        cache.clear()
+        self.sofas = Category.objects.create(name='Sofa Sets')
+        self.three = Category.objects.create(name='3-Seater', parent=self.sofas)
+        self.tables = Category.objects.create(name='Tables')
+
+    def test_tree_is_cached(self):
+        with self.assertNumQueries(1):
+            tree = get_category_tree()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_category_tree().get('3-seater').parent_id, self.sofas.pk)
+        self.assertEqual(tree.descendant_ids('sofa-sets'), (self.sofas.pk, self.three.pk))
+        self.assertEqual([node.slug for node in tree.get('sofa-sets').get_children()], ['3-seater'])
+        self.assertIsNone(tree.descendant_ids('nope'))
+
+    def test_changes_bump_the_version(self):
+        get_category_tree()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Chairs')
+        self.assertIsNotNone(get_category_tree().get('chairs'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.move_node(Category.objects.get(pk=self.three.pk), Category.objects.get(pk=self.tables.pk), 'last-child')
+        self.assertEqual(get_category_tree().get('3-seater').parent_id, self.tables.pk)
+
+    def test_version_counter(self):
+        version = get_version(CATEGORY_VERSION)
+        self.assertEqual(bump_version(CATEGORY_VERSION), version + 1)
+        self.assertEqual(get_version(CATEGORY_VERSION), version + 1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Category.objects.create(name='Chairs')
+        self.assertEqual(get_version(CATEGORY_VERSION), version + 1)  # Not before the commit
+        callbacks[0]()
+        self.assertEqual(get_version(CATEGORY_VERSION), version + 2)
+
+    def test_sidebar_from_the_cached_tree(self):
+        MenuItem.objects.create(name='Corner sofa', description='d', price='10.00', category=self.three)
+        self.client.get(reverse('menu:menu_list'))
+        response = self.client.get(reverse('menu:menu_list'), {'sort_by': 'name_desc'})
+        self.assertContains(response, '3-Seater')
+        self.assertIs(response.context['categories'], response.context['category_tree'])
+
+
+@override_settings(MENU_SNAPSHOT_ENABLED=False)
+class CategoryFilterTests(TestCase):
+    """ ?category= matches the category and everything under it, through the cached id index. """
+
+    def setUp(self):
+        cache.clear()
+        self.sofas = Category.objects.create(name='Sofa Sets')
+        self.three = Category.objects.create(name='3-Seater', parent=self.sofas)
+        self.corner = Category.objects.create(name='Corner', parent=self.three)
+        self.tables = Category.objects.create(name='Tables')
+        for name, category in (('Loveseat', self.sofas), ('Chesterfield', self.three), ('L-shape', self.corner), ('Desk', self.tables)):
+            MenuItem.objects.create(name=name, description='d', price='100.00', category=category)
+
+    def names(self, **params):
+        response = self.client.get(reverse('menu:menu_list'), params)
+        return [item.name for item in response.context['page']]
+
+    def test_descendants_are_included(self):
+        self.assertEqual(self.names(category='sofa-sets'), ['Chesterfield', 'L-shape', 'Loveseat'])
+        self.assertEqual(self.names(category='3-seater'), ['Chesterfield', 'L-shape'])
+        self.assertEqual(self.names(category='tables'), ['Desk'])
+
+    def test_filter_uses_the_index(self):
+        get_category_tree()
+        filters = CatalogFilters.from_querydict(QueryDict('category=sofa-sets'))
+        where = str(filters.queryset(get_category_tree()).query).split(' WHERE ')[1]
+        ids = ', '.join(str(pk) for pk in sorted([self.sofas.pk, self.three.pk, self.corner.pk]))
+        self.assertIn(f'"category_id" IN ({ids})', where)
+        self.assertNotIn('lft', where)  # No MPTT subquery
+
+    def test_unknown_category(self):
+        response = self.client.get(reverse('menu:menu_list'), {'category': 'nope'}, follow=True)
+        self.assertEqual(len(response.context['page']), 4)
+        self.assertIn("Selected category not found.", [str(m) for m in response.context['messages']])
+
+
+@override_settings(MENU_SNAPSHOT_ENABLED=False)
+class KeysetPaginationTests(TestCase):
+    """ Cursor pages walk every sort order exactly once, with no OFFSET or COUNT. """
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Sofa Sets')
+        for n in range(50):  # Plenty of equal prices and names: the pk tiebreaker matters
+            MenuItem.objects.create(name=f'Item {n % 7}', description='d', price=f'{(n % 5) * 10}.50', category=self.category)
+
+    def test_every_row_once(self):
+        for ordering in ('price', '-price', 'name', '-name'):
+            queryset = MenuItem.objects.all()
+            paginator = KeysetPaginator(queryset, ordering, page_size=7)
+            seen, cursor = [], None
+            while True:
+                page = paginator.get_page(cursor)
+                seen += [item.pk for item in page]
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            prefix = '-' if ordering.startswith('-') else ''
+            self.assertEqual(seen, list(queryset.order_by(ordering, f'{prefix}pk').values_list('pk', flat=True)))
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor('10.50', 7)), ('10.50', 7))
+        for bad in ('!!bad', '', 'e30'):
+            self.assertIsNone(decode_cursor(bad))
+        sql = str(KeysetPaginator(MenuItem.objects.all(), 'price').page_queryset(encode_cursor('10.50', 7)).query)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_pages_and_fragments(self):
+        url = reverse('menu:menu_list')
+        response = self.client.get(url, {'sort_by': 'price_desc', 'category': 'sofa-sets'})
+        self.assertEqual(len(response.context['page']), 24)
+        next_url = response.context['next_page_url']
+        self.assertIn('sort_by=price_desc', next_url)
+
+        response = self.client.get(next_url + '&fragment=1')
+        self.assertNotIn(b'<html', response.content)
+        response = self.client.get(response['X-Next-Page'])
+        self.assertEqual(len(response.context['page']), 2)
+        self.assertIsNone(response.context['next_page_url'])
+
+        self.assertEqual(len(self.client.get(url, {'cursor': '!!bad'}).context['page']), 24)  # Bad cursor: first page
+
+
+@override_settings(MENU_SNAPSHOT_ENABLED=False)
+class SearchTests(TestCase):
+    """ Ranked search: name beats description, brand/category count, typos still match. """
+
+    def setUp(self):
+        cache.clear()
+        get_search_backend.cache_clear()  # Fresh in-memory index on SQLite
+        self.category = Category.objects.create(name='Sofa Sets')
+        self.brand = Brand.objects.create(name='Ashley')
+        MenuItem.objects.create(name='Velvet Corner Sofa', description='lovely', price='100.00', category=self.category, material='Velvet')
+        MenuItem.objects.create(name='Oak Table', description='velvet pillow included', price='50.00')
+        MenuItem.objects.create(name='Leather Chair', description='d', price='70.00', brand=self.brand)
+
+    def names(self, **params):
+        response = self.client.get(reverse('menu:menu_list'), params)
+        return [item.name for item in response.context['page']]
+
+    def test_ranking_and_filters(self):
+        self.assertEqual(self.names(search='velvet'), ['Velvet Corner Sofa', 'Oak Table'])
+        self.assertEqual(self.names(search='ashley'), ['Leather Chair'])  # Brand
+        self.assertEqual(self.names(search='sofas'), ['Velvet Corner Sofa'])  # Category, stemmed
+        self.assertEqual(self.names(search='velvet', max_price='60'), ['Oak Table'])
+        self.assertEqual(self.names(search='nothing'), [])
+
+    def test_typos(self):
+        search = 'lether chiar' if connection.vendor == 'sqlite' else 'leather'
+        self.assertEqual(self.names(search=search), ['Leather Chair'])
+
+    def test_index_follows_changes(self):
+        self.names(search='velvet')
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(name='Velvet Ottoman', description='d', price='10.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand.name = 'Zephyr'
+            self.brand.save()
+        self.assertEqual(len(self.names(search='velvet')), 3)
+        self.assertEqual(self.names(search='zephyr'), ['Leather Chair'])
+
+    def test_paging_by_rank(self):
+        for n in range(30):
+            MenuItem.objects.create(name=f'Velvet thing {n}', description='velvet ' * (n % 4), price='1.00')
+        get_search_backend().rebuild()
+        seen, url = [], reverse('menu:menu_list') + '?search=velvet'
+        while url:
+            response = self.client.get(url)
+            seen += [item.pk for item in response.context['page']]
+            url = response.context['next_page_url']
+        self.assertEqual(len(seen), 32)
+        self.assertEqual(len(set(seen)), 32)
+
+    @override_settings(MENU_SEARCH_BACKEND='menu.search.InMemorySearchBackend')
+    def test_in_memory_search_returns_every_match(self):
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+        MenuItem.objects.bulk_create(
+            MenuItem(name=f'Velvet cushion {n}', description='d', price='5.00', brand=self.brand) for n in range(600)
+        )
+        get_search_backend().rebuild()
+        response = self.client.get(reverse('menu:menu_list'), {'search': 'velvet'})
+        facets = response.context['facets']
+        self.assertEqual(facets.total, 602)
+        self.assertEqual({o.label: o.count for o in facets.brands}, {'Ashley': 600})
+
+
+class SuggestTests(TestCase):
+    """ Search box suggestions: prefix and word-start matches, one typo allowed, no queries per keystroke. """
+
+    def setUp(self):
+        cache.clear()
+        autocomplete._index = None
+        autocomplete._rebuilding = False
+        # Rebuild in the request: a thread's own connection can't see the test's rows
+        patcher = mock.patch.object(autocomplete, '_start_rebuild', side_effect=autocomplete._rebuild)
+        self.start_rebuild = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.category = Category.objects.create(name='Sofa Sets')
+        self.brand = Brand.objects.create(name='Ashley Furniture')
+        self.corner = MenuItem.objects.create(name='Velvet Corner Sofa', description='d', price='100.00', category=self.category, brand=self.brand)
+        self.bed = MenuItem.objects.create(name='Sofa Bed', description='d', price='100.00', category=self.category)
+
+    def suggest(self, q):
+        return [(s['label'], s['kind']) for s in self.client.get(reverse('menu:suggest'), {'q': q}).json()['suggestions']]
+
+    def test_prefix_and_word_starts(self):
+        self.assertEqual(
+            set(self.suggest('sof')),
+            {('Sofa Bed', 'product'), ('Velvet Corner Sofa', 'product'), ('Sofa Sets', 'category')},
+        )
+        self.assertEqual(self.suggest('s'), [])  # Too short
+
+    def test_one_typo(self):
+        self.suggest('sof')
+        with self.assertNumQueries(0):  # Index built once, then answered from memory
+            self.assertIn(('Sofa Bed', 'product'), self.suggest('sofs'))
+        self.assertEqual(self.suggest('ashly'), [('Ashley Furniture', 'brand')])
+
+    def test_popular_first(self):
+        order = Order.objects.create(customer_name='c', customer_phone='1', delivery_address='a')
+        OrderItem.objects.create(order=order, menu_item=self.corner, price_per_unit=Decimal('100.00'), quantity=3)
+        products = [label for label, kind in self.suggest('sof') if kind == 'product']
+        self.assertEqual(products, ['Velvet Corner Sofa', 'Sofa Bed'])
+
+    def test_rebuilt_after_catalog_change(self):
+        self.suggest('sof')
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(name='Sofabulous', description='d', price='1.00')
+        self.assertIn(('Sofabulous', 'product'), self.suggest('sofab'))
+
+    def test_only_name_and_availability_changes_rebuild(self):
+        version = get_version(SUGGEST_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.corner.price = Decimal('90.00')
+            self.corner.save()
+            bump_version(CATALOG_VERSION)  # e.g. a review or a trending run
+        self.assertEqual(get_version(SUGGEST_VERSION), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.corner.is_available = False
+            self.corner.save()
+        self.assertNotEqual(get_version(SUGGEST_VERSION), version)
+
+    def test_stale_index_served_while_rebuilding(self):
+        self.suggest('sof')
+        self.start_rebuild.side_effect = None  # The background thread hasn't finished yet
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(name='Sofabulous', description='d', price='1.00')
+        with self.assertNumQueries(0):
+            self.assertNotIn(('Sofabulous', 'product'), self.suggest('sofab'))
+            self.assertNotIn(('Sofabulous', 'product'), self.suggest('sofab'))
+        self.start_rebuild.assert_called_once()  # One rebuild per worker, not one per request
+
+        autocomplete._rebuild(*self.start_rebuild.call_args.args)
+        self.assertIn(('Sofabulous', 'product'), self.suggest('sofab'))
+
+
+@override_settings(MENU_SNAPSHOT_ENABLED=False)
+class FacetTests(TestCase):
+    """ Brand/material/price band/category counts, each ignoring its own selection, from one query. """
+
+    def setUp(self):
+        cache.clear()
+        self.sofas = Category.objects.create(name='Sofas')
+        self.corner = Category.objects.create(name='Corner', parent=self.sofas)
+        self.tables = Category.objects.create(name='Tables')
+        self.ashley = Brand.objects.create(name='Ashley')
+        self.zed = Brand.objects.create(name='Zed')
+        MenuItem.objects.create(name='S1', description='d', price='10000', category=self.corner, brand=self.ashley, material='Velvet')
+        MenuItem.objects.create(name='S2', description='d', price='30000', category=self.sofas, brand=self.zed, material='Leather')
+        MenuItem.objects.create(name='T1', description='d', price='60000', category=self.tables, brand=self.ashley, material='Oak')
+        MenuItem.objects.create(name='T2', description='d', price='200000', category=self.tables, material='Oak')
+
+    def get(self, **params):
+        return self.client.get(reverse('menu:menu_list'), params)
+
+    def test_unfiltered_counts(self):
+        facets = self.get().context['facets']
+        self.assertEqual(facets.total, 4)
+        self.assertEqual({o.label: o.count for o in facets.brands}, {'Ashley': 2, 'Zed': 1})
+        self.assertEqual({o.label: o.count for o in facets.materials}, {'Leather': 1, 'Oak': 2, 'Velvet': 1})
+        self.assertEqual([o.count for o in facets.price_bands], [1, 1, 1, 1])
+        self.assertEqual(facets.categories[self.sofas.pk], 2)  # Rolled up from Corner
+
+    def test_counts_ignore_their_own_selection(self):
+        response = self.get(brand=[self.ashley.pk], category='sofas')
+        facets = response.context['facets']
+        self.assertEqual([item.name for item in response.context['page']], ['S1'])
+        self.assertEqual({o.label: (o.count, o.selected) for o in facets.brands}, {'Ashley': (1, True), 'Zed': (1, False)})
+        self.assertEqual(facets.categories[self.tables.pk], 1)
+        self.assertEqual({o.label: o.count for o in facets.materials}, {'Velvet': 1})
+        self.assertEqual(facets.total, 1)
+
+    def test_bands_and_materials(self):
+        response = self.get(price_band=['over-100k', 'bogus'], material='Oak')
+        self.assertEqual([item.name for item in response.context['page']], ['T2'])
+        self.assertContains(response, 'name="price_band" value="over-100k"')
+
+    def test_grouped_rows_are_cached(self):
+        self.get(brand=[self.ashley.pk])
+        with self.assertNumQueries(1):  # Items only: the facet rows are shared by every brand selection
+            self.get(brand=[self.zed.pk])
+
+    def test_invalid_prices(self):
+        for value in ('nan', 'inf', '-Infinity', 'abc'):
+            response = self.get(min_price=value, max_price='50000')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['facets'].total, 2)  # Only the valid max_price applies
+            self.assertIn("Invalid price value entered.", [str(m) for m in response.context['messages']])
+
+
+@override_settings(MENU_SNAPSHOT_ENABLED=False)
+class PageCacheTests(TestCase):
+    """ Shop pages are cached once per catalog version and filters, with per-visitor holes. """
+
+    def setUp(self):
+        cache.clear()
+        get_search_backend.cache_clear()
+        self.category = Category.objects.create(name='Sofas')
+        self.item = MenuItem.objects.create(name='Chesterfield Sofa', description='d', price='10000', category=self.category)
+        self.user = User.objects.create_user(username='shopper', password='secret')
+
+    def test_shared_page_with_holes(self):
+        url = reverse('menu:menu_list')
+        response = self.client.get(url, {'category': 'sofas'})
+        self.assertContains(response, 'Chesterfield Sofa')
+        self.assertContains(response, 'Sign In')
+        self.assertNotContains(response, 'page-cache-hole')
+        with self.assertNumQueries(0):  # Unknown parameters don't change the key
+            response = self.client.get(url, {'category': 'sofas', 'utm_source': 'x'})
+        self.assertContains(response, 'Chesterfield Sofa')
+
+        self.client.login(username='shopper', password='secret')
+        self.client.get(reverse('cart:add_item', args=[self.item.pk]))
+        response = self.client.get(url, {'category': 'sofas'})
+        self.assertContains(response, 'shopper')  # The user menu hole, filled for this visitor
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertRegex(response.content.decode(), r'cart-count-badge[^>]*>\s*1')
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_catalog_change_invalidates(self):
+        url = reverse('menu:menu_detail', kwargs={'item_id': self.item.pk})
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = 'Camelback Sofa'
+            self.item.save()
+        self.assertContains(self.client.get(url), 'Camelback Sofa')
+        self.assertEqual(self.client.get(reverse('menu:menu_detail', kwargs={'item_id': 999})).status_code, 404)
+
+    def test_pages_with_messages_are_not_cached(self):
+        for _ in range(2):
+            self.assertContains(self.client.get(reverse('menu:menu_list'), {'min_price': 'abc'}), 'Invalid price')
+
+    def test_search_box_shows_this_visitors_text(self):
+        url = reverse('menu:menu_list')
+        self.assertContains(self.client.get(url, {'search': 'Sofa'}), 'value="Sofa"')
+        response = self.client.get(url, {'search': 'SOFA'})
+        self.assertContains(response, 'value="SOFA"')
+        self.assertNotEqual(response['ETag'], self.client.get(url, {'search': 'Sofa'})['ETag'])
+
+    def test_next_page_link_from_the_filters(self):
+        for n in range(30):
+            MenuItem.objects.create(name=f'Sofa {n}', description='d', price='20000', category=self.category)
+        url = reverse('menu:menu_list')
+        self.client.get(url, {'category': 'sofas', 'utm_source': 'newsletter', 'min_price': '15000'})
+        response = self.client.get(url, {'min_price': '15000.0', 'category': 'sofas'})  # Same page, from the cache
+        next_url = re.search(r'<a href="([^"]+)" id="load-more-btn"', response.content.decode()).group(1)
+        self.assertNotIn('utm_source', next_url)
+        self.assertIn('min_price=15000', next_url)
+        self.assertContains(response, 'name="min_price" class="form-control rounded-pill mb-2" placeholder="Min Price (KES)" value="15000"')
+
+
+class CardCacheTests(TestCase):
+    """ Product cards are cached per item save and category version. """
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Sofas')
+        for n in range(30):
+            MenuItem.objects.create(name=f'Sofa {n:02}', description='d', price='10000', category=self.category)
+
+    def items(self):
+        return list(MenuItem.objects.select_related('category').order_by('name')[:5])
+
+    def test_cards_are_cached(self):
+        items = self.items()
+        cards = render_cards(items)
+        self.assertEqual([item for item, _ in cards], items)
+        self.assertIn('Sofa 00', cards[0][1])
+        key = card_key(items[0], get_version(CATEGORY_VERSION))
+        self.assertEqual(cache.get(key), cards[0][1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            items[0].name = 'Sofa 00 (new)'
+            items[0].save()
+        self.assertIn('Sofa 00 (new)', render_cards(self.items())[0][1])  # New updated_at: new key
+
+    def test_category_rename(self):
+        render_cards(self.items())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Couches'
+            self.category.save()
+        self.assertIn('Couches', render_cards(self.items())[0][1])
+
+    def test_grid_pages(self):
+        response = self.client.get(reverse('menu:menu_list'))
+        self.assertContains(response, 'data-aos-delay', count=24)
+        response = self.client.get(reverse('menu:menu_list'), {'cursor': response.context['page'].next_cursor, 'fragment': 1})
+        self.assertContains(response, 'Sofa 29')
+        self.assertNotContains(response, 'Sofa 00')
+
+
+@override_settings(MENU_SNAPSHOT_ENABLED=False)
+class ConditionalGetTests(TestCase):
+    """ menu_list/menu_detail answer If-None-Match with cheap 304s. """
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Sofas')
+        self.item = MenuItem.objects.create(name='Chesterfield', description='d', price='10000', category=self.category)
+        self.detail = reverse('menu:menu_detail', kwargs={'item_id': self.item.pk})
+
+    def test_list_etag(self):
+        url = reverse('menu:menu_list')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('must-revalidate', response['Cache-Control'])
+
+    def test_detail_validators(self):
+        self.client.get(self.detail)
+        response = self.client.get(self.detail)
+        # Related items change without touching the item: only the ETag can tell
+        self.assertFalse(response.has_header('Last-Modified'))
+        with self.assertNumQueries(1):  # The two timestamps
+            self.assertEqual(self.client.get(self.detail, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # No signals, so only the run below moves the catalog version
+        MenuItem.objects.bulk_create([MenuItem(name='Club Chair', description='d', price='5000', category=self.category)])
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('build_recommendations', verbosity=0)  # Gives the item a neighbour
+        self.assertEqual(self.client.get(self.detail, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        response = self.client.get(self.detail)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Couches'
+            self.category.save()
+        self.assertEqual(self.client.get(self.detail, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(reverse('menu:menu_detail', kwargs={'item_id': 999})).status_code, 404)
+
+    def test_personal_pages(self):
+        User.objects.create_user(username='shopper', password='secret')
+        self.client.login(username='shopper', password='secret')
+        url = reverse('menu:menu_list')
+        self.client.get(url)  # Sets the CSRF cookie, which the ETag covers
+        response = self.client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.client.get(reverse('cart:add_item', args=[self.item.pk]))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)  # Badge changed
+
+        response = self.client.get(self.detail)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class RecommendationTests(TestCase):
+    """ "Customers also bought" neighbours, updated incrementally from new orders. """
+
+    def setUp(self):
+        cache.clear()
+        sofas = Category.objects.create(name='Sofas')
+        tables = Category.objects.create(name='Tables')
+        self.items = [
+            MenuItem.objects.create(name=f'Item {n}', description='d', price='10', category=sofas if n < 3 else tables)
+            for n in range(6)
+        ]
+
+    def order(self, *items, settled=True):
+        order = Order.objects.create(customer_name='c', customer_phone='1', delivery_address='a')
+        for item in items:
+            OrderItem.objects.create(order=order, menu_item=item, price_per_unit=Decimal('10'), quantity=1)
+        if settled:  # Older than SETTLE_TIME
+            Order.objects.filter(pk=order.pk).update(created_at=order.created_at - timedelta(hours=1))
+        return order
+
+    def related(self, item):
+        return list(RelatedItem.objects.filter(item=item).order_by('rank').values_list('related__name', flat=True))
+
+    def test_co_purchases_rank_first(self):
+        items = self.items
+        self.order(items[0], items[4])
+        self.order(items[0], items[4], items[5])
+        self.order(items[0], items[5])
+        call_command('build_recommendations', verbosity=0)
+        related = self.related(items[0])
+        self.assertEqual(related[:2], ['Item 4', 'Item 5'])
+        self.assertIn('Item 1', related)  # Topped up from the same category
+        self.assertEqual(CoPurchase.objects.get(item=items[0], other=items[0]).count, 3)
+
+        response = self.client.get(reverse('menu:menu_detail', kwargs={'item_id': items[0].pk}))
+        self.assertEqual([item.name for item in response.context['related_items']], ['Item 4', 'Item 5', 'Item 1'])
+
+    def test_incremental_runs(self):
+        items = self.items
+        self.order(items[0], items[4])
+        call_command('build_recommendations', verbosity=0)
+        self.order(items[0], items[1])
+        self.order(items[0], items[1])
+        self.order(items[2], items[3], settled=False)  # Too recent: left for the next run
+        call_command('build_recommendations', verbosity=0)
+        self.assertEqual(RecommenderRun.objects.latest().orders_processed, 2)
+        self.assertEqual(CoPurchase.objects.get(item=items[0], other=items[0]).count, 3)
+        self.assertEqual(self.related(items[0])[0], 'Item 1')
+
+        call_command('build_recommendations', '--full', verbosity=0)
+        self.assertEqual(RecommenderRun.objects.latest().orders_processed, 3)
+        self.assertEqual(CoPurchase.objects.get(item=items[0], other=items[1]).count, 2)
+
+    def test_canceled_after_a_run(self):
+        items = self.items
+        self.order(items[0], items[4])
+        order = self.order(items[0], items[5])
+        call_command('build_recommendations', verbosity=0)
+        self.assertEqual(self.related(items[0])[:2], ['Item 4', 'Item 5'])
+
+        order.status = 'Canceled'
+        order.save()
+        self.assertFalse(CoPurchase.objects.filter(item=items[0], other=items[5]).exists())
+        self.assertEqual(CoPurchase.objects.get(item=items[0], other=items[0]).count, 1)
+        self.assertNotIn('Item 5', self.related(items[0]))
+
+        order.status = 'Pending'
+        order.save()
+        self.assertEqual(CoPurchase.objects.get(item=items[0], other=items[5]).count, 1)
+        self.assertIn('Item 5', self.related(items[0]))
+
+        # The next run doesn't count it again
+        call_command('build_recommendations', verbosity=0)
+        self.assertEqual(CoPurchase.objects.get(item=items[0], other=items[0]).count, 2)
+
+
+def image_file(name, width, height, fmt='JPEG'):
+    """ A small in-memory image upload. """
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImageRenditionTests(TestCase):
+    """ build_image_renditions writes resized copies through the storage; saving an item doesn't. """
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        storages = {'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+        settings = self.settings(MEDIA_ROOT=media.name, STORAGES=storages)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def build(self):
+        out = StringIO()
+        call_command('build_image_renditions', workers=0, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_saving_builds_nothing(self):
+        item = MenuItem.objects.create(name="Sofa", price='100', image=image_file('sofa.jpg', 1200, 800))
+        item.refresh_from_db()
+        self.assertFalse(item.image_renditions)
+        self.assertEqual(items_needing_renditions(), [(item.pk, item.image.name)])
+        # Until the command runs the original is served
+        self.assertContains(self.client.get(reverse('menu:menu_list')), item.image.url)
+
+    def test_command_builds_renditions(self):
+        item = MenuItem.objects.create(name="Sofa", price='100', image=image_file('sofa.jpg', 1200, 800))
+        self.assertIn("Done: 1 images processed, 0 failed.", self.build())
+        item.refresh_from_db()
+        self.assertEqual((item.image_width, item.image_height), (1200, 800))
+        webp = item.image_renditions['webp']
+        self.assertEqual(sorted(webp, key=int), ['320', '640', '960'])
+        for name in webp.values():
+            self.assertTrue(default_storage.exists(name))
+        with Image.open(default_storage.open(webp['640'])) as rendition:
+            self.assertEqual(rendition.size, (640, 427))
+        html = self.client.get(reverse('menu:menu_list')).content.decode()
+        self.assertIn('image/webp', html)
+        self.assertIn('960w', html)
+        self.assertIn("already have renditions", self.build())
+
+    def test_changed_image_is_rebuilt(self):
+        item = MenuItem.objects.create(name="Sofa", price='100', image=image_file('sofa.jpg', 1200, 800))
+        self.build()
+        item.image = image_file('new.png', 500, 500, 'PNG')
+        item.save()
+        self.assertEqual(items_needing_renditions(), [(item.pk, item.image.name)])
+        self.build()
+        item.refresh_from_db()
+        self.assertEqual(sorted(item.image_renditions['webp'], key=int), ['320', '500'])
+
+    def test_broken_image_is_reported(self):
+        item = MenuItem.objects.create(name="Sofa", price='100', image=SimpleUploadedFile('sofa.jpg', b'not an image'))
+        self.assertIn("Done: 0 images processed, 1 failed.", self.build())
+        item.refresh_from_db()
+        self.assertFalse(item.image_renditions)
+
+
+class CatalogImportTests(TestCase):
+    """ import_catalog/export_catalog: upserts by sku, category paths, bad rows, round trip. """
+
+    FEED = (
+        "sku,name,description,price,category,brand,dimensions,material,is_available\n"
+        "S1,Oslo Sofa,Grey linen,45000.50,Sofa Sets > 3-Seater,Nordic,200 x 90 x 85 cm,Linen,true\n"
+        "S2,Oslo Chair,,12000,Sofa Sets > Armchairs,Nordic,,,false\n"
+        "S3,Pine Table,,8000,Tables,,,Pine,\n"
+        ",No Sku,,100,Tables,,,,\n"
+        "S5,Bad Price,,abc,Tables,,,,\n"
+        "S6,Not A Number,,nan,Tables,,,,\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        get_search_backend.cache_clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        Category.objects.create(name="Sofa Sets")
+
+    def path(self, name, content=None):
+        path = os.path.join(self.dir, name)
+        if content is not None:
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write(content)
+        return path
+
+    def run_command(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command(*args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import(self):
+        out, err = self.run_command('import_catalog', self.path('feed.csv', self.FEED))
+        self.assertIn("Imported 3 products", out)
+        self.assertIn("3 rows skipped", out)
+        self.assertIn("Line 5: missing sku", err)
+        self.assertIn("Line 6: invalid price 'abc'", err)
+        self.assertIn("Line 7: invalid price 'nan'", err)
+
+        sofa = MenuItem.objects.get(sku='S1')
+        self.assertEqual(sofa.price, Decimal('45000.50'))
+        self.assertEqual(sofa.brand.name, "Nordic")
+        self.assertEqual(sofa.category.name, "3-Seater")
+        self.assertEqual(sofa.category.parent.name, "Sofa Sets")
+        self.assertEqual((sofa.width_cm, sofa.depth_cm, sofa.height_cm), (200, 90, 85))
+        self.assertFalse(MenuItem.objects.get(sku='S2').is_available)
+        self.assertTrue(MenuItem.objects.get(sku='S3').is_available)  # Blank means available
+        self.assertEqual(Brand.objects.count(), 1)
+
+        # The tree was rebuilt once at the end and is usable
+        sofa_sets = Category.objects.get(name="Sofa Sets")
+        self.assertEqual(sorted(c.name for c in sofa_sets.get_descendants()), ["3-Seater", "Armchairs"])
+        self.assertEqual({node.name for node in get_category_tree()}, {"Sofa Sets", "3-Seater", "Armchairs", "Tables"})
+        # ... and so is the search index
+        response = self.client.get(reverse('menu:menu_list'), {'search': 'oslo'})
+        self.assertEqual([item.sku for item in response.context['menu_items']], ['S1'])  # S2 is unavailable
+
+    def test_round_trip(self):
+        self.run_command('import_catalog', self.path('feed.csv', self.FEED))
+        exported = self.path('catalog.jsonl')
+        self.run_command('export_catalog', exported)
+        with open(exported, encoding='utf-8') as stream:
+            rows = [json.loads(line) for line in stream]
+        self.assertEqual([row['sku'] for row in rows], ['S1', 'S2', 'S3'])
+        self.assertEqual(rows[0]['category'], "Sofa Sets > 3-Seater")
+        self.assertEqual(rows[0]['price'], '45000.50')
+
+        # Importing the edited export updates in place
+        rows[0]['name'] = "Oslo 3-Seater"
+        rows[2]['category'] = "Tables > Dining"
+        self.path('edited.jsonl', ''.join(json.dumps(row) + '\n' for row in rows))
+        out, _ = self.run_command('import_catalog', self.path('edited.jsonl'))
+        self.assertIn("Imported 3 products", out)
+        self.assertIn("1 new categories", out)
+        self.assertEqual(MenuItem.objects.count(), 3)
+        self.assertEqual(MenuItem.objects.get(sku='S1').name, "Oslo 3-Seater")
+        self.assertEqual(MenuItem.objects.get(sku='S3').category.parent.name, "Tables")
+
+        # Exporting again gives back what was imported
+        self.run_command('export_catalog', self.path('again.jsonl'))
+        with open(self.path('again.jsonl'), encoding='utf-8') as stream:
+            self.assertEqual([json.loads(line) for line in stream], rows)
+
+    def test_changed_image_drops_its_old_size(self):
+        self.run_command('import_catalog', self.path('feed.csv', self.FEED))
+        MenuItem.objects.filter(sku__in=['S1', 'S2']).update(
+            image='menu_items/old.jpg', image_width=1200, image_height=800, image_renditions={'source': 'menu_items/old.jpg'},
+        )
+        rows = (
+            '{"sku": "S1", "name": "Oslo Sofa", "price": "45000.50", "image": "menu_items/new.jpg"}\n'
+            '{"sku": "S2", "name": "Oslo Chair", "price": "12000", "image": "menu_items/old.jpg"}\n'
+        )
+        self.run_command('import_catalog', self.path('images.jsonl', rows))
+        sofa, chair = MenuItem.objects.get(sku='S1'), MenuItem.objects.get(sku='S2')
+        self.assertEqual((sofa.image_width, sofa.image_height), (None, None))
+        self.assertEqual((chair.image_width, chair.image_height), (1200, 800))
+        # Only the changed image gets new renditions (which fill its size in)
+        self.assertEqual(items_needing_renditions(), [(sofa.pk, 'menu_items/new.jpg')])
+
+    def test_csv_round_trip(self):
+        self.run_command('import_catalog', self.path('feed.csv', self.FEED))
+        self.run_command('export_catalog', self.path('one.csv'))
+        self.run_command('import_catalog', self.path('one.csv'))
+        self.run_command('export_catalog', self.path('two.csv'))
+        with open(self.path('one.csv')) as one, open(self.path('two.csv')) as two:
+            self.assertEqual(one.read(), two.read())
+        self.assertEqual(MenuItem.objects.count(), 3)
+
+
+class CatalogApiTests(TestCase):
+    """ /api/v1/: filters, cursor pages, one query per page, cached bodies and ETags. """
+
+    def setUp(self):
+        cache.clear()
+        sofas = Category.objects.create(name="Sofas")
+        self.corner = Category.objects.create(name="Corner", parent=sofas)
+        brand = Brand.objects.create(name="Ashley")
+        for n in range(60):
+            MenuItem.objects.create(
+                name=f"Item {n}", price=n, category=self.corner if n % 2 else None, brand=brand if n % 3 else None,
+            )
+
+    def test_list_is_one_query(self):
+        with self.assertNumQueries(1):  # Category and brand come from the same query
+            response = self.client.get('/api/v1/products/')
+        data = response.json()
+        self.assertEqual(len(data['results']), 50)
+        self.assertEqual(data['results'][1]['category']['slug'], 'corner')
+        self.assertEqual(data['results'][1]['brand']['name'], 'Ashley')
+        with self.assertNumQueries(1):
+            response = self.client.get(data['next'])
+        self.assertEqual(response.json()['results'][0]['id'], data['results'][-1]['id'] + 1)
+        with self.assertNumQueries(1):
+            self.client.get(f"/api/v1/products/{data['results'][1]['id']}/")
+
+    def test_filters(self):
+        response = self.client.get('/api/v1/products/', {'category': 'sofas', 'min_price': '10', 'max_price': '20', 'fields': 'id,price'})
+        results = response.json()['results']
+        self.assertEqual([Decimal(row['price']) for row in results], [11, 13, 15, 17, 19])
+        self.assertEqual(set(results[0]), {'id', 'price'})
+
+    def test_invalid_parameters(self):
+        for params in ({'min_price': 'abc'}, {'min_price': 'nan'}, {'max_price': 'inf'}, {'max_price': '-Infinity'},
+                       {'category': 'nope'}, {'brand': 'x'}, {'updated_since': 'yesterday'}):
+            response = self.client.get('/api/v1/products/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_cached_responses(self):
+        response = self.client.get('/api/v1/products/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/v1/products/').content, response.content)
+            self.assertEqual(self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            # Parameters the view doesn't read share the cached body
+            self.assertEqual(self.client.get('/api/v1/products/', {'utm_source': 'bot', 'x': '1'}).content, response.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item = MenuItem.objects.get(name="Item 0")
+            item.name = "Renamed"
+            item.save()
+        response = self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['name'], "Renamed")
+
+    def test_read_only(self):
+        self.assertEqual(self.client.post('/api/v1/brands/').status_code, 405)
+        self.assertEqual(self.client.get('/api/v1/products/99999/').status_code, 404)
+
+
+class DimensionParserTests(SimpleTestCase):
+    """ parse_dimensions: labels, units, positional W x D x H, seat counts. """
+
+    def assertSize(self, text, width=None, depth=None, height=None):
+        expected = {side: None if value is None else Decimal(value) for side, value in
+                    (('width', width), ('height', height), ('depth', depth))}
+        self.assertEqual(parse_dimensions(text), expected, text)
+
+    def test_formats(self):
+        self.assertSize("W: 85in, H: 30in, D: 34in", '215.9', '86.4', '76.2')
+        self.assertSize("Width 220cm x Depth 95cm x Height 80cm", '220', '95', '80')
+        self.assertSize("220 x 95 x 80 cm", '220', '95', '80')
+        self.assertSize('W 2.2m D 950mm H 31.5"', '220', '95', '80')
+        self.assertSize("L 180 x W 90 x H 75 cm", '180', '90', '75')
+        self.assertSize("85in W x 34in D", '215.9', '86.4')
+
+    def test_seat_counts_are_not_sizes(self):
+        self.assertSize("3 seater sofa 200cm wide", width='200')
+        self.assertSize("2-seater, 150 x 80 x 85cm", '150', '80', '85')
+        self.assertSize("Corner sofa, 5 seats: 280 x 180 x 90", '280', '180', '90')
+        self.assertSize("3 seater")
+
+    def test_labels_beat_positions(self):
+        self.assertSize("H 80cm, 200 x 95", '200', '95', '80')
+        self.assertSize("200 x 95, height 80cm", '200', '95', '80')
+
+    def test_unreadable(self):
+        self.assertSize(None)
+        self.assertSize("")
+        self.assertSize("Ask in store")
+        self.assertSize("99999 x 10 cm", depth='10')  # Too big for the column: dropped
+
+
+@override_settings(MENU_SNAPSHOT_ENABLED=False)
+class SizeFilterTests(TestCase):
+    """ width/depth/height filters on the parsed sizes. """
+
+    def setUp(self):
+        cache.clear()
+        MenuItem.objects.create(name="Big", price=1, dimensions="W: 100in, H: 30in, D: 34in")
+        MenuItem.objects.create(name="Small", price=1, dimensions="2-seater, 150 x 80 x 75 cm")
+        MenuItem.objects.create(name="Unknown", price=1)
+
+    def names(self, params):
+        response = self.client.get(reverse('menu:menu_list'), params)
+        return sorted(item.name for item in response.context['page'])
+
+    def test_filters(self):
+        self.assertEqual(MenuItem.objects.get(name="Big").width_cm, Decimal('254.0'))
+        self.assertEqual(self.names({'max_width': '200'}), ["Small"])
+        self.assertEqual(self.names({'min_width': '200'}), ["Big"])
+        self.assertEqual(self.names({'min_depth': '50', 'max_height': '80'}), ["Big", "Small"])
+
+    def test_invalid_sizes(self):
+        for value in ('x', 'nan', 'inf'):
+            response = self.client.get(reverse('menu:menu_list'), {'min_width': value})
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, "Invalid size value entered.")
+
+    def test_backfill_command(self):
+        MenuItem.objects.filter(name="Small").update(width_cm=None, depth_cm=None, height_cm=None)
+        call_command('parse_dimensions', verbosity=0, stdout=StringIO())
+        small = MenuItem.objects.get(name="Small")
+        self.assertEqual((small.width_cm, small.depth_cm, small.height_cm), (150, 80, 75))
+
+
+class CatalogSnapshotTests(TestCase):
+    """ The memory-mapped snapshot is built outside requests and answers exactly like the ORM. """
+
+    def setUp(self):
+        cache.clear()
+        snapshot._current = None
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = self.settings(MENU_SNAPSHOT_DIR=directory.name, MENU_SNAPSHOT_ENABLED=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        rnd = random.Random(5)
+        sofas = Category.objects.create(name="Sofas")
+        corner = Category.objects.create(name="Corner", parent=sofas)
+        tables = Category.objects.create(name="Tables")
+        self.brands = [Brand.objects.create(name=name) for name in ("Zeta", "alpha", "Beta")]
+        names = ["sofa", "Sofa", "Éclair", "armchair", "Bed", "bed", "Z", "a b"]
+        MenuItem.objects.bulk_create(
+            MenuItem(
+                name=f"{rnd.choice(names)}{rnd.randint(0, 3)}",
+                price=Decimal(rnd.choice(['19999.99', '20000', '50000', '75000.50', '100000', '150000', '999'])),
+                category=rnd.choice([sofas, corner, tables, None]), brand=rnd.choice(self.brands + [None]),
+                material=rnd.choice(["Velvet", "Oak", "", None]), is_available=rnd.random() > .1,
+                width_cm=rnd.choice([None, Decimal('150.0'), Decimal('200.5'), Decimal('90.0')]),
+                rating_average=rnd.choice([0, 3.5, 4.0, 4.25]), popularity=rnd.choice([0, 1, 5]),
+                trending_score=rnd.choice([0.0, 1.5, 0.25]),
+            )
+            for _ in range(150)
+        )
+
+    def collect(self, query, use_snapshot):
+        """ Every page's ids, the facet counts and the errors for ``query``. """
+        filters = CatalogFilters.from_querydict(QueryDict(query))
+        facets, paginator = menu_list_paginator(filters, get_category_tree(), use_snapshot=use_snapshot)
+        if use_snapshot:
+            self.assertIsInstance(paginator, snapshot.SnapshotPaginator, query)
+        ids, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            ids += [item.pk for item in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        counts = facets.counts
+        return ids, counts.total, counts.brands, counts.materials, counts.price_bands, counts.categories, filters.errors
+
+    def test_not_built_in_requests(self):
+        self.assertIsNone(snapshot.get_catalog_snapshot())
+        filters = CatalogFilters.from_querydict(QueryDict(''))
+        _facets, paginator = menu_list_paginator(filters, get_category_tree())
+        self.assertIsInstance(paginator, KeysetPaginator)  # The ORM meanwhile
+        self.assertIsNone(snapshot.get_catalog_snapshot())
+        self.assertFalse(os.listdir(snapshot.snapshot_settings()['dir']))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('build_catalog_snapshot', stdout=out)
+        available = MenuItem.objects.filter(is_available=True).count()
+        self.assertIn(f"Wrote {available} items", out.getvalue())
+        current = snapshot.get_catalog_snapshot()
+        self.assertEqual((current.version, current.count), (get_version(CATALOG_VERSION), available))
+        with self.assertNumQueries(0):
+            self.assertIs(snapshot.get_catalog_snapshot(), current)
+
+        # A catalog change makes it stale until the next build
+        bump_version(CATALOG_VERSION)
+        self.assertFalse(snapshot.snapshot_is_built())
+        self.assertIsNone(snapshot.get_catalog_snapshot())
+        snapshot.build_snapshot()
+        self.assertEqual(snapshot.get_catalog_snapshot().version, get_version(CATALOG_VERSION))
+
+        with self.settings(MENU_SNAPSHOT_ENABLED=False):
+            self.assertIsNone(snapshot.get_catalog_snapshot())
+
+    @unittest.skipUnless(numpy_available(), "menu_list only uses the snapshot with NumPy")
+    def test_matches_the_orm(self):
+        snapshot.build_snapshot()
+        brand = self.brands[1].pk
+        queries = [
+            '', 'category=sofas', 'category=nope', 'min_price=20000&max_price=75000.5', 'min_price=19999.995',
+            f'brand={brand}', 'material=Velvet&price_band=50k-100k', 'min_width=150&max_width=200.5',
+            'price_band=under-20k&price_band=over-100k', 'material=Nope',
+        ]
+        sorts = ['', 'price_asc', 'price_desc', 'name_asc', 'name_desc', 'rating_desc', 'popular', 'trending']
+        for filters, sort_by in itertools.product(queries, sorts):
+            query = f'{filters}&sort_by={sort_by}' if sort_by else filters
+            self.assertEqual(self.collect(query, False), self.collect(query, True), query)
+
+    @unittest.skipUnless(numpy_available(), "menu_list only uses the snapshot with NumPy")
+    def test_orm_cursor_continues_on_the_snapshot(self):
+        snapshot.build_snapshot()
+        filters = CatalogFilters.from_querydict(QueryDict('sort_by=price_desc'))
+        tree = get_category_tree()
+        cursor = menu_list_paginator(filters, tree, use_snapshot=False)[1].get_page().next_cursor
+        orm = menu_list_paginator(filters, tree, use_snapshot=False)[1].get_page(cursor)
+        mapped = menu_list_paginator(filters, tree)[1].get_page(cursor)
+        self.assertEqual([item.pk for item in orm], [item.pk for item in mapped])
+
+    def test_orm_without_numpy(self):
+        snapshot.build_snapshot()
+        filters = CatalogFilters.from_querydict(QueryDict(''))
+        with mock.patch('menu.views.numpy_available', return_value=False):
+            _facets, paginator = menu_list_paginator(filters, get_category_tree())
+        self.assertIsInstance(paginator, KeysetPaginator)
+
+    @unittest.skipUnless(numpy_available(), "needs NumPy")
+    def test_engines_agree(self):
+        snapshot.build_snapshot()
+        current = snapshot.get_catalog_snapshot()
+        self.assertIsInstance(current.engine, ColumnarEngine)
+        rows = snapshot.RowEngine(current)
+        tree = get_category_tree()
+        brand = self.brands[1].pk
+        queries = [
+            '', 'category=sofas', 'min_price=19999.995&max_price=100000', f'brand={brand}&material=Velvet',
+            'min_width=150.04&max_width=200.5', 'price_band=20k-50k', 'material=Nope', 'min_price=99999999',
+        ]
+        orderings = ['price', '-price', 'name', '-name', '-rating_average', '-popularity', '-trending_score']
+        for query, ordering in itertools.product(queries, orderings):
+            search = snapshot.SnapshotQuery(current, CatalogFilters.from_querydict(QueryDict(query)), tree)
+            row_counts, row_positions = rows.search(search, ordering)
+            counts, positions = current.engine.search(search, ordering)
+            self.assertEqual(
+                (row_counts.total, row_counts.brands, row_counts.materials, row_counts.price_bands, row_counts.categories),
+                (counts.total, counts.brands, counts.materials, counts.price_bands, counts.categories),
+                (query, ordering),
+            )
+            self.assertEqual(list(row_positions), [int(position) for position in positions], (query, ordering))
+            if len(row_positions) > 3:
+                column = snapshot.SORT_COLUMNS[ordering.lstrip('-')]
+                value, pk = current.columns[column][row_positions[2]], current.columns['id'][row_positions[2]]
+                key = (Decimal(value) if column == 'price' else value, pk)
+                descending = ordering.startswith('-')
+                self.assertEqual(rows.start_after(row_positions, column, key, descending),
+                                 current.engine.start_after(positions, column, key, descending))
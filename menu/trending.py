@@ -0,0 +1,62 @@
+# menu/trending.py
+"""
+"Best sellers" and "trending" scores, computed from the daily sales rollup
+(orders.DailySales) by ``manage.py refresh_trending`` and stored on MenuItem
+so menu_list sorts on an indexed column.
+
+* popularity     - units sold over the last POPULAR_WINDOW_DAYS days.
+* trending_score - units sold over the last TRENDING_WINDOW_DAYS days, each
+                   day weighted by 0.5 ** (age in days / half-life). A sale
+                   today counts 1, one a half-life ago 0.5, and so on, so
+                   items selling now rise above long-time sellers.
+
+Scores only change when the command runs (e.g. hourly from cron); a run
+reads one row per item per day of the window, not the order history.
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MenuItem
+
+POPULAR_WINDOW_DAYS = 90
+TRENDING_WINDOW_DAYS = 28
+TRENDING_HALF_LIFE_DAYS = 3
+BATCH_SIZE = 1000
+
+
+def compute_scores(today=None, half_life=TRENDING_HALF_LIFE_DAYS):
+    """ ({item id: popularity}, {item id: trending score}) from the rollup. """
+    from orders.models import DailySales  # orders depends on menu, not the other way round
+
+    today = today or timezone.localdate()
+    start = today - timedelta(days=max(POPULAR_WINDOW_DAYS, TRENDING_WINDOW_DAYS) - 1)
+    popularity = Counter()
+    trending = defaultdict(float)
+    rows = DailySales.objects.filter(day__gte=start, day__lte=today, quantity__gt=0)
+    for item_id, day, units in rows.values_list('menu_item_id', 'day', 'quantity').iterator(chunk_size=5000):
+        age = (today - day).days
+        if age < POPULAR_WINDOW_DAYS:
+            popularity[item_id] += units
+        if age < TRENDING_WINDOW_DAYS:
+            trending[item_id] += units * 0.5 ** (age / half_life)
+    return popularity, {item_id: round(score, 4) for item_id, score in trending.items()}
+
+
+def refresh_sales_scores(today=None, half_life=TRENDING_HALF_LIFE_DAYS):
+    """ Stores the current scores on MenuItem. Returns the number of items whose scores changed. """
+    popularity, trending = compute_scores(today, half_life)
+    changed = []
+    items = MenuItem.objects.only('pk', 'popularity', 'trending_score')
+    for item in items.iterator(chunk_size=BATCH_SIZE):
+        new = (popularity.get(item.pk, 0), trending.get(item.pk, 0.0))
+        if (item.popularity, item.trending_score) != new:
+            item.popularity, item.trending_score = new
+            changed.append(item)
+    # updated_at is left alone: cards don't show these scores, so their caches stay valid
+    with transaction.atomic():
+        MenuItem.objects.bulk_update(changed, ['popularity', 'trending_score'], batch_size=BATCH_SIZE)
+    return len(changed)
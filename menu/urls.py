@@ -14,6 +14,9 @@ urlpatterns = [
     # Using 'item/' prefix for clarity, expects MenuItem ID
     path('item/<int:item_id>/', views.menu_detail, name='menu_detail'),
 
+    # As-you-type search suggestions (JSON), e.g. /menu/suggest/?q=sof
+    path('suggest/', views.suggest, name='suggest'),
+
     # Removed: path('menu_list/', views.menu_list, name='menu_list_page'), # Redundant
     # Removed: path('menu/category/<str:category>/', views.menu_list, name='menu_list_category'), # Incompatible with view logic
 
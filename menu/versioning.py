@@ -0,0 +1,68 @@
+# menu/versioning.py
+"""
+Version counters for cached catalog data.
+
+Anything derived from the catalog (category tree, lookup indexes, rendered
+fragments...) is cached under a key that embeds the current version number.
+Changing the data bumps the counter, so stale entries are simply never read
+again and age out of the cache on their own.
+
+The counters live in the default cache, which settings.CACHES shares between
+all gunicorn workers and the management commands: a bump made by one process
+(an admin save, ``refresh_trending``...) is seen by every other one.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# --- Counter names ---
+CATEGORY_VERSION = 'category'  # Category rows (tree shape, names, slugs)
+CATALOG_VERSION = 'catalog'    # Anything a shopper can see: items, categories, brands
+SUGGEST_VERSION = 'suggest'    # What search suggestions show: item names/availability, brands, categories
+
+VERSION_KEY = 'menu:version:{name}'
+VERSION_TIMEOUT = None  # Counters must outlive the entries they protect
+
+
+def _fresh_version():
+    """ Seed value for a missing counter.
+
+        Based on the clock so a counter that was evicted never restarts at a
+        number some old cache entry was already written under.
+    """
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    """ Returns the current value of the named version counter. """
+    key = VERSION_KEY.format(name=name)
+    version = cache.get(key)
+    if version is None:
+        # First use (or cache flushed): start a fresh counter.
+        seed = _fresh_version()
+        cache.add(key, seed, timeout=VERSION_TIMEOUT)
+        version = cache.get(key, seed)
+    return version
+
+
+def bump_version(name):
+    """ Increments the named counter immediately. """
+    key = VERSION_KEY.format(name=name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Counter missing: re-seed it, which also invalidates old entries.
+        version = _fresh_version()
+        cache.set(key, version, timeout=VERSION_TIMEOUT)
+        return version
+
+
+def bump_version_on_commit(name):
+    """ Bumps the counter once the current transaction commits.
+
+        Bumping earlier would let a concurrent request rebuild the cache
+        from the old, not yet committed rows under the new version.
+    """
+    transaction.on_commit(lambda: bump_version(name))
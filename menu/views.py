@@ -1,83 +1,127 @@
 # menu/views.py (Updated menu_detail to fetch related items)
 
 from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse
+from django.views.decorators.http import condition
 # --- Import models correctly ---
-from .models import MenuItem, Category # Use MenuItem consistently
-from django.db.models import Q # For potential complex searches later
+from .models import MenuItem # Use MenuItem consistently
+from .card_cache import render_cards
+from .category_tree import get_category_tree
+from .columnar import numpy_available
+from .conditional import menu_detail_etag, menu_list_etag, menu_list_params, revalidate
+from .facets import facet_search
+from .filters import CatalogFilters
+from .page_cache import cache_page_for_catalog
+from .pagination import KeysetPaginator
+from .recommendations import related_items_for
+from .snapshot import snapshot_search
+from .autocomplete import get_suggestion_index
+from django.utils.http import urlencode
+from decimal import Decimal
 from django.contrib import messages # If you want to add messages here
 
 # NOTE: Cart count logic is here for now, consider a context processor later
 # from cart.models import Cart
 
+# --- Page cache keys: only the parameters the views actually read ---
+def _menu_detail_cache_key(request, item_id):
+    return item_id
+
+
+def _number_input(value):
+    """ A parsed filter number as the price inputs show it (15000.0 -> "15000"). """
+    return None if value is None else format(Decimal(repr(value)).normalize(), 'f')
+
+
+# --- Sorting: ?sort_by= value -> ORDER BY (each one has a matching partial index) ---
+VALID_SORT_FIELDS = {
+    'price_asc': 'price', 'price_desc': '-price',
+    'name_asc': 'name', 'name_desc': '-name',
+    'rating_desc': '-rating_average', # Stored aggregate (reviews.ratings): no join to reviews
+    'popular': '-popularity', 'trending': '-trending_score', # Refreshed from the sales rollup (menu.trending)
+}
+
+
+def menu_list_paginator(filters, category_tree, use_snapshot=True):
+    """ The filtered, sorted products behind menu_list, plus their facet counts.
+
+        Answered from the memory-mapped catalog snapshot when it is current
+        and NumPy is installed (menu.snapshot, menu.columnar), otherwise by the
+        ORM query that `manage.py check_query_plans` EXPLAINs (use_snapshot=False).
+    """
+    sort_field = VALID_SORT_FIELDS.get(filters.sort_by)
+    if not sort_field:
+        sort_field = '-rank' if filters.search else 'name' # Default: relevance, else Meta.ordering
+    if use_snapshot and numpy_available(): # Row by row in Python is slower than the database
+        found = snapshot_search(filters, category_tree, sort_field)
+        if found is not None:
+            return found
+    facets = facet_search(filters, category_tree)
+    return facets, KeysetPaginator(facets.queryset, sort_field)
+
+
 # --- Menu List View (Keep as is from your last version) ---
+@revalidate # Cache-Control/Vary, also on 304s
+@condition(etag_func=menu_list_etag) # 304 from the catalog version, before any rendering
+@cache_page_for_catalog(menu_list_params)
 def menu_list(request):
     """ Displays the list of available menu items, with filtering and sorting. """
-    categories = Category.objects.all() # Get all categories for display
-
-    # --- Get filter/sort parameters ---
-    selected_category_slug = request.GET.get('category', None)
-    search_query = request.GET.get('search', None)
-    min_price = request.GET.get('min_price', None)
-    max_price = request.GET.get('max_price', None)
-    sort_by = request.GET.get('sort_by', None)
-    # --- Cart Item Count --- (Example logic)
-    cart_item_count = 0
-    if request.user.is_authenticated:
-        try:
-            from cart.models import Cart # Import where needed or globally
-            cart_items = Cart.objects.filter(user=request.user)
-            cart_item_count = sum(item.quantity for item in cart_items)
-        except (ImportError, AttributeError, Cart.DoesNotExist):
-             pass # Handle gracefully
-
-    # --- Filtering ---
-    menu_items = MenuItem.objects.filter(is_available=True).select_related('category')
-
-    if selected_category_slug:
-        try:
-            selected_category = Category.objects.get(slug=selected_category_slug)
-            descendant_categories = selected_category.get_descendants(include_self=True)
-            menu_items = menu_items.filter(category__in=descendant_categories)
-        except Category.DoesNotExist:
-            messages.warning(request, "Selected category not found.")
-
-    if search_query:
-        menu_items = menu_items.filter(name__icontains=search_query)
-
-    try: # Price filtering
-        if min_price is not None and min_price != '':
-            menu_items = menu_items.filter(price__gte=float(min_price))
-        if max_price is not None and max_price != '':
-            menu_items = menu_items.filter(price__lte=float(max_price))
-    except (ValueError, TypeError):
-        messages.warning(request, "Invalid price value entered.")
-        pass
-
-    # --- Sorting ---
-    valid_sort_fields = {
-        'price_asc': 'price', 'price_desc': '-price',
-        'name_asc': 'name', 'name_desc': '-name',
-    }
-    sort_field = valid_sort_fields.get(sort_by)
-    if sort_field:
-        menu_items = menu_items.order_by(sort_field)
+    category_tree = get_category_tree() # Cached tree: the sidebar renders without queries
+
+    # --- Get filter/sort parameters (normalized once, shared with the facet cache) ---
+    filters = CatalogFilters.from_querydict(request.GET)
+    selected_category_slug = filters.category
+    search_query = filters.search
+    sort_by = filters.sort_by
+
+    # --- Filtering, facet counts (one grouped aggregate, cached per filter key) and sorting ---
+    facets, paginator = menu_list_paginator(filters, category_tree)
+    for error in filters.errors:
+        messages.warning(request, error)
+
+    # --- Keyset Pagination (same cost for every page, no COUNT query) ---
+    page = paginator.get_page(request.GET.get('cursor'))
+    next_page_url = None
+    if page.has_next:
+        # From the normalized filters, not the raw query string: the page is cached under them (menu_list_params)
+        params = filters.query_params() + [('cursor', page.next_cursor)]
+        next_page_url = f"{request.path}?{urlencode(params)}"
+
+    # --- Fragment Mode: just the cards, for the "Load more" button ---
+    if request.GET.get('fragment'):
+        response = render(request, 'menu/partials/product_cards.html', {'menu_items': page, 'cards': render_cards(page)})
+        if next_page_url:
+            response['X-Next-Page'] = next_page_url
+        return response
 
     # --- Prepare Context for Template ---
     context = {
-        'menu_items': menu_items,
-        'categories': categories,
-        'cart_item_count': cart_item_count,
+        'menu_items': page,
+        'cards': render_cards(page), # Cached card fragments: one get_many for the whole page
+        'page': page,
+        'next_page_url': next_page_url,
+        'is_first_page': not request.GET.get('cursor'),
+        'categories': category_tree,
+        'category_tree': category_tree,
+        'selected_category': category_tree.get(selected_category_slug),
         'selected_category_slug': selected_category_slug,
         'search_query': search_query,
-        'min_price': min_price,
-        'max_price': max_price,
+        'min_price': _number_input(filters.min_price),
+        'max_price': _number_input(filters.max_price),
         'sort_by': sort_by,
+        'facets': facets.counts,
+        'filters': filters,
+        'sort_form_params': filters.query_params(exclude=('sort_by',)),
+        'size_filters': filters.sizes,
     }
 
     return render(request, 'menu/menu_list.html', context) # Assumes template is menu/menu_list.html
 
 
 # --- Menu Detail View (UPDATED) ---
+@revalidate
+@condition(etag_func=menu_detail_etag)
+@cache_page_for_catalog(_menu_detail_cache_key)
 def menu_detail(request, item_id):
     """ Displays details for a specific, available menu item
         and fetches related items from the same category.
@@ -90,8 +134,9 @@ def menu_detail(request, item_id):
     )
 
     # --- ADDED: Fetch Related Items ---
-    related_items = None
-    if menu_item.category: # Check if the item has a category
+    # Precomputed "customers also bought" neighbours (manage.py build_recommendations)
+    related_items = related_items_for(menu_item, limit=3)
+    if not related_items and menu_item.category: # Not processed yet: same-category items
         related_items = MenuItem.objects.filter(
             category=menu_item.category,   # Find items in the same category
             is_available=True
@@ -100,25 +145,24 @@ def menu_detail(request, item_id):
         ).select_related('category')[0:3] # Limit to 3 items, preload category
     # --- END: Fetch Related Items ---
 
-    # Cart Count Logic
-    cart_item_count = 0
-    if request.user.is_authenticated:
-         try:
-             from cart.models import Cart
-             cart_items = Cart.objects.filter(user=request.user)
-             cart_item_count = sum(item.quantity for item in cart_items)
-         except (ImportError, AttributeError, Cart.DoesNotExist):
-             pass
-
     context = {
         'item': menu_item,
         'related_items': related_items, # <-- Add related items to context
-        'cart_item_count': cart_item_count,
     }
     # Ensure this template path is correct for your detail page
     return render(request, 'menu/menu_detail.html', context)
 
 
+# --- Search Suggestions (JSON) ---
+def suggest(request):
+    """ As-you-type suggestions for the search box, served from this process's index (no DB queries). """
+    query = request.GET.get('q', '').strip()
+    suggestions = []
+    if len(query) >= 2:
+        suggestions = [s.as_dict() for s in get_suggestion_index().suggest(query[:100])]
+    return JsonResponse({'query': query, 'suggestions': suggestions})
+
+
 # --- Home View ---
 # Keep this if needed, ensure it's mapped correctly in main urls.py if not using TemplateView
 def home(request):
@@ -1,7 +1,7 @@
 # orders/admin.py (Enhanced Version - Optional)
 
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import DailySales, Order, OrderItem
 
 # Define an inline admin descriptor for OrderItem
 class OrderItemInline(admin.TabularInline): # TabularInline shows items in a table
@@ -51,4 +51,20 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 # Note: Don't need admin.site.register(OrderItem) separately if using inline
-# admin.site.register(Order) # Don't need this if using @admin.register decorator
\ No newline at end of file
+# admin.site.register(Order) # Don't need this if using @admin.register decorator
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    """ Read-only view of the sales rollup (maintained by orders.sales). """
+    list_display = ('day', 'menu_item', 'quantity', 'revenue')
+    list_filter = ('day',)
+    search_fields = ('menu_item__name',)
+    list_select_related = ('menu_item',)
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
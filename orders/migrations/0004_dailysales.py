@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:56
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_sales(apps, schema_editor):
+    """ Existing orders; from here on orders.sales adds new ones as they are placed. """
+    OrderItem = apps.get_model("orders", "OrderItem")
+    DailySales = apps.get_model("orders", "DailySales")
+    rows = (
+        OrderItem.objects.order_by()
+        .filter(menu_item__isnull=False).exclude(order__status="Canceled")
+        .values("menu_item_id", day=TruncDate("order__created_at"))
+        .annotate(units=Sum("quantity"), revenue=Sum(F("quantity") * F("price_per_unit"), output_field=DecimalField(max_digits=12, decimal_places=2)))
+    )
+    DailySales.objects.bulk_create(
+        [DailySales(menu_item_id=row["menu_item_id"], day=row["day"], quantity=row["units"], revenue=row["revenue"]) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0013_menuitem_sales_scores"),
+        ("orders", "0003_order_created_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField(help_text="Order date (shop time zone)")),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                ("revenue", models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=12)),
+                ("menu_item", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="daily_sales", to="menu.menuitem")),
+            ],
+            options={
+                "verbose_name_plural": "Daily sales",
+                "ordering": ["-day"],
+                "indexes": [models.Index(fields=["day"], name="daily_sales_day_idx")],
+                "constraints": [models.UniqueConstraint(fields=("menu_item", "day"), name="daily_sales_item_day_uniq")],
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -45,6 +45,10 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # order_list: newest first
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username if self.user else 'Guest'} on {self.created_at.strftime('%Y-%m-%d')}"
@@ -74,4 +78,26 @@ class OrderItem(models.Model):
     def __str__(self):
         # --- Use correct field name 'menu_item' ---
         item_name = self.menu_item.name if self.menu_item else "[Deleted Menu Item]"
-        return f"{self.quantity} x {item_name} (Order #{self.order.id})"
\ No newline at end of file
+        return f"{self.quantity} x {item_name} (Order #{self.order.id})"
+
+# --- Sales rollup: units sold per item per day (see orders.sales) ---
+class DailySales(models.Model):
+    """ One row per (item, day); feeds the "popular"/"trending" sorts (menu.trending). """
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField(help_text="Order date (shop time zone)")
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name_plural = "Daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'day'], name='daily_sales_item_day_uniq'),
+        ]
+        indexes = [
+            # Score refreshes read a recent window of days across all items
+            models.Index(fields=['day'], name='daily_sales_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item_id} on {self.day}: {self.quantity}"
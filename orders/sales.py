@@ -0,0 +1,92 @@
+# orders/sales.py
+"""
+Daily sales rollup (DailySales): units and revenue per item per day.
+
+Orders add their lines as they are placed (checkout calls ``record_sales``
+after its bulk insert; orders.signals covers lines saved one by one), with a
+single INSERT ... ON CONFLICT DO UPDATE per item and day, so concurrent
+checkouts add up instead of overwriting each other. Canceling an order takes
+its lines back out. Reading "best sellers" or "trending" then means scanning
+a few rows per item (menu.trending) rather than aggregating every OrderItem.
+
+``rebuild_daily_sales`` recomputes the table from OrderItem, for repairs.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import DailySales, OrderItem
+
+CANCELED = 'Canceled'
+
+# PostgreSQL and SQLite (3.24+) both understand ON CONFLICT ... DO UPDATE
+UPSERT_SQL = """
+    INSERT INTO {table} (menu_item_id, day, quantity, revenue)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (menu_item_id, day) DO UPDATE SET
+        quantity = {table}.quantity + excluded.quantity,
+        revenue = {table}.revenue + excluded.revenue
+"""
+
+
+def sales_day(order):
+    """ The day an order counts towards, in the shop's time zone. """
+    return timezone.localdate(order.created_at)
+
+
+def _totals(lines):
+    """ {menu item id: [units, revenue]} from OrderItem instances. """
+    totals = defaultdict(lambda: [0, Decimal('0.00')])
+    for line in lines:
+        if line.menu_item_id is None:
+            continue  # Item deleted since: nothing to rank
+        totals[line.menu_item_id][0] += line.quantity
+        totals[line.menu_item_id][1] += line.price_per_unit * line.quantity
+    return totals
+
+
+def record_sales(order, lines):
+    """ Adds ``lines`` (OrderItems of ``order``) to the rollup. """
+    if order.status == CANCELED:
+        return
+    day = sales_day(order)
+    params = [(item_id, day, units, revenue) for item_id, (units, revenue) in _totals(lines).items()]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(UPSERT_SQL.format(table=DailySales._meta.db_table), params)
+
+
+def remove_sales(order, lines):
+    """ Takes ``lines`` back out of the rollup (the order was canceled). """
+    day = sales_day(order)
+    with transaction.atomic():
+        for item_id, (units, revenue) in _totals(lines).items():
+            DailySales.objects.filter(menu_item_id=item_id, day=day).update(
+                quantity=Greatest(F('quantity') - units, 0),
+                revenue=Greatest(F('revenue') - revenue, Decimal('0.00')),
+            )
+
+
+def rebuild_daily_sales():
+    """ Recomputes the whole rollup from OrderItem (canceled orders left out). Returns the row count. """
+    rows = (
+        OrderItem.objects.order_by()
+        .filter(menu_item__isnull=False).exclude(order__status=CANCELED)
+        .values('menu_item_id', day=TruncDate('order__created_at'))  # In the current (shop) time zone
+        .annotate(units=Sum('quantity'), revenue=Sum(F('quantity') * F('price_per_unit'), output_field=DecimalField(max_digits=12, decimal_places=2)))
+    )
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        DailySales.objects.bulk_create(
+            (
+                DailySales(menu_item_id=row['menu_item_id'], day=row['day'], quantity=row['units'], revenue=row['revenue'])
+                for row in rows.iterator(chunk_size=2000)
+            ),
+            batch_size=1000,
+        )
+    return DailySales.objects.count()
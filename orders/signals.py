@@ -0,0 +1,41 @@
+# orders/signals.py
+"""
+Keeps the daily sales rollup (orders.sales) and the co-purchase counts
+(menu.recommendations) in step with orders.
+"""
+
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from menu.recommendations import recount_basket
+
+from .models import Order, OrderItem
+from .sales import CANCELED, record_sales, remove_sales
+
+
+# --- Lines saved one at a time (admin, shell); checkout's bulk insert calls record_sales itself ---
+@receiver(post_save, sender=OrderItem)
+def count_order_line(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        record_sales(instance.order, [instance])
+
+
+# --- Cancellations ---
+@receiver(pre_save, sender=Order)
+def remember_previous_status(sender, instance, raw=False, **kwargs):
+    instance._previous_status = None
+    if not raw and instance.pk is not None:
+        instance._previous_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def count_status_change(sender, instance, created=False, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if raw or created or previous is None or (previous == CANCELED) == (instance.status == CANCELED):
+        return
+    lines = list(instance.items.all())
+    if instance.status == CANCELED:
+        remove_sales(instance, lines)
+    else:
+        record_sales(instance, lines)  # Un-canceled
+    recount_basket(instance, lines)
@@ -1,3 +1,91 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from menu.models import MenuItem
+from menu.trending import compute_scores, refresh_sales_scores
+
+from .models import DailySales, Order, OrderItem
+from .sales import rebuild_daily_sales, record_sales
+
+
+def rollup():
+    return list(DailySales.objects.order_by('menu_item_id', 'day').values_list('menu_item_id', 'day', 'quantity', 'revenue'))
+
+
+@override_settings(MENU_SNAPSHOT_ENABLED=False)
+class SalesRollupTests(TestCase):
+    """ DailySales follows orders and cancellations; refresh_trending turns it into sort scores. """
+
+    def setUp(self):
+        cache.clear()
+        self.sofa = MenuItem.objects.create(name="Sofa", price=Decimal('10.00'))
+        self.chair = MenuItem.objects.create(name="Chair", price=Decimal('20.00'))
+        self.table = MenuItem.objects.create(name="Table", price=Decimal('20.00'))
+
+    def order(self, lines, days_ago=0, bulk=False):
+        order = Order.objects.create(customer_name="c", customer_phone="1", delivery_address="a")
+        if days_ago:
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+            order.refresh_from_db()
+        items = [OrderItem(order=order, menu_item=item, quantity=quantity, price_per_unit=item.price) for item, quantity in lines]
+        if bulk:  # As checkout does it
+            OrderItem.objects.bulk_create(items)
+            record_sales(order, items)
+        else:
+            for line in items:
+                line.save()
+        return order
+
+    def test_rollup(self):
+        self.order([(self.sofa, 2), (self.chair, 1)], bulk=True)
+        self.order([(self.sofa, 1)])
+        self.order([(self.table, 10)], days_ago=20)
+        row = DailySales.objects.get(menu_item=self.sofa)
+        self.assertEqual((row.day, row.quantity, row.revenue), (timezone.localdate(), 3, Decimal('30.00')))
+        self.assertEqual(DailySales.objects.count(), 3)
+
+        before = rollup()
+        self.assertEqual(rebuild_daily_sales(), 3)
+        self.assertEqual(rollup(), before)
+
+    def test_cancellation(self):
+        order = self.order([(self.table, 10)])
+        self.order([(self.table, 1)])
+        order.status = 'Canceled'
+        order.save()
+        self.assertEqual(DailySales.objects.get(menu_item=self.table).quantity, 1)
+        self.assertEqual(rebuild_daily_sales(), 1)
+        self.assertEqual(DailySales.objects.get(menu_item=self.table).quantity, 1)
+        order.status = 'Pending'
+        order.save()
+        self.assertEqual(DailySales.objects.get(menu_item=self.table).quantity, 11)
+        order.status = 'Processing'  # Not a cancellation: counted once
+        order.save()
+        self.assertEqual(DailySales.objects.get(menu_item=self.table).quantity, 11)
+
+    def test_scores(self):
+        self.order([(self.sofa, 3)])
+        self.order([(self.table, 10)], days_ago=20)
+        self.order([(self.chair, 50)], days_ago=100)  # Outside both windows
+        popularity, trending = compute_scores()
+        self.assertEqual(dict(popularity), {self.sofa.pk: 3, self.table.pk: 10})
+        self.assertEqual(trending[self.sofa.pk], 3)
+        self.assertAlmostEqual(trending[self.table.pk], 10 * 0.5 ** (20 / 3), places=4)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('refresh_trending', stdout=out)
+        self.assertIn("Updated sales scores for 2 products.", out.getvalue())
+        self.assertEqual(refresh_sales_scores(), 0)  # Nothing changed since
+
+        response = self.client.get(reverse('menu:menu_list'), {'sort_by': 'popular'})
+        self.assertEqual([item.name for item in response.context['page']], ["Table", "Sofa", "Chair"])
+        response = self.client.get(reverse('menu:menu_list'), {'sort_by': 'trending'})
+        self.assertEqual([item.name for item in response.context['page']], ["Sofa", "Table", "Chair"])
@@ -3,8 +3,12 @@ from .models import Order, OrderItem
 from .forms import OrderForm
 from menu.models import MenuItem
 
+def order_list_queryset():
+    """ Newest orders first, in order_created_idx order (id breaks ties). """
+    return Order.objects.order_by('-created_at', '-id')
+
 def order_list(request):
-    orders = Order.objects.all()
+    orders = order_list_queryset()
     return render(request, 'orders/order_list.html', {'orders': orders})
 
 def create_order(request):
@@ -0,0 +1,28 @@
+# reviews/management/commands/repair_ratings.py
+"""
+Recomputes the rating aggregates on MenuItem from the reviews table.
+
+Reviews saved through the ORM keep the aggregates up to date on their own
+(reviews.signals). Run this after changes that bypass the signals: a
+loaddata, queryset.update() on ratings, or edits made directly in SQL.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviews.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute every menu item's review count, average and star histogram."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk UPDATE (default 1000).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recompute_ratings(batch_size=options['batch_size'])
+        if fixed:
+            self.stdout.write(self.style.WARNING(f"Corrected the rating aggregates of {fixed} items."))
+        else:
+            self.stdout.write(self.style.SUCCESS("All rating aggregates were already correct."))
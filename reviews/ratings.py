@@ -0,0 +1,81 @@
+# reviews/ratings.py
+"""
+Review aggregates stored on MenuItem (rating_count, rating_sum,
+rating_average and the rating_1..rating_5 histogram), so the product grid can
+show stars and sort by rating without touching the reviews table.
+
+Each review change is applied as a single UPDATE of F() expressions, so
+concurrent reviews of the same item can't overwrite each other's counts.
+``recompute_ratings`` rebuilds everything from the reviews table, for
+bulk changes that skip the signals (queryset.update(), raw SQL, fixtures).
+"""
+
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from menu.models import MenuItem
+from menu.versioning import CATALOG_VERSION, bump_version_on_commit
+
+STARS = range(1, 6)
+AGGREGATE_FIELDS = ['rating_count', 'rating_sum', 'rating_average'] + [f'rating_{stars}' for stars in STARS]
+
+
+def adjust_rating(menu_item_id, rating, step):
+    """ Adds (step=1) or removes (step=-1) one ``rating`` on the item's aggregates. """
+    if menu_item_id is None or rating not in STARS:
+        return
+    count = F('rating_count') + step
+    total = F('rating_sum') + step * rating
+    # Every F() reads the row as it was before this UPDATE, so the average
+    # is computed from the new count and sum in the same statement.
+    average = Case(
+        When(rating_count__lte=-step, then=Value(0.0)),
+        default=Cast(total, FloatField()) / Cast(count, FloatField()),
+        output_field=FloatField(),
+    )
+    MenuItem.objects.filter(pk=menu_item_id).update(
+        rating_count=count, rating_sum=total, rating_average=average,
+        **{f'rating_{rating}': F(f'rating_{rating}') + step},
+        updated_at=timezone.now(),  # New card/page cache keys and ETags: the stars changed
+    )
+    bump_version_on_commit(CATALOG_VERSION)
+
+
+def recompute_ratings(batch_size=1000):
+    """ Rebuilds every item's aggregates from the reviews table. Returns the number of items corrected. """
+    # One grouped query over the reviews...
+    rows = MenuItem.objects.order_by().values('pk').annotate(
+        count=Count('reviews', filter=Q(reviews__rating__in=STARS)),
+        total=Sum('reviews__rating', filter=Q(reviews__rating__in=STARS), default=0),
+        **{f'stars_{stars}': Count('reviews', filter=Q(reviews__rating=stars)) for stars in STARS},
+    )
+    expected = {
+        row['pk']: {
+            'rating_count': row['count'], 'rating_sum': row['total'],
+            'rating_average': row['total'] / row['count'] if row['count'] else 0.0,
+            **{f'rating_{stars}': row[f'stars_{stars}'] for stars in STARS},
+        }
+        for row in rows
+    }
+
+    # ...compared with what's stored; only the rows that drifted are written.
+    now = timezone.now()
+    stale = []
+    for item in MenuItem.objects.only('pk', *AGGREGATE_FIELDS).iterator(chunk_size=batch_size):
+        values = expected[item.pk]
+        if any(_differs(getattr(item, name), value) for name, value in values.items()):
+            for name, value in values.items():
+                setattr(item, name, value)
+            item.updated_at = now
+            stale.append(item)
+    MenuItem.objects.bulk_update(stale, AGGREGATE_FIELDS + ['updated_at'], batch_size=batch_size)
+    if stale:
+        bump_version_on_commit(CATALOG_VERSION)
+    return len(stale)
+
+
+def _differs(stored, value):
+    if isinstance(value, float):
+        return abs((stored or 0) - value) > 1e-9
+    return stored != value
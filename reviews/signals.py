@@ -0,0 +1,38 @@
+# reviews/signals.py
+"""
+Keeps the rating aggregates on MenuItem (reviews.ratings) in step with reviews.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Review
+from .ratings import adjust_rating
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    """ An edit may change the stars or even the item, so note what is being replaced. """
+    instance._previous_rating = None
+    if not raw and instance.pk is not None:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('menu_item_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, created=False, raw=False, **kwargs):
+    if raw:  # Skip loaddata; run repair_ratings afterwards
+        return
+    current = (instance.menu_item_id, instance.rating)
+    previous = getattr(instance, '_previous_rating', None)
+    if previous == current:
+        return  # Only the comment changed
+    with transaction.atomic():
+        if previous is not None:
+            adjust_rating(*previous, step=-1)
+        adjust_rating(*current, step=1)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    adjust_rating(instance.menu_item_id, instance.rating, step=-1)
@@ -1,3 +1,75 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from menu.models import MenuItem
+
+from .models import Review
+
+
+class RatingAggregateTests(TestCase):
+    """ Review changes keep MenuItem's rating columns current; repair_ratings fixes drift. """
+
+    def setUp(self):
+        cache.clear()
+        self.sofa = MenuItem.objects.create(name="Sofa", price=1)
+        self.chair = MenuItem.objects.create(name="Chair", price=1)
+        self.ann = User.objects.create_user(username='ann')
+        self.bob = User.objects.create_user(username='bob')
+
+    def aggregates(self, item):
+        item.refresh_from_db()
+        return (item.rating_count, item.rating_sum, round(item.rating_average, 2),
+                [getattr(item, f'rating_{stars}') for stars in range(1, 6)])
+
+    def test_create_edit_delete(self):
+        five = Review.objects.create(menu_item=self.sofa, user=self.ann, rating=5)
+        two = Review.objects.create(menu_item=self.sofa, user=self.bob, rating=2)
+        self.assertEqual(self.aggregates(self.sofa), (2, 7, 3.5, [0, 1, 0, 0, 1]))
+
+        two.rating = 4
+        two.save()
+        self.assertEqual(self.aggregates(self.sofa), (2, 9, 4.5, [0, 0, 0, 1, 1]))
+
+        two.comment = "Comfy"
+        with self.assertNumQueries(2):  # The pre_save read and the save itself; no UPDATE of the item
+            two.save()
+
+        two.menu_item = self.chair
+        two.save()
+        self.assertEqual(self.aggregates(self.sofa), (1, 5, 5.0, [0, 0, 0, 0, 1]))
+        self.assertEqual(self.aggregates(self.chair), (1, 4, 4.0, [0, 0, 0, 1, 0]))
+
+        five.delete()
+        self.assertEqual(self.aggregates(self.sofa), (0, 0, 0.0, [0, 0, 0, 0, 0]))
+
+    def test_changes_bump_the_catalog(self):
+        before = MenuItem.objects.get(pk=self.sofa.pk).updated_at
+        with self.captureOnCommitCallbacks() as callbacks:
+            Review.objects.create(menu_item=self.sofa, user=self.ann, rating=3)
+        self.assertTrue(callbacks)
+        self.assertGreater(MenuItem.objects.get(pk=self.sofa.pk).updated_at, before)
+
+    def test_repair(self):
+        Review.objects.create(menu_item=self.sofa, user=self.ann, rating=4)
+        Review.objects.create(menu_item=self.sofa, user=self.bob, rating=1)
+        MenuItem.objects.filter(pk=self.sofa.pk).update(rating_count=9, rating_average=1, rating_4=0)
+        Review.objects.filter(rating=1).update(rating=3)  # Skips the signals
+        out = StringIO()
+        call_command('repair_ratings', stdout=out)
+        self.assertIn("1 items", out.getvalue())
+        self.assertEqual(self.aggregates(self.sofa), (2, 7, 3.5, [0, 0, 1, 1, 0]))
+        self.assertEqual(self.aggregates(self.chair), (0, 0, 0.0, [0, 0, 0, 0, 0]))
+
+    @override_settings(MENU_SNAPSHOT_ENABLED=False)
+    def test_pages(self):
+        Review.objects.create(menu_item=self.sofa, user=self.ann, rating=2)
+        Review.objects.create(menu_item=self.chair, user=self.ann, rating=4)
+        response = self.client.get(reverse('menu:menu_list'), {'sort_by': 'rating_desc'})
+        self.assertEqual([item.name for item in response.context['page']], ["Chair", "Sofa"])
+        self.assertContains(response, 'fa-star')
+        self.assertContains(self.client.get(reverse('menu:menu_detail', args=[self.chair.pk])), '4.0 / 5')
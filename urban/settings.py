@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -32,6 +33,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "mptt",
     "rest_framework",
     "menu",
@@ -59,6 +61,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "cart.middleware.CookieCartMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -76,6 +79,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "cart.context_processors.cart_badge",
             #    "core.context_processors.location_context",
             ],
         },
@@ -145,12 +149,28 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_AGE = 3600
 
 # --- Cache ---
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "urban-cache",
+# Shared by every gunicorn worker: the catalog version counters (menu.versioning),
+# cached pages and cart badge counts must be the same in all of them.
+# Production (DATABASE_URL set) requires Redis: every request reads a version
+# counter and usually a cached page or badge, so the database cache would put
+# those reads back on the database the cache exists to spare. Only local
+# development without DATABASE_URL (a single runserver process) keeps LocMemCache.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+elif os.getenv("DATABASE_URL"):
+    raise ImproperlyConfigured("REDIS_URL must be set when DATABASE_URL is: the cache has to be shared by every worker and kept off the database.")
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "urban-cache",
+        }
     }
-}
 
 # --- Emails ---
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -25,6 +25,9 @@ urlpatterns = [
     path('contact/', include('contact.urls', namespace='contact')),
     path('core/', include('core.urls', namespace='core')),
 
+    # Read-only catalog API (versioned in the URL)
+    path('api/v1/', include('menu.api_urls', namespace='api-v1')),
+
     # Include users app URLs from root
     path('', include('users.urls', namespace='users')),
 
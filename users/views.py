@@ -10,6 +10,7 @@ from django.contrib.auth.decorators import login_required # If needed for other
 
 # --- Import your custom form ---
 from .forms import CustomUserCreationForm
+from cart.backends import merge_cookie_cart # Guest cart -> the user's Cart rows
 
 # -----------------------------
 # Registration View
@@ -26,6 +27,7 @@ def register(request):
         if form.is_valid():
             user = form.save() # Saves User and creates Profile via form's save method
             login(request, user) # Log the user in immediately after registration
+            merge_cookie_cart(request) # Keep what they added to the cart as a guest
             messages.success(request, f"Welcome, {user.username}! Registration successful and you are now logged in.")
             # Use namespaced redirect to the menu page
             return redirect('menu:menu_list')
@@ -58,6 +60,7 @@ def login_user(request):
         if form.is_valid():
             user = form.get_user()
             login(request, user)
+            merge_cookie_cart(request) # One upsert of the guest cart into the user's cart
             messages.info(request, f"Welcome back, {user.username}!")
             # Redirect to 'next' page if it exists, otherwise default to menu
             if next_url: